@@ -0,0 +1,411 @@
+"""
+Giao diện quản trị (quyền 1) của trang admin: bảng chẩn đoán, sửa/xóa, số liệu
+hiệu năng, thống kê, xuất dữ liệu và quản lý phiên bản mô hình.
+
+Tách khỏi pages/admin.py để người dùng quyền 0 (chỉ xem danh sách lịch sử)
+không phải import pandas, core.models và các module dự đoán khác.
+"""
+import os
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+from core import aggregates, batching, export, metrics, mirror, models, prediction_cache, schema, search, shadow, write_behind
+from core.inference import ALL_MESSAGES
+from forms import TYPE_LABELS, render_form, render_search_filters
+import warnings
+warnings.filterwarnings("ignore")
+
+# ==== TẢI MODEL ====
+# Mỗi mô hình được nạp khi cần lần đầu; thiếu file chỉ tắt chẩn đoán tương ứng
+registry = models.get_registry()
+
+def load_model(kind):
+    """
+    Mô hình của loại chẩn đoán `kind`, hoặc None (kèm thông báo) nếu không dùng được.
+    """
+    with metrics.timed("load_model", kind):
+        model = registry.get(kind)
+    if model is None:
+        st.error(f"Mô hình '{kind}' hiện không khả dụng: {registry.error(kind)}")
+    return model
+
+# ==== HÀM DỰ ĐOÁN + MESSAGE ====
+# Kết quả được cache theo (phiên bản mô hình, vector đặc trưng), dùng chung mọi phiên
+def encode_features(kind, inputs):
+    with metrics.timed("encode", kind):
+        return schema.SCHEMAS[kind].encode(inputs)
+
+def predict_heart(features):
+    with metrics.timed("predict", "heart"):
+        return prediction_cache.predict_one("heart", features)
+
+def predict_depression(features):
+    with metrics.timed("predict", "depression"):
+        return prediction_cache.predict_one("depression", features)
+
+def predict_obesity(features):
+    with metrics.timed("predict", "obesity"):
+        return prediction_cache.predict_one("obesity", features)
+
+
+def update_diagnosis(key, old, new):
+    """
+    PATCH bản ghi `key` và điều chỉnh bộ đếm stats/ trong cùng một lần ghi.
+    """
+    try:
+        with metrics.timed("firebase", "update"):
+            aggregates.update_record(key, old, new)
+        return True
+    except Exception as e:
+        st.error(f"Không cập nhật được dữ liệu trên Firebase: {e}")
+        return False
+
+def delete_diagnosis(key, old):
+    """
+    Xóa bản ghi `key` và trừ phần đóng góp của nó khỏi bộ đếm stats/ trong cùng một lần ghi.
+    """
+    try:
+        with metrics.timed("firebase", "delete"):
+            aggregates.delete_record(key, old)
+        return True
+    except Exception as e:
+        st.error(f"Không xóa được dữ liệu trên Firebase: {e}")
+        return False
+
+PAGE_SIZES = [25, 50, 100]
+DAILY_DAYS = 60  # số ngày gần nhất trên biểu đồ theo ngày
+
+# Cột hiển thị trong bảng danh sách (cột inputs.* chỉ xem ở phần chi tiết)
+LIST_COLUMNS = {
+    "user_name": "Tên người dùng",
+    "type": "Loại",
+    "result": "Kết quả",
+    "model_version": "Phiên bản mô hình",
+    "timestamp": "Thời gian",
+}
+
+def show_metrics_panel():
+    """
+    Độ trễ p50/p95/p99, số lần gọi và số lỗi theo thao tác (số liệu của tiến trình hiện tại).
+    """
+    rows = metrics.get_metrics().snapshot()
+    if not rows:
+        st.info("Chưa có số liệu.")
+        return
+    df = pd.DataFrame(rows)
+    for col in ("p50", "p95", "p99"):
+        df[col] = (df[col] * 1000).round(2)
+    st.dataframe(
+        df[["op", "target", "count", "errors", "p50", "p95", "p99"]].rename(columns={
+            "op": "Thao tác", "target": "Đối tượng", "count": "Số lần", "errors": "Lỗi",
+            "p50": "p50 (ms)", "p95": "p95 (ms)", "p99": "p99 (ms)",
+        }),
+        hide_index=True,
+    )
+    batchers = batching.stats()
+    if batchers:
+        st.caption("Bộ gom lô dự đoán (dùng chung mọi phiên)")
+        st.dataframe(
+            pd.DataFrame([
+                {"Mô hình": kind, "Yêu cầu": s["requests"], "Lô": s["batches"],
+                 "Dòng/lô TB": round(s["avg_batch_rows"] or 0, 2),
+                 "Dòng/lô p95": s["batch_rows_p95"], "Dòng/lô max": s["max_batch_rows"],
+                 "Chờ p50 (ms)": round(s["queue_ms_p50"] or 0, 2),
+                 "Chờ p95 (ms)": round(s["queue_ms_p95"] or 0, 2),
+                 "Cửa sổ (ms)": s["window_ms"], "Lô tối đa": s["max_batch"]}
+                for kind, s in batchers.items()
+            ]),
+            hide_index=True,
+        )
+
+def show_stats_dashboard():
+    """
+    Thống kê tổng hợp đọc từ các bộ đếm stats/ (core.aggregates): chi phí không
+    phụ thuộc số bản ghi trong diagnoses.
+    """
+    try:
+        with metrics.timed("firebase", "stats"):
+            stats = aggregates.load()
+    except Exception as e:
+        st.error(f"Không thể lấy thống kê từ Firebase: {e}")
+        return
+    if st.button("Tính lại từ dữ liệu gốc", key="stats_rebuild"):
+        with st.spinner("Đang tính lại thống kê..."):
+            try:
+                with metrics.timed("stats", "rebuild"):
+                    stats = aggregates.rebuild()
+            except Exception as e:
+                st.error(f"Không tính lại được thống kê: {e}")
+                return
+    if not stats:
+        st.info("Chưa có thống kê.")
+        return
+
+    totals = stats.get("total") or {}
+    for col, kind in zip(st.columns(len(aggregates.MESSAGES)), aggregates.MESSAGES):
+        col.metric(TYPE_LABELS.get(kind, kind), totals.get(kind, 0))
+
+    st.markdown("**Kết quả theo loại chẩn đoán**")
+    for col, kind in zip(st.columns(len(aggregates.MESSAGES)), aggregates.MESSAGES):
+        rows = aggregates.result_counts(stats, kind)
+        col.dataframe(pd.DataFrame(rows, columns=[TYPE_LABELS.get(kind, kind), "Số lượng"]),
+                      hide_index=True)
+
+    daily = aggregates.daily_counts(stats)
+    if daily:
+        st.markdown("**Số lượt chẩn đoán theo ngày**")
+        df = pd.DataFrame.from_dict(daily, orient="index").fillna(0).astype(int)
+        st.bar_chart(df.rename(columns=TYPE_LABELS).tail(DAILY_DAYS))
+
+    col1, col2 = st.columns(2)
+    with col1:
+        kind = st.selectbox("Histogram của:", list(aggregates.HISTOGRAMS),
+                            format_func=lambda k: TYPE_LABELS.get(k, k), key="stats_hist_kind")
+    with col2:
+        name = st.selectbox("Đặc trưng:", list(aggregates.HISTOGRAMS[kind]), key="stats_hist_feature")
+    bins = aggregates.histogram(stats, kind, name)
+    if bins:
+        st.bar_chart(pd.DataFrame(bins, columns=[name, "Số lượng"]).set_index(name))
+    else:
+        st.caption("Chưa có dữ liệu.")
+
+def show_export_panel():
+    """
+    Xuất `diagnoses` ra CSV/Parquet theo từng trang (core.export) vào thư mục trên
+    máy chủ, rồi cho tải từng file về.
+    """
+    fmt = st.radio("Định dạng:", export.FORMATS, horizontal=True, key="export_format")
+    if st.button("Xuất dữ liệu", key="export_run"):
+        out_dir = os.path.join(export.EXPORT_DIR, datetime.now().strftime("%Y%m%d_%H%M%S"))
+        status = st.empty()
+        try:
+            with metrics.timed("export", fmt):
+                files = export.export(out_dir, fmt, progress=lambda n: status.caption(f"Đã đọc {n} bản ghi..."))
+        except Exception as e:
+            st.error(f"Không xuất được dữ liệu: {e}")
+            return
+        status.caption(f"Đã xuất {sum(rows for _, rows in files.values())} bản ghi vào {out_dir}")
+        st.session_state.export_files = files
+    for kind, (path, rows) in sorted(st.session_state.get("export_files", {}).items()):
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb") as f:
+            st.download_button(f"Tải {os.path.basename(path)} ({rows} dòng)", f,
+                               file_name=os.path.basename(path), key=f"export_{kind}")
+
+def show_models_panel():
+    """
+    File/phiên bản đang dùng của từng mô hình, kết quả chạy shadow (core.shadow) và
+    thao tác đặt ứng viên shadow / chuyển mô hình (không cần khởi động lại).
+    """
+    evaluator = shadow.get_shadow()
+    versions = registry.versions()
+    status = registry.status()
+    shadow_stats = evaluator.stats()
+    rows = []
+    for kind in registry.artifacts:
+        s = shadow_stats.get(kind, {})
+        agreement = s.get("agreement")
+        rows.append({
+            "Mô hình": TYPE_LABELS.get(kind, kind), "File": registry.artifacts[kind],
+            "Phiên bản": versions.get(kind, status[kind]),
+            "Shadow": s.get("candidate_version") or s.get("candidate_file") or "-",
+            "Số dòng so sánh": s.get("rows", 0),
+            "Tỷ lệ trùng (%)": None if agreement is None else round(agreement * 100, 2),
+            "Chênh trễ p50 (ms)": None if "delta_ms_p50" not in s else round(s["delta_ms_p50"], 3),
+            "Chênh trễ p95 (ms)": None if "delta_ms_p95" not in s else round(s["delta_ms_p95"], 3),
+            "Bỏ qua": s.get("dropped", 0),
+        })
+    st.dataframe(pd.DataFrame(rows), hide_index=True)
+    for kind, s in shadow_stats.items():
+        if s.get("error"):
+            st.warning(f"Shadow '{kind}': {s['error']}")
+        if s.get("disagreements"):
+            st.caption(f"Kết quả lệch của {TYPE_LABELS.get(kind, kind)} (chính → ứng viên)")
+            st.dataframe(pd.DataFrame(s["disagreements"][:10], columns=["Chính", "Ứng viên", "Số dòng"]),
+                         hide_index=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        kind = st.selectbox("Mô hình:", list(registry.artifacts),
+                            format_func=lambda k: TYPE_LABELS.get(k, k), key="models_kind")
+    with col2:
+        filename = st.selectbox("File:", registry.candidates(kind), key="models_file")
+    col1, col2, col3 = st.columns(3)
+    if col1.button("Chạy shadow", key="models_shadow", disabled=filename is None):
+        evaluator.set_candidate(kind, filename)
+        st.rerun()
+    if col2.button("Tắt shadow", key="models_shadow_off", disabled=evaluator.candidate(kind) is None):
+        evaluator.set_candidate(kind, None)
+        st.rerun()
+    if col3.button("Dùng làm mô hình chính", key="models_promote", disabled=filename is None):
+        try:
+            with metrics.timed("promote", kind):
+                version = registry.promote(kind, filename)
+        except Exception as e:
+            st.error(f"Không chuyển được mô hình '{kind}' sang {filename}: {e}")
+            return
+        if evaluator.candidate(kind) == filename:
+            evaluator.set_candidate(kind, None)
+        st.success(f"Mô hình '{kind}' đang dùng {version}")
+
+def show(load_diagnoses):
+    """
+    Giao diện quản trị; `load_diagnoses()` trả về bản sao dùng chung của cây
+    diagnoses (core.mirror.DiagnosesMirror) hoặc None khi lỗi.
+    """
+    st.subheader("Quản Lý Thông Tin Bệnh Nhân")
+
+    # Trạng thái hàng đợi ghi nền của trang chẩn đoán
+    queue_stats = write_behind.get_queue().stats()
+    latency = queue_stats["last_flush_latency"]
+    st.caption(
+        f"Hàng đợi ghi: {queue_stats['depth']} bản ghi chờ | "
+        f"độ trễ ghi gần nhất: {'-' if latency is None else f'{latency * 1000:.0f} ms'}"
+        + (f" | lỗi: {queue_stats['last_error']}" if queue_stats["last_error"] else "")
+    )
+    cache_stats = prediction_cache.get_cache().stats()
+    st.caption(
+        f"Cache dự đoán: {cache_stats['size']}/{cache_stats['max_size']} mục | "
+        f"hit {cache_stats['hits']} | miss {cache_stats['misses']}"
+    )
+    if st.toggle("Hiển thị số liệu hiệu năng", key="show_metrics"):
+        show_metrics_panel()
+    if st.toggle("Hiển thị thống kê tổng hợp", key="show_stats"):
+        show_stats_dashboard()
+    with st.expander("Xuất dữ liệu chẩn đoán (CSV/Parquet)"):
+        show_export_panel()
+    with st.expander("Phiên bản mô hình & đánh giá shadow"):
+        show_models_panel()
+
+    # Bản sao dùng chung: chỉ đọc các bản ghi của trang hiện tại, không sao chép cả cây
+    diagnoses = load_diagnoses()
+    if not diagnoses:
+        st.info("Không có dữ liệu chẩn đoán nào.")
+        return
+
+    # Tìm kiếm / lọc qua chỉ mục trong bộ nhớ
+    filters = render_search_filters(ALL_MESSAGES, key_prefix="admin_search")
+    if filters:
+        keys = search.get_index().search(**filters)
+        total = len(keys)
+        st.caption(f"Tìm thấy {total} bản ghi")
+    else:
+        keys, total = None, len(diagnoses)  # theo chỉ mục khóa của bản sao, mới nhất trước
+    if not total:
+        return
+
+    # Bảng phân trang: chỉ dựng DataFrame cho các bản ghi của trang hiện tại
+    col1, col2 = st.columns(2)
+    with col1:
+        page_size = st.selectbox("Số dòng mỗi trang:", PAGE_SIZES, key="admin_page_size")
+    pages = (total - 1) // page_size + 1
+    with col2:
+        page = st.number_input(f"Trang (1-{pages}):", min_value=1, max_value=pages, step=1,
+                               key="admin_page") - 1
+    if keys is None:
+        page_records = dict(diagnoses.page(page * page_size, page_size))
+    else:
+        page_records = diagnoses.get_many(keys[page * page_size:(page + 1) * page_size])
+    if not page_records:
+        return
+    page_keys = list(page_records)
+
+    table = pd.json_normalize(list(page_records.values()))
+    table.index = page_keys
+    columns = [c for c in LIST_COLUMNS if c in table.columns]
+    event = st.dataframe(
+        table[columns].rename(columns=LIST_COLUMNS),
+        on_select="rerun",
+        selection_mode="single-row",
+        hide_index=True,
+        key=f"admin_table_{page}_{page_size}",
+    )
+
+    # Chi tiết / sửa / xóa cho dòng được chọn
+    selected_rows = event.selection.rows
+    if selected_rows:
+        diag_id = page_keys[selected_rows[0]]
+        diag = page_records[diag_id]
+        st.write(f"**Thông tin chi tiết:** {diag['user_name']} - {diag['type']} - {diag['timestamp']}")
+        st.table(pd.DataFrame([diag["inputs"]]))
+        st.write(f"**Kết quả:** {diag['result']}")
+        if diag.get("model_version"):
+            st.caption(f"Phiên bản mô hình: {diag['model_version']}")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            # Edit functionality
+            if st.button("Sửa", key=f"edit_{diag_id}"):
+                st.session_state.editing_id = diag_id
+                st.session_state.editing_data = diag
+        with col2:
+            # Delete functionality
+            if st.button("Xóa", key=f"delete_{diag_id}"):
+                if delete_diagnosis(diag_id, diag):
+                    mirror.get_mirror().apply_delete(diag_id)
+                st.success("Đã xóa chẩn đoán.")
+                st.rerun()
+
+    # Editing form
+    if "editing_id" in st.session_state:
+        st.subheader("Chỉnh Sửa Chẩn Đoán")
+        editing_id = st.session_state.editing_id
+        editing_data = st.session_state.editing_data
+
+        user_name = st.text_input("Tên người dùng:", value=editing_data["user_name"])
+        result = st.text_input("Kết quả:", value=editing_data["result"])
+
+        if editing_data["type"] == "heart":
+            inputs = edit_heart_form(editing_data["inputs"])
+        elif editing_data["type"] == "depression":
+            inputs = edit_depression_form(editing_data["inputs"])
+        elif editing_data["type"] == "obesity":
+            inputs = edit_obesity_form(editing_data["inputs"])
+
+        if st.button("Lưu thay đổi"):
+            # Tính lại kết quả chuẩn đoán theo loại chẩn đoán (mã hóa qua schema chung)
+            model_version = editing_data.get("model_version")
+            if editing_data["type"] in schema.SCHEMAS and load_model(editing_data["type"]) is None:
+                new_result = editing_data["result"]  # giữ kết quả cũ khi mô hình không khả dụng
+            elif editing_data["type"] == "heart":
+                new_result = predict_heart(encode_features("heart", inputs))
+            elif editing_data["type"] == "depression":
+                new_result = predict_depression(encode_features("depression", inputs))
+            elif editing_data["type"] == "obesity":
+                new_result = predict_obesity(encode_features("obesity", inputs))
+            else:
+                new_result = "Kết quả không xác định"
+            if editing_data["type"] in schema.SCHEMAS and registry.get(editing_data["type"]) is not None:
+                model_version = registry.version(editing_data["type"])
+
+            updated_data = {
+                "user_name": user_name,
+                "type": editing_data["type"],
+                "inputs": inputs,
+                "result": new_result,
+                "timestamp": editing_data["timestamp"]
+            }
+            if model_version:
+                updated_data["model_version"] = model_version
+            if update_diagnosis(editing_id, editing_data, updated_data):
+                mirror.get_mirror().apply_update(editing_id, updated_data)
+            st.success("Đã cập nhật chẩn đoán.")
+            del st.session_state.editing_id
+            del st.session_state.editing_data
+            st.rerun()
+
+# Các hàm edit form (dựng từ schema đặc trưng)
+def edit_heart_form(inputs):
+    st.subheader("Chỉnh sửa thông tin tim mạch")
+    return render_form(schema.HEART, values=inputs, columns=1, placeholder=False)
+
+def edit_depression_form(inputs):
+    st.subheader("Chỉnh sửa thông tin trầm cảm")
+    return render_form(schema.DEPRESSION, values=inputs, columns=1, placeholder=False)
+
+def edit_obesity_form(inputs):
+    st.subheader("Chỉnh sửa thông tin béo phì")
+    return render_form(schema.OBESITY, values=inputs, columns=1, placeholder=False)
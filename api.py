@@ -0,0 +1,197 @@
+"""
+Dịch vụ REST (ASGI) cho ba mô hình chẩn đoán, chạy song song với giao diện Streamlit.
+
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+    POST /predict/heart | /predict/depression | /predict/obesity
+        body: một bản ghi hoặc danh sách bản ghi; mỗi bản ghi là dict `inputs`
+        như form trong app.py, hoặc {"user_name": ..., "inputs": {...}}
+        ?persist=0 để không lưu kết quả
+    GET  /health     trạng thái/phiên bản mô hình, shadow, hàng đợi ghi và bộ gom lô
+    GET  /metrics    số liệu dạng Prometheus (core.metrics)
+
+Đầu vào được mã hóa bằng cùng schema với app.py. Các request đồng thời cho cùng
+mô hình được gom thành một lần dự đoán (core.batching) chạy trong pool luồng,
+nên event loop không bị chặn. Kết quả được lưu vào `diagnoses` qua hàng đợi ghi
+nền như trang chẩn đoán, nhưng với spool riêng (`.spool/api.jsonl`) để không
+đụng spool của tiến trình Streamlit; nên chạy một worker uvicorn (song song hóa
+nằm ở pool luồng), các worker thêm sẽ dùng spool theo PID.
+"""
+import asyncio
+import json
+from datetime import datetime
+
+import pytz
+
+from core import aggregates, batching, metrics, models, shadow, write_behind
+from core.schema import SCHEMAS
+
+MAX_BODY_BYTES = 8 * 1024 * 1024
+TIMEZONE = pytz.timezone("Asia/Bangkok")
+DEFAULT_USER = "api"
+# Tên spool của hàng đợi ghi, tách khỏi spool "diagnoses" của Streamlit
+SPOOL_SERVICE = "api"
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# ==== HTTP ====
+async def read_body(receive):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise HTTPError(400, "Client ngắt kết nối")
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Body vượt quá {MAX_BODY_BYTES} byte")
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def send_response(send, status, body, content_type="application/json; charset=utf-8"):
+    if not isinstance(body, bytes):
+        body = json.dumps(body, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type.encode()),
+                    (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+# ==== DỰ ĐOÁN ====
+def parse_records(payload):
+    """
+    Chuẩn hóa body thành (danh sách (user_name, inputs), có phải một bản ghi đơn).
+    """
+    single = isinstance(payload, dict)
+    items = [payload] if single else payload
+    if not isinstance(items, list) or not items:
+        raise HTTPError(400, "Body phải là một object hoặc danh sách object khác rỗng")
+    records = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise HTTPError(400, f"Bản ghi {i} không phải object")
+        if isinstance(item.get("inputs"), dict):
+            records.append((str(item.get("user_name") or DEFAULT_USER), item["inputs"]))
+        else:
+            records.append((DEFAULT_USER, item))
+    return records, single
+
+
+def encode_records(kind, records):
+    """
+    (X, records) với `inputs` chỉ giữ các đặc trưng của schema: khóa lạ từ client
+    (có thể chứa ký tự RTDB không cho phép như ".", "/", "$") không được lưu.
+    """
+    schema = SCHEMAS[kind]
+    with metrics.timed("encode", kind):
+        X, valid = schema.encode_many([inputs for _, inputs in records])
+    for i in (~valid).nonzero()[0]:
+        try:
+            schema.encode(records[i][1])
+        except ValueError as e:
+            raise HTTPError(422, f"Bản ghi {int(i)}: {e}")
+    return X, [(user_name, {name: inputs[name] for name in schema.names}) for user_name, inputs in records]
+
+
+def persist(kind, records, results):
+    timestamp = datetime.now(TIMEZONE).strftime("%Y-%m-%d %H:%M:%S")
+    queue = write_behind.get_queue(SPOOL_SERVICE)
+    version = models.get_registry().version(kind)
+    with metrics.timed("firebase", "enqueue"):
+        keys = []
+        for (user_name, inputs), result in zip(records, results):
+            record = {
+                "user_name": user_name,
+                "type": kind,
+                "inputs": inputs,
+                "result": result,
+                "model_version": version,
+                "timestamp": timestamp,
+            }
+            keys.append(queue.enqueue("diagnoses", record, aggregates.increments(record)))
+        return keys
+
+
+async def predict(kind, body, query):
+    registry = models.get_registry()
+    if not registry.available(kind):
+        raise HTTPError(503, f"Mô hình '{kind}' không khả dụng: {registry.error(kind)}")
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise HTTPError(400, f"JSON không hợp lệ: {e}")
+    records, single = parse_records(payload)
+    X, records = encode_records(kind, records)
+    with metrics.timed("api_predict", kind):
+        try:
+            results = await asyncio.wrap_future(batching.get_batcher(kind).submit(X))
+        except RuntimeError as e:
+            raise HTTPError(503, str(e))
+    results = [str(r) for r in results]
+    keys = [None] * len(results)
+    if query.get("persist", "1") != "0":
+        keys = persist(kind, records, results)
+    out = [{"result": r, "key": k} for r, k in zip(results, keys)]
+    return out[0] if single else {"results": out}
+
+
+def health():
+    return {
+        "models": models.get_registry().status(),
+        "model_versions": models.get_registry().versions(),
+        "shadow": shadow.get_shadow().stats(),
+        "write_queue": write_behind.get_queue(SPOOL_SERVICE).stats(),
+        "batchers": batching.stats(),
+    }
+
+
+# ==== ỨNG DỤNG ASGI ====
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            # Đẩy nốt các kết quả còn trong hàng đợi trước khi tắt
+            queue = write_behind.get_queue(SPOOL_SERVICE)
+            await asyncio.get_running_loop().run_in_executor(None, queue.flush, 10)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+    method, path = scope["method"], scope["path"].rstrip("/")
+    query = dict(pair.partition("=")[::2] for pair in scope.get("query_string", b"").decode().split("&") if pair)
+    try:
+        if path.startswith("/predict/"):
+            kind = path[len("/predict/"):]
+            if kind not in SCHEMAS:
+                raise HTTPError(404, f"Không có mô hình '{kind}'")
+            if method != "POST":
+                raise HTTPError(405, "Chỉ hỗ trợ POST")
+            await send_response(send, 200, await predict(kind, await read_body(receive), query))
+        elif path == "/health" and method == "GET":
+            await send_response(send, 200, health())
+        elif path == "/metrics" and method == "GET":
+            await send_response(send, 200, metrics.get_metrics().render_prometheus().encode("utf-8"),
+                                "text/plain; version=0.0.4; charset=utf-8")
+        else:
+            raise HTTPError(404, "Không tìm thấy")
+    except HTTPError as e:
+        await send_response(send, e.status, {"error": e.message})
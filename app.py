@@ -1,65 +1,68 @@
 import streamlit as st
-import numpy as np
-import pickle
-import joblib
-import requests
 from datetime import datetime
-import pytz
-
-# ==== CẤU HÌNH FIREBASE ====
-FIREBASE_URL = "https://bai-test-2ae56-default-rtdb.asia-southeast1.firebasedatabase.app"
+from core import metrics, startup
 
+# ==== FIREBASE ====
 def push_to_firebase(path, data):
     """
-    Ghi một object `data` vào đường dẫn `path` trên Firebase RTDB
+    Đưa object `data` vào hàng đợi ghi nền tới đường dẫn `path` trên Firebase RTDB,
+    không chờ round trip mạng; bản ghi được giữ trong spool tới khi ghi thành công.
     """
-    url = f"{FIREBASE_URL}/{path}.json"
     try:
-        resp = requests.post(url, json=data)
-        resp.raise_for_status()
+        with metrics.timed("firebase", "enqueue"):
+            # Bộ đếm thống kê (stats/) được tăng trong cùng lần ghi với bản ghi
+            increments = aggregates.increments(data) if path == "diagnoses" else None
+            return write_behind.get_queue().enqueue(path, data, increments)
     except Exception as e:
         st.error(f"Không lưu được dữ liệu lên Firebase: {e}")
 
-# ==== TẢI MODEL ====
-@st.cache_resource
-def load_models():
-    with open('Model/ML_heartattack.sav', 'rb') as f:
-        heart_model = pickle.load(f)
-    knn_depression = joblib.load('Model/CDTC_knn.sav')
-    with open('Model/NutriAI.sav', 'rb') as f:
-        obesity_model, scaler = pickle.load(f)
-    return heart_model, knn_depression, obesity_model, scaler
+def push_many_to_firebase(path, records):
+    """
+    Đưa nhiều bản ghi vào hàng đợi ghi nền như một nhóm: tất cả (cùng bộ đếm thống kê)
+    được ghi trong một PATCH nhiều đường dẫn.
+    """
+    try:
+        with metrics.timed("firebase", "enqueue"):
+            increments = {}
+            for data in records:
+                for counter, n in aggregates.increments(data).items():
+                    increments[counter] = increments.get(counter, 0) + n
+            return write_behind.get_queue().enqueue_many(path, records, increments)
+    except Exception as e:
+        st.error(f"Không lưu được dữ liệu lên Firebase: {e}")
 
-heart_model, knn_depression, obesity_model, scaler = load_models()
+# ==== TẢI MODEL ====
+# Mỗi mô hình được nạp khi cần lần đầu; thiếu file chỉ tắt chẩn đoán tương ứng
+def load_model(kind):
+    """
+    Mô hình của loại chẩn đoán `kind`, hoặc None (kèm thông báo) nếu không dùng được.
+    """
+    with metrics.timed("load_model", kind):
+        model = registry.get(kind)
+    if model is None:
+        st.error(f"Mô hình '{kind}' hiện không khả dụng: {registry.error(kind)}")
+    return model
 
 # ==== HÀM DỰ ĐOÁN + MESSAGE ====
+# Kết quả được cache theo (phiên bản mô hình, vector đặc trưng), dùng chung mọi phiên
+def encode_features(kind, inputs):
+    with metrics.timed("encode", kind):
+        return schema.SCHEMAS[kind].encode(inputs)
+
 def predict_heart(features):
-    pred = heart_model.predict(np.array(features).reshape(1, -1))[0]
-    if pred == 0:
-        return "Chúc mừng bạn không có nguy cơ mắc bệnh tim mạch"
-    else:
-        return "Bạn có nguy cơ cao mắc bệnh tim mạch, hãy đi khám ngay!"
+    with metrics.timed("predict", "heart"):
+        return prediction_cache.predict_one("heart", features)
 
 def predict_depression(features):
-    pred = knn_depression.predict(np.array(features).reshape(1, -1))[0]
-    if pred == 0:
-        return "Chúc mừng bạn không có nguy cơ trầm cảm"
-    else:
-        return "Bạn có nguy cơ trầm cảm, hãy đi gặp chuyên gia tâm lý!"
+    with metrics.timed("predict", "depression"):
+        return prediction_cache.predict_one("depression", features)
 
 def predict_obesity(features):
-    scaled = scaler.transform(np.array(features).reshape(1, -1))
-    pred = obesity_model.predict(scaled)[0]
-    messages = {
-        0: " Thiếu cân",
-        1: " Cân nặng bình thường",
-        2: " Thừa cân cấp độ I",
-        3: " Thừa cân cấp độ II",
-        4: " Béo phì loại I",
-        5: " Béo phì loại II",
-        6: " Béo phì loại III"
-    }
-    return messages.get(pred, "Kết quả không xác định")
+    with metrics.timed("predict", "obesity"):
+        return prediction_cache.predict_one("obesity", features)
+
+# Endpoint /metrics cho Prometheus nếu đặt METRICS_PORT (mở một lần mỗi tiến trình)
+metrics.start_exporter()
 
 # ==== GIAO DIỆN STREAMLIT ====
 st.title("🏥 Chuẩn Đoán Bệnh Bằng Machine Learning")
@@ -71,11 +74,42 @@ user_name = st.text_input("Tên người dùng:")
 # Chọn loại chẩn đoán
 diagnosis_type = st.selectbox(
     "Chọn loại chẩn đoán:",
-    ["-- Chọn --", "Kiểm tra tim mạch", "Chuẩn đoán trầm cảm", "Chuẩn đoán bệnh béo phì"]
+    ["-- Chọn --", "Kiểm tra tim mạch", "Chuẩn đoán trầm cảm", "Chuẩn đoán bệnh béo phì",
+     "Sàng lọc tổng hợp (cả ba)"]
 )
+startup.first_render("app")
 if diagnosis_type == "-- Chọn --":
     st.stop()
 
+# Module dự đoán/lưu trữ (numpy, requests, joblib...) chỉ được import khi đã chọn
+# loại chẩn đoán, nên lần render đầu của trang chỉ cần streamlit
+import pytz
+from core import aggregates, models, prediction_cache, schema, screening, write_behind
+from forms import missing_choices, render_form, render_screening_form
+registry = models.get_registry()
+
+# Chỉ nạp mô hình của loại chẩn đoán được chọn
+DIAGNOSIS_KINDS = {
+    "Kiểm tra tim mạch": "heart",
+    "Chuẩn đoán trầm cảm": "depression",
+    "Chuẩn đoán bệnh béo phì": "obesity",
+}
+SCREENING = "Sàng lọc tổng hợp (cả ba)"
+if diagnosis_type == SCREENING:
+    # Sàng lọc với các mô hình dùng được; mô hình thiếu chỉ bị bỏ qua
+    screening_kinds = []
+    for kind in screening.KINDS:
+        with metrics.timed("load_model", kind):
+            model = registry.get(kind)
+        if model is None:
+            st.warning(f"Bỏ qua mô hình '{kind}': {registry.error(kind)}")
+        else:
+            screening_kinds.append(kind)
+    if not screening_kinds:
+        st.stop()
+elif load_model(DIAGNOSIS_KINDS[diagnosis_type]) is None:
+    st.stop()
+
 # Lấy timestamp theo timezone Asia/Bangkok
 tz = pytz.timezone("Asia/Bangkok")
 timestamp = datetime.now(tz).strftime("%Y-%m-%d %H:%M:%S")
@@ -83,44 +117,22 @@ timestamp = datetime.now(tz).strftime("%Y-%m-%d %H:%M:%S")
 # ===== PHẦN TIM MẠCH =====
 if diagnosis_type == "Kiểm tra tim mạch":
     st.subheader("❤️ Thông số Tim Mạch")
-    col1, col2 = st.columns(2)
-    with col1:
-        age = st.number_input("Tuổi:", min_value=1, step=1)
-        gender_str = st.selectbox("Giới tính:", ["-- Chọn --", "Nam (0)", "Nữ (1)"])
-        chest_str = st.selectbox("Đau ngực:", ["-- Chọn --", "Typical angina (1)", "Asymptomatic (0)",
-                                               "Non-anginal pain (3)", "Atypical angina (2)"])
-        bp = st.number_input("Huyết áp:", min_value=1, step=1)
-    with col2:
-        chol = st.number_input("Cholesterol:", min_value=1, step=1)
-        hr = st.number_input("Nhịp tim:", min_value=1, step=1)
-        thal_str = st.selectbox("Thalassemia:", ["-- Chọn --", "Bình thường (3)",
-                                                 "Khiếm khuyết cố định (6)", "Khuyết có thể đảo ngược (7)"])
+    with metrics.timed("render", "heart_form"):
+        inputs = render_form(schema.HEART)
     if st.button("Chuẩn đoán Tim Mạch"):
-        if "-- Chọn --" in [gender_str, chest_str, thal_str]:
+        if missing_choices(inputs):
             st.error("Vui lòng chọn đầy đủ thông tin!")
         else:
-            features = [
-                age,
-                0 if "Nam" in gender_str else 1,
-                int(chest_str.split("(")[1].rstrip(")")),
-                bp,
-                chol,
-                hr,
-                int(thal_str.split("(")[1].rstrip(")"))
-            ]
-            result = predict_heart(features)
+            result = predict_heart(encode_features("heart", inputs))
             st.success(f"{user_name}: {result}")
 
             # Ghi vào Firebase
             data = {
                 "user_name": user_name,
                 "type": "heart",
-                "inputs": {
-                    "age": age, "gender": gender_str, "chest_pain": chest_str,
-                    "blood_pressure": bp, "cholesterol": chol, "heartbeat": hr,
-                    "thalassemia": thal_str
-                },
+                "inputs": inputs,
                 "result": result,
+                "model_version": registry.version("heart"),
                 "timestamp": timestamp
             }
             push_to_firebase("diagnoses", data)
@@ -128,48 +140,22 @@ if diagnosis_type == "Kiểm tra tim mạch":
 # ===== PHẦN TRẦM CẢM =====
 elif diagnosis_type == "Chuẩn đoán trầm cảm":
     st.subheader("🧠 Thông số Trầm Cảm")
-    col1, col2 = st.columns(2)
-    with col1:
-        dg = st.selectbox("Giới tính:", ["-- Chọn --", "Nam (1)", "Nữ (0)"])
-        age_d = st.number_input("Tuổi:", min_value=1, step=1)
-        stress_study = st.slider("Áp lực học tập (0-5):", 0, 5, 0)
-        cgpa = st.number_input("Điểm trung bình (0.0-10.0):", min_value=0.0, max_value=10.0, step=0.01)
-        satisfaction = st.slider("Mức độ hài lòng (0-5):", 0, 5, 0)
-        sleep_str = st.selectbox("Giờ ngủ:", ["-- Chọn --", "Dưới 5 giờ (1)", "5-6 giờ (2)", "7-8 giờ (3)", "Trên 8 giờ (4)"])
-    with col2:
-        diet_str = st.selectbox("Thói quen ăn uống:", ["-- Chọn --", "Không lành mạnh (1)", "Trung bình (2)", "Lành mạnh (3)"])
-        suicide_str = st.selectbox("Từng nghĩ tự tử?", ["-- Chọn --", "Không (0)", "Có (1)"])
-        hours_study = st.number_input("Giờ học/ngày:", min_value=1, step=1)
-        stress_fin = st.slider("Áp lực tài chính (0-5):", 0, 5, 0)
-        fh_str = st.selectbox("Tiền sử bệnh tâm thần gia đình:", ["-- Chọn --", "Không (0)", "Có (1)"])
+    with metrics.timed("render", "depression_form"):
+        inputs = render_form(schema.DEPRESSION)
     if st.button("Chuẩn đoán Trầm Cảm"):
-        if "-- Chọn --" in [dg, sleep_str, diet_str, suicide_str, fh_str]:
+        if missing_choices(inputs):
             st.error("Vui lòng chọn đầy đủ thông tin!")
         else:
-            features = [
-                1 if "Nam" in dg else 0,
-                age_d, stress_study, cgpa, satisfaction,
-                int(sleep_str.split("(")[1].rstrip(")")),
-                int(diet_str.split("(")[1].rstrip(")")),
-                int(suicide_str.split("(")[1].rstrip(")")),
-                hours_study, stress_fin,
-                int(fh_str.split("(")[1].rstrip(")"))
-            ]
-            result = predict_depression(features)
+            result = predict_depression(encode_features("depression", inputs))
             st.success(f"{user_name}: {result}")
 
             # Ghi vào Firebase
             data = {
                 "user_name": user_name,
                 "type": "depression",
-                "inputs": {
-                    "gender": dg, "age": age_d, "study_pressure": stress_study,
-                    "cgpa": cgpa, "satisfaction": satisfaction, "sleep": sleep_str,
-                    "diet": diet_str, "suicide_thoughts": suicide_str,
-                    "study_hours": hours_study, "financial_pressure": stress_fin,
-                    "family_history": fh_str
-                },
+                "inputs": inputs,
                 "result": result,
+                "model_version": registry.version("depression"),
                 "timestamp": timestamp
             }
             push_to_firebase("diagnoses", data)
@@ -177,61 +163,52 @@ elif diagnosis_type == "Chuẩn đoán trầm cảm":
 # ===== PHẦN BÉO PHÌ =====
 elif diagnosis_type == "Chuẩn đoán bệnh béo phì":
     st.subheader("⚖️ Thông số Béo Phì")
-    col1, col2 = st.columns(2)
-    with col1:
-        og = st.selectbox("Giới tính:", ["-- Chọn --", "Nam (1)", "Nữ (0)"])
-        age_o = st.number_input("Tuổi:", min_value=1, step=1)
-        height = st.number_input("Chiều cao (m):", min_value=0.5, max_value=2.5, step=0.01)
-        weight = st.number_input("Cân nặng (kg):", min_value=1.0, step=0.1)
-        fh_o = st.selectbox("Gia đình có thừa cân?", ["-- Chọn --", "Yes (1)", "No (0)"])
-        favc = st.selectbox("Tiêu thụ thực phẩm giàu calo?", ["-- Chọn --", "Yes (1)", "No (0)"])
-        fcvc = st.selectbox("Ăn rau:", ["-- Chọn --", "Ăn ít (0)", "Ăn đủ (1)", "Ăn nhiều (2)"])
-        ncp = st.selectbox("Số bữa chính/ngày:", ["1 (1)", "2 (2)", "3 (3)", "4+ (4)"])
-    with col2:
-        caec = st.selectbox("Ăn vặt:", ["Không (0)", "Thi thoảng (1)", "Thường xuyên (2)", "Luôn (3)"])
-        smoke = st.selectbox("Hút thuốc?", ["Yes (1)", "No (0)"])
-        water = st.number_input("Nước uống (lít):", min_value=0.1, step=0.1)
-        scc = st.selectbox("Theo dõi calo?", ["Yes (1)", "No (0)"])
-        faf = st.selectbox("Hoạt động thể chất:", ["Không (0)", "Thấp (1)", "Bình thường (2)", "Cao (3)"])
-        tue = st.selectbox("Giờ dùng thiết bị:", ["Thấp (0)", "Trung bình (1)", "Cao (2)"])
-        calc = st.selectbox("Tiêu thụ rượu:", ["Không (0)", "Thi thoảng (1)", "Thường xuyên (2)", "Luôn (3)"])
-        mtrans = st.selectbox("Phương tiện chính:", ["Public (0)", "Automobile (1)", "Walking (2)", "Motorbike (3)", "Bike (4)"])
+    with metrics.timed("render", "obesity_form"):
+        inputs = render_form(schema.OBESITY)
     if st.button("Chuẩn đoán Béo Phì"):
-        selects = [og, fh_o, favc, fcvc, ncp, caec, smoke, scc, faf, tue, calc, mtrans]
-        if any("-- Chọn --" in s for s in selects):
+        if missing_choices(inputs):
             st.error("Vui lòng chọn đầy đủ thông tin!")
         else:
-            features = [
-                1 if "Nam" in og else 0,
-                age_o, height, weight,
-                int(fh_o.split("(")[1].rstrip(")")),
-                int(favc.split("(")[1].rstrip(")")),
-                int(fcvc.split("(")[1].rstrip(")")),
-                int(ncp.split("(")[1].rstrip(")")), 
-                int(caec.split("(")[1].rstrip(")")), 
-                int(smoke.split("(")[1].rstrip(")")),
-                water,
-                int(scc.split("(")[1].rstrip(")")),
-                int(faf.split("(")[1].rstrip(")")), 
-                int(tue.split("(")[1].rstrip(")")), 
-                int(calc.split("(")[1].rstrip(")")), 
-                int(mtrans.split("(")[1].rstrip(")"))
-            ]
-            result = predict_obesity(features)
+            result = predict_obesity(encode_features("obesity", inputs))
             st.success(f"{user_name}: {result}")
 
             # Ghi vào Firebase
             data = {
                 "user_name": user_name,
                 "type": "obesity",
-                "inputs": {
-                    "gender": og, "age": age_o, "height": height, "weight": weight,
-                    "family_history": fh_o, "caloric_food": favc, "veg_intake": fcvc,
-                    "meals_per_day": ncp, "snacking": caec, "smoking": smoke,
-                    "water_liter": water, "track_calories": scc,
-                    "activity": faf, "device_time": tue, "alcohol": calc, "transport": mtrans
-                },
+                "inputs": inputs,
                 "result": result,
+                "model_version": registry.version("obesity"),
                 "timestamp": timestamp
             }
             push_to_firebase("diagnoses", data)
+
+# ===== SÀNG LỌC TỔNG HỢP =====
+# Nhập chung tuổi/giới tính một lần, ba mô hình chạy song song, ghi cả ba bản ghi một lần
+elif diagnosis_type == SCREENING:
+    with metrics.timed("render", "screening_form"):
+        titles = {
+            "heart": "❤️ Thông số Tim Mạch",
+            "depression": "🧠 Thông số Trầm Cảm",
+            "obesity": "⚖️ Thông số Béo Phì",
+        }
+        inputs_by_kind = render_screening_form({kind: titles[kind] for kind in screening_kinds})
+    if st.button("Sàng lọc tổng hợp"):
+        if inputs_by_kind is None:
+            st.error("Vui lòng chọn đầy đủ thông tin!")
+        else:
+            features = {kind: encode_features(kind, inputs) for kind, inputs in inputs_by_kind.items()}
+            results = screening.predict_all(features)
+            for kind in screening_kinds:
+                st.success(f"{user_name}: {results[kind]}")
+
+            # Ghi cả ba kết quả vào Firebase trong một lần
+            records = [{
+                "user_name": user_name,
+                "type": kind,
+                "inputs": inputs_by_kind[kind],
+                "result": results[kind],
+                "model_version": registry.version(kind),
+                "timestamp": timestamp
+            } for kind in screening_kinds]
+            push_many_to_firebase("diagnoses", records)
@@ -0,0 +1,97 @@
+"""
+So sánh `core.knn.CompactKNN` với `KNeighborsClassifier` gốc theo kích thước tập huấn luyện.
+
+    python -m benchmarks.bench_knn --sizes 10000 100000 1000000 -o knn.json
+
+Dữ liệu tổng hợp có cùng số đặc trưng với form tim mạch. Đo độ trễ một truy vấn
+(p50/p95), thông lượng theo lô, bộ nhớ mô hình (kích thước pickle) và số dự
+đoán khác nhau giữa hai engine.
+"""
+import argparse
+import json
+import pickle
+import sys
+import time
+import warnings
+
+import numpy as np
+from sklearn.neighbors import KNeighborsClassifier
+
+from core.knn import CompactKNN
+from core.schema import HEART
+
+
+def _latencies(fn, queries):
+    out = []
+    for q in queries:
+        t = time.perf_counter()
+        fn(q)
+        out.append(time.perf_counter() - t)
+    return np.asarray(out) * 1e6
+
+
+def run(n_train, n_single=200, n_batch=2000, n_neighbors=11, algorithm="auto", seed=0):
+    rng = np.random.default_rng(seed)
+    d = len(HEART.features)
+    X = rng.normal(size=(n_train, d))
+    y = rng.integers(0, 2, n_train)
+    Q = rng.normal(size=(n_batch, d))
+
+    t = time.perf_counter()
+    knn = KNeighborsClassifier(n_neighbors=n_neighbors, algorithm=algorithm).fit(X, y)
+    fit_s = time.perf_counter() - t
+    compact = CompactKNN.from_estimator(knn)
+
+    result = {
+        "n_train": n_train,
+        "n_features": d,
+        "fit_method": knn._fit_method,
+        "fit_s": round(fit_s, 4),
+        "sklearn_bytes": len(pickle.dumps(knn)),
+        "compact_bytes": compact.nbytes,
+    }
+    singles = [Q[i:i + 1] for i in range(min(n_single, n_batch))]
+    for name, model in (("sklearn", knn), ("compact", compact)):
+        lat = _latencies(model.predict, singles)
+        t = time.perf_counter()
+        model.predict(Q)
+        batch_s = time.perf_counter() - t
+        result[name] = {
+            "single_p50_us": round(float(np.percentile(lat, 50)), 1),
+            "single_p95_us": round(float(np.percentile(lat, 95)), 1),
+            "batch_us_per_row": round(batch_s / len(Q) * 1e6, 2),
+        }
+    result["mismatches"] = int((knn.predict(Q) != compact.predict(Q)).sum())
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--algorithm", default="auto", choices=["auto", "ball_tree", "kd_tree", "brute"])
+    parser.add_argument("--batch", type=int, default=2000, help="số truy vấn cho phép đo theo lô")
+    parser.add_argument("-o", "--output", help="ghi kết quả JSON vào file")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings("ignore", category=UserWarning)
+    results = []
+    for n in args.sizes:
+        r = run(n, n_batch=args.batch, algorithm=args.algorithm)
+        results.append(r)
+        print(f"n={n:>9,} {r['fit_method']:<9} "
+              f"single p50 sklearn {r['sklearn']['single_p50_us']:>8.1f}us "
+              f"compact {r['compact']['single_p50_us']:>8.1f}us | "
+              f"batch sklearn {r['sklearn']['batch_us_per_row']:>7.2f}us/row "
+              f"compact {r['compact']['batch_us_per_row']:>7.2f}us/row | "
+              f"mem {r['sklearn_bytes'] / 1e6:.1f}MB -> {r['compact_bytes'] / 1e6:.1f}MB | "
+              f"mismatches {r['mismatches']}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
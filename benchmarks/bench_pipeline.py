@@ -0,0 +1,259 @@
+"""
+Benchmark tái lập được cho đường xử lý chẩn đoán, không cần mạng hay Streamlit.
+
+    python -m benchmarks.bench_pipeline -o base.json
+    python -m benchmarks.bench_pipeline --artifact obesity=NutriAI1.sav -o nutri1.json
+    python -m benchmarks.bench_pipeline --compare base.json nutri1.json
+
+Sinh dữ liệu form hợp lệ (nhãn lựa chọn lấy từ core.schema, cùng danh sách với
+form trong app.py) bằng seed cố định, rồi đo cho từng mô hình: thời gian nạp
+(cache mmap nguội và đã có), độ trễ một dòng và thông lượng theo lô của
+`predict_*_batch`, và chi phí đầu-cuối mã hóa -> dự đoán -> tuần tự hóa ->
+ghi vào RTDB giả lập cục bộ (core.rtdb_stub). Kết quả ghi ra JSON.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime, timezone
+
+import numpy as np
+
+from core import compiled, models, rtdb_stub, storage
+from core.inference import predict_batch
+from core.schema import FLOAT, INT, SCHEMAS
+
+# Miền giá trị hợp lý cho các trường số không có giới hạn trên trong schema
+NUMERIC_RANGES = {
+    "age": (18, 80),
+    "blood_pressure": (90, 200),
+    "cholesterol": (120, 400),
+    "heartbeat": (60, 200),
+    "height": (1.4, 2.0),
+    "weight": (35.0, 150.0),
+    "water_liter": (0.5, 3.5),
+}
+
+
+def synthetic_inputs(schema, n, seed=0):
+    """
+    `n` dict đầu vào hợp lệ như form trả về (nhãn cho trường lựa chọn, số cho trường số).
+    """
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for feature in schema.features:
+        if feature.options:
+            labels = feature.labels
+            columns[feature.name] = [labels[i] for i in rng.integers(0, len(labels), n)]
+            continue
+        lo, hi = NUMERIC_RANGES.get(feature.name, (feature.min_value or 0, None))
+        lo = max(lo, feature.min_value) if feature.min_value is not None else lo
+        hi = feature.max_value if hi is None else min(hi, feature.max_value or hi)
+        hi = lo + 100 if hi is None else hi
+        values = rng.uniform(lo, hi, n)
+        if feature.dtype == INT:
+            columns[feature.name] = np.round(values).astype(int).tolist()
+        elif feature.dtype == FLOAT:
+            step = feature.step or 0.01
+            columns[feature.name] = (np.round(values / step) * step).round(6).tolist()
+    return [{name: columns[name][i] for name in schema.names} for i in range(n)]
+
+
+def _percentiles(samples_us):
+    a = np.asarray(samples_us)
+    return {f"p{q}": round(float(np.percentile(a, q)), 2) for q in (50, 95, 99)}
+
+
+def bench_load(name, model_dir, artifacts):
+    """
+    Thời gian nạp mô hình: lần đầu (tạo cache mmap), lần sau (cache có sẵn) và bản xuất NumPy.
+    """
+    out = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for label in ("cold", "warm"):
+            registry = models.ModelRegistry(model_dir, artifacts, cache_dir=cache_dir,
+                                            use_compiled=False, warm_up=False)
+            t = time.perf_counter()
+            registry.get(name)
+            out[f"{label}_ms"] = round((time.perf_counter() - t) * 1e3, 3)
+            if registry.error(name):
+                out["error"] = registry.error(name)
+                return out
+    source = os.path.join(model_dir, artifacts[name])
+    path = compiled.compiled_path(source, os.path.join(model_dir, "compiled"))
+    if os.path.exists(path):
+        t = time.perf_counter()
+        ok = compiled.load(path, source=source) is not None
+        out["compiled_ms"] = round((time.perf_counter() - t) * 1e3, 3) if ok else None
+    return out
+
+
+def bench_model(name, artifact, inputs, single_rows, batch_repeat):
+    schema = SCHEMAS[name]
+    X, valid = schema.encode_many(inputs)
+    assert valid.all()
+
+    # Độ trễ một dòng
+    lat = []
+    for i in range(min(single_rows, len(X))):
+        t = time.perf_counter()
+        predict_batch(name, artifact, X[i:i + 1])
+        lat.append((time.perf_counter() - t) * 1e6)
+
+    # Thông lượng theo lô (lấy lần nhanh nhất)
+    best = float("inf")
+    for _ in range(batch_repeat):
+        t = time.perf_counter()
+        predict_batch(name, artifact, X)
+        best = min(best, time.perf_counter() - t)
+
+    labels = predict_batch(name, artifact, X)
+    values, counts = np.unique(labels.astype(str), return_counts=True)
+    return {
+        "single_us": _percentiles(lat),
+        "batch_rows": len(X),
+        "batch_rows_per_s": round(len(X) / best, 1),
+        "result_counts": dict(zip(values.tolist(), counts.tolist())),
+    }
+
+
+def bench_end_to_end(name, artifact, inputs, client, rows):
+    """
+    Mã hóa -> dự đoán -> tuần tự hóa -> PUT vào RTDB giả lập, từng bản ghi một.
+    """
+    schema = SCHEMAS[name]
+    stages = {"encode": [], "predict": [], "serialize": [], "write": []}
+    for i, record in enumerate(inputs[:rows]):
+        t0 = time.perf_counter()
+        x = schema.encode(record)
+        t1 = time.perf_counter()
+        result = predict_batch(name, artifact, [x])[0]
+        t2 = time.perf_counter()
+        body = json.dumps({"user_name": f"bench{i}", "type": name, "inputs": record,
+                           "result": result, "timestamp": "2024-01-01 00:00:00"})
+        t3 = time.perf_counter()
+        # Gửi thẳng body đã tuần tự hóa để không mã hóa JSON lần thứ hai
+        resp = client.session.put(client.url(f"bench/{name}/{storage.generate_push_id()}"),
+                                  data=body, timeout=client.timeout)
+        resp.raise_for_status()
+        t4 = time.perf_counter()
+        for stage, dt in zip(stages, (t1 - t0, t2 - t1, t3 - t2, t4 - t3)):
+            stages[stage].append(dt * 1e6)
+    total = [sum(v) for v in zip(*stages.values())]
+    out = {stage: _percentiles(v) for stage, v in stages.items()}
+    out["total"] = _percentiles(total)
+    return out
+
+
+def run(model_dir=models.MODEL_DIR, artifacts=None, rows=2000, single_rows=300,
+        batch_repeat=5, e2e_rows=300, seed=0, use_compiled=False):
+    artifacts = dict(models.ARTIFACTS, **(artifacts or {}))
+    registry = models.ModelRegistry(model_dir, artifacts, use_compiled=use_compiled)
+    server, url = rtdb_stub.start_in_thread()
+    client = storage.FirebaseClient(url)
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+        },
+        "params": {"rows": rows, "single_rows": single_rows, "batch_repeat": batch_repeat,
+                   "e2e_rows": e2e_rows, "seed": seed, "compiled": use_compiled},
+        "models": {},
+    }
+    try:
+        for name in artifacts:
+            path = registry.path(name)
+            entry = {"file": artifacts[name]}
+            if not os.path.exists(path):
+                entry["error"] = f"Không tìm thấy {path}"
+                report["models"][name] = entry
+                continue
+            entry["sha256"] = compiled.file_sha256(path)
+            entry["load"] = bench_load(name, model_dir, artifacts)
+            artifact = registry.get(name)
+            if artifact is None:
+                entry["error"] = registry.error(name)
+                report["models"][name] = entry
+                continue
+            inputs = synthetic_inputs(SCHEMAS[name], rows, seed)
+            entry.update(bench_model(name, artifact, inputs, single_rows, batch_repeat))
+            entry["end_to_end_us"] = bench_end_to_end(name, artifact, inputs, client, e2e_rows)
+            report["models"][name] = entry
+            print(f"{name}: single p50 {entry['single_us']['p50']} us, "
+                  f"batch {entry['batch_rows_per_s']:.0f} rows/s, "
+                  f"e2e p50 {entry['end_to_end_us']['total']['p50']} us", file=sys.stderr)
+    finally:
+        client.close()
+        server.shutdown()
+    return report
+
+
+def compare(base, other):
+    """
+    In tỉ lệ other/base cho các chỉ số chính của từng mô hình (> 1 là chậm hơn).
+    """
+    rows = []
+    for name in sorted(set(base["models"]) & set(other["models"])):
+        a, b = base["models"][name], other["models"][name]
+        if "error" in a or "error" in b:
+            rows.append(f"{name:<11} bỏ qua: {a.get('error') or b.get('error')}")
+            continue
+        single = b["single_us"]["p50"] / a["single_us"]["p50"]
+        batch = a["batch_rows_per_s"] / b["batch_rows_per_s"]
+        e2e = b["end_to_end_us"]["total"]["p50"] / a["end_to_end_us"]["total"]["p50"]
+        load = b["load"]["warm_ms"] / a["load"]["warm_ms"] if a["load"].get("warm_ms") else float("nan")
+        same = a["result_counts"] == b["result_counts"]
+        rows.append(f"{name:<11} {a['file']} -> {b['file']}: single x{single:.2f}, batch x{batch:.2f}, "
+                    f"e2e x{e2e:.2f}, load x{load:.2f}, "
+                    f"phân bố kết quả {'giống' if same else 'khác'}")
+    return "\n".join(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark đường xử lý chẩn đoán")
+    parser.add_argument("--model-dir", default=models.MODEL_DIR)
+    parser.add_argument("--artifact", action="append", default=[], metavar="TÊN=FILE",
+                        help="thay file mô hình, ví dụ obesity=NutriAI1.sav")
+    parser.add_argument("--rows", type=int, default=2000, help="số bản ghi sinh cho mỗi mô hình")
+    parser.add_argument("--single-rows", type=int, default=300)
+    parser.add_argument("--batch-repeat", type=int, default=5)
+    parser.add_argument("--e2e-rows", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compiled", action="store_true",
+                        help="dùng bản xuất NumPy trong Model/compiled nếu có (mặc định đo file .sav)")
+    parser.add_argument("-o", "--output", help="ghi kết quả JSON vào file (mặc định stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "OTHER"),
+                        help="so sánh hai file kết quả thay vì chạy benchmark")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f, open(args.compare[1], encoding="utf-8") as g:
+            print(compare(json.load(f), json.load(g)))
+        return
+
+    artifacts = {}
+    for item in args.artifact:
+        name, sep, filename = item.partition("=")
+        if not sep or name not in models.ARTIFACTS:
+            parser.error(f"--artifact không hợp lệ: {item!r}")
+        artifacts[name] = filename
+
+    warnings.filterwarnings("ignore", category=UserWarning)
+    report = run(args.model_dir, artifacts, args.rows, args.single_rows, args.batch_repeat,
+                 args.e2e_rows, args.seed, args.compiled)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
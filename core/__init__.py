@@ -0,0 +1,3 @@
+"""
+Các thành phần dùng chung cho ứng dụng chẩn đoán (không phụ thuộc Streamlit).
+"""
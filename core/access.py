@@ -0,0 +1,66 @@
+"""
+Kiểm tra quyền vào trang quản trị theo địa chỉ IP (không phụ thuộc Streamlit).
+
+Địa chỉ client là IP của kết nối (`st.context.ip_address`) thay vì gọi dịch vụ
+ngoài. Chỉ khi có reverse proxy tin cậy đứng trước ứng dụng (TRUSTED_PROXIES > 0)
+mới đọc header do proxy thêm vào (X-Forwarded-For, hoặc X-Real-Ip); nếu không,
+header do client tự gửi bị bỏ qua vì có thể giả mạo. Chỉ đọc nút
+`ips/{ip}/role`; mỗi lượt truy cập là một bản ghi con riêng trong
+`ips/{ip}/access_log`, ghi qua hàng đợi ghi nền. Vì vậy độ trễ tải trang và
+lượng dữ liệu ghi mỗi lượt không tăng theo số lượt truy cập đã có.
+"""
+import os
+import re
+
+from core import write_behind
+
+# Số reverse proxy tin cậy đứng trước ứng dụng: IP client là phần tử thứ N tính
+# từ cuối X-Forwarded-For (các phần tử phía trước do client tự gửi, có thể giả mạo).
+# 0 (mặc định): không có proxy, dùng IP của kết nối và bỏ qua mọi header
+TRUSTED_PROXIES = int(os.environ.get("TRUSTED_PROXIES", "0"))
+
+UNKNOWN_IP = "unknown"
+
+# Ký tự không được phép trong khóa Firebase RTDB
+_INVALID_KEY_CHARS = re.compile(r"[.$#\[\]/]")
+
+
+def client_ip(headers, remote_addr=None, trusted_proxies=TRUSTED_PROXIES):
+    """
+    IP của client: `remote_addr` (IP của kết nối), hoặc từ header do proxy thêm
+    vào khi có `trusted_proxies` proxy tin cậy.
+    """
+    if trusted_proxies > 0:
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        forwarded = [hop.strip() for hop in headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        if forwarded:
+            return forwarded[-min(trusted_proxies, len(forwarded))]
+        real_ip = headers.get("x-real-ip", "").strip()
+        if real_ip:
+            return real_ip
+    return remote_addr if isinstance(remote_addr, str) and remote_addr else UNKNOWN_IP
+
+
+def ip_key(ip):
+    """
+    Khóa Firebase cho một IP ('.' thay bằng '_' như các bản ghi sẵn có).
+    """
+    return _INVALID_KEY_CHARS.sub("_", ip)
+
+
+def get_role(client, key):
+    """
+    Quyền của IP (0: người dùng, 1: quản trị); IP mới được tạo với quyền 0.
+    """
+    role = client.get(f"ips/{key}/role")
+    if role is None:
+        client.put(f"ips/{key}/role", 0)
+        return 0
+    return int(role)
+
+
+def record_access(key, timestamp, queue=None):
+    """
+    Ghi một lượt truy cập thành bản ghi con mới trong `ips/{key}/access_log`.
+    """
+    return (queue or write_behind.get_queue()).enqueue(f"ips/{key}/access_log", timestamp)
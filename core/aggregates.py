@@ -0,0 +1,270 @@
+"""
+Số liệu tổng hợp của `diagnoses` được duy trì tăng dần dưới nhánh `stats/` (không phụ thuộc Streamlit).
+
+    stats/total/<loại>                     số bản ghi theo loại chẩn đoán
+    stats/results/<loại>/r<i>              số kết quả theo chỉ số thông điệp (r0 = âm tính...),
+                                           "other" cho kết quả lạ
+    stats/daily/<YYYY-MM-DD>/<loại>        số bản ghi theo ngày
+    stats/hist/<loại>/<đặc trưng>/b<i>     histogram cột rộng HISTOGRAMS[loại][đặc trưng],
+                                           bin i chứa [i * rộng, (i + 1) * rộng)
+
+`increments(record, sign)` cho biết các bộ đếm một bản ghi đóng góp; bộ đếm được
+tăng/giảm bằng giá trị máy chủ {".sv": {"increment": n}} trong cùng PATCH nhiều
+đường dẫn với bản ghi (khi thêm qua hàng đợi ghi nền, khi sửa/xóa qua `update_record`
+/ `delete_record`), nên bảng thống kê chỉ cần đọc `stats/`, không quét `diagnoses`.
+
+Increment không idempotent: nếu một lô được gửi lại sau lỗi mạng dù server đã
+ghi, bộ đếm có thể lệch. `rebuild` tính lại toàn bộ từ `diagnoses` theo trang,
+mỗi trang bằng các phép đếm vector.
+"""
+import argparse
+import json
+import math
+
+import numpy as np
+
+from core import export, local_store, storage
+from core.inference import DEPRESSION_MESSAGES, HEART_MESSAGES, OBESITY_MESSAGES
+
+STATS_PATH = "stats"
+MESSAGES = {
+    "heart": list(HEART_MESSAGES),
+    "depression": list(DEPRESSION_MESSAGES),
+    "obesity": list(OBESITY_MESSAGES),
+}
+_RESULT_INDEX = {kind: {m: i for i, m in enumerate(messages)} for kind, messages in MESSAGES.items()}
+
+# Độ rộng bin histogram theo loại và đặc trưng (bmi tính từ chiều cao/cân nặng)
+HISTOGRAMS = {
+    "heart": {"age": 5, "cholesterol": 20, "blood_pressure": 10, "heartbeat": 10},
+    "depression": {"age": 5},
+    "obesity": {"age": 5, "bmi": 2.5},
+}
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        return None
+    return float(value)
+
+
+def feature_value(inputs, name):
+    """
+    Giá trị số của đặc trưng `name` (kể cả đặc trưng suy ra như bmi), hoặc None.
+    """
+    if name == "bmi":
+        height, weight = _number(inputs.get("height")), _number(inputs.get("weight"))
+        return weight / height ** 2 if height and weight is not None else None
+    return _number(inputs.get(name))
+
+
+def result_key(kind, result):
+    index = _RESULT_INDEX.get(kind, {}).get(result)
+    return "other" if index is None else f"r{index}"
+
+
+def increments(record, sign=1):
+    """
+    {đường dẫn bộ đếm: ±1} mà bản ghi đóng góp; rỗng với bản ghi không có loại hợp lệ.
+    """
+    kind = record.get("type") if isinstance(record, dict) else None
+    if kind not in MESSAGES:
+        return {}
+    out = {
+        f"{STATS_PATH}/total/{kind}": sign,
+        f"{STATS_PATH}/results/{kind}/{result_key(kind, record.get('result'))}": sign,
+    }
+    day = str(record.get("timestamp") or "")[:10]
+    if len(day) == 10:
+        out[f"{STATS_PATH}/daily/{day}/{kind}"] = sign
+    inputs = record.get("inputs") if isinstance(record.get("inputs"), dict) else {}
+    for name, width in HISTOGRAMS[kind].items():
+        value = feature_value(inputs, name)
+        if value is not None:
+            out[f"{STATS_PATH}/hist/{kind}/{name}/b{math.floor(value / width)}"] = sign
+    return out
+
+
+def _merge(*parts):
+    total = {}
+    for part in parts:
+        for path, n in part.items():
+            total[path] = total.get(path, 0) + n
+    return {path: {".sv": {"increment": n}} for path, n in total.items() if n}
+
+
+# ==== GHI KÈM BỘ ĐẾM ====
+def update_record(key, old, new, client=None, path="diagnoses"):
+    """
+    PATCH các trường của `new` vào bản ghi `key` và điều chỉnh bộ đếm trong một lần ghi.
+    """
+    client = client or storage.get_client()
+    payload = {f"{path}/{key}/{field}": value for field, value in new.items()}
+    payload.update(_merge(increments(old or {}, -1), increments(dict(old or {}, **new))))
+    return client.update("", payload)
+
+
+def delete_record(key, old, client=None, path="diagnoses"):
+    """
+    Xóa bản ghi `key` và trừ phần đóng góp của nó (`old`) khỏi bộ đếm trong một lần ghi.
+    """
+    client = client or storage.get_client()
+    payload = {f"{path}/{key}": None}
+    payload.update(_merge(increments(old or {}, -1)))
+    return client.update("", payload)
+
+
+# ==== ĐỌC / TÍNH LẠI ====
+def load(client=None):
+    """
+    Cây `stats/` hiện tại (dict rỗng nếu chưa có); kích thước không phụ thuộc số bản ghi.
+    """
+    client = client or storage.get_client()
+    return client.get(STATS_PATH) or {}
+
+
+def _count(counter, prefix, labels, counts):
+    for label, n in zip(labels, counts.tolist()):
+        counter[f"{prefix}/{label}"] = counter.get(f"{prefix}/{label}", 0) + n
+
+
+def _count_pages(counter, pages):
+    for page in pages:
+        records = [r for _, r in page if isinstance(r, dict) and r.get("type") in MESSAGES]
+        if not records:
+            continue
+        kinds = np.array([r["type"] for r in records])
+        days = np.array([str(r.get("timestamp") or "")[:10] for r in records])
+        for kind in MESSAGES:
+            mask = kinds == kind
+            n = int(mask.sum())
+            if not n:
+                continue
+            subset = [r for r, m in zip(records, mask) if m]
+            counter[f"total/{kind}"] = counter.get(f"total/{kind}", 0) + n
+            keys, counts = np.unique([result_key(kind, r.get("result")) for r in subset], return_counts=True)
+            _count(counter, f"results/{kind}", keys, counts)
+            kind_days = days[mask]
+            kind_days = kind_days[np.char.str_len(kind_days) == 10]
+            if len(kind_days):
+                keys, counts = np.unique(kind_days, return_counts=True)
+                _count(counter, "daily", [f"{d}/{kind}" for d in keys], counts)
+            inputs = [r.get("inputs") if isinstance(r.get("inputs"), dict) else {} for r in subset]
+            for name, width in HISTOGRAMS[kind].items():
+                values = np.array([feature_value(x, name) for x in inputs], dtype=np.float64)
+                _count_bins(counter, f"hist/{kind}/{name}", values, width)
+
+
+def _count_bins(counter, prefix, values, width):
+    values = values[np.isfinite(values)]
+    if len(values):
+        keys, counts = np.unique(np.floor(values / width).astype(np.int64), return_counts=True)
+        _count(counter, prefix, [f"b{b}" for b in keys], counts)
+
+
+def _tree(counter):
+    tree = {}
+    for path, n in counter.items():
+        node = tree
+        *parents, leaf = path.split("/")
+        for p in parents:
+            node = node.setdefault(p, {})
+        node[leaf] = n
+    return tree
+
+
+def compute(pages):
+    """
+    Cây `stats/` tính từ các trang [(key, record)] (như `export.iter_pages`).
+    """
+    counter = {}
+    _count_pages(counter, pages)
+    return _tree(counter)
+
+
+def compute_columns(columns):
+    """
+    Cây `stats/` tính thẳng trên bảng cột của kho cục bộ (core.local_store), không dựng dict
+    bản ghi; chỉ các bản ghi nằm trong `overflow` đi qua đường tính theo dict.
+    """
+    counter = {}
+    regular = np.asarray(columns.pos) >= 0
+    for k, kind in enumerate(local_store.KINDS):
+        rows = np.flatnonzero(regular & (np.asarray(columns.types) == k))
+        if kind not in MESSAGES or not len(rows):
+            continue
+        counter[f"total/{kind}"] = len(rows)
+        # Kết quả: ánh xạ từ điển chuỗi sang khóa một lần rồi đếm theo mã
+        result_keys = np.array([result_key(kind, r) for r in columns.results] or [""])
+        keys, counts = np.unique(result_keys[columns.result_codes[rows]], return_counts=True)
+        _count(counter, f"results/{kind}", keys, counts)
+        days = np.asarray(columns.times[rows]).astype("datetime64[s]").astype("datetime64[D]")
+        keys, counts = np.unique(days, return_counts=True)
+        _count(counter, "daily", [f"{d}/{kind}" for d in keys.astype(str)], counts)
+        inputs, pos = columns.inputs(kind), columns.pos[rows]
+        for name, width in HISTOGRAMS[kind].items():
+            if name == "bmi":
+                height = inputs["height"][pos].astype(np.float64)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    values = inputs["weight"][pos] / height ** 2
+            else:
+                values = inputs[name][pos].astype(np.float64)
+            _count_bins(counter, f"hist/{kind}/{name}", values, width)
+    _count_pages(counter, [list(columns.overflow.items())])
+    return _tree(counter)
+
+
+def rebuild(client=None, path="diagnoses", page_size=export.PAGE_SIZE):
+    """
+    Tính lại `stats/` từ đầu bằng cách đọc `path` theo trang rồi ghi đè một lần.
+
+    Bản ghi được thêm/sửa trong lúc tính có thể không được phản ánh; nên chạy lúc ít tải.
+    """
+    client = client or storage.get_client()
+    if isinstance(client, local_store.LocalStore) and path == local_store.COLLECTION:
+        tree = compute_columns(client.columns())
+    else:
+        tree = compute(export.iter_pages(client, path, page_size))
+    client.put(STATS_PATH, tree)
+    return tree
+
+
+# ==== CHUYỂN SANG BẢNG ====
+def histogram(stats, kind, name):
+    """
+    [(cận dưới bin, số lượng)] sắp theo bin.
+    """
+    width = HISTOGRAMS[kind][name]
+    bins = (stats.get("hist", {}).get(kind, {}).get(name) or {})
+    return sorted((int(b[1:]) * width, n) for b, n in bins.items() if n)
+
+
+def result_counts(stats, kind):
+    """
+    [(thông điệp, số lượng)] theo thứ tự nhãn của mô hình, cộng "khác" nếu có.
+    """
+    counts = stats.get("results", {}).get(kind) or {}
+    rows = [(message.strip(), counts.get(f"r{i}", 0)) for i, message in enumerate(MESSAGES[kind])]
+    if counts.get("other"):
+        rows.append(("Khác", counts["other"]))
+    return rows
+
+
+def daily_counts(stats):
+    """
+    {ngày: {loại: số lượng}} sắp theo ngày.
+    """
+    return dict(sorted((day, {k: n for k, n in kinds.items() if n})
+                       for day, kinds in (stats.get("daily") or {}).items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tính lại số liệu tổng hợp stats/ từ diagnoses.")
+    parser.add_argument("--page-size", type=int, default=export.PAGE_SIZE)
+    args = parser.parse_args(argv)
+    tree = rebuild(page_size=args.page_size)
+    print(json.dumps(tree.get("total", {}), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Gom các yêu cầu dự đoán đồng thời thành một lần gọi mô hình (không phụ thuộc Streamlit).
+
+`MicroBatcher.submit(X)` đặt các dòng đặc trưng vào hàng đợi và trả về ngay
+một `concurrent.futures.Future`. Luồng gom chờ tối đa `window` giây kể từ yêu
+cầu đầu tiên (hoặc tới khi đủ `max_batch` dòng), ghép các yêu cầu thành một
+ma trận rồi chạy một lần dự đoán vector hóa trong pool luồng; mỗi Future nhận
+lại đúng phần kết quả của mình. Lô mới chỉ được lấy khi pool còn luồng rảnh,
+nên khi tải cao các yêu cầu chờ sẽ dồn thành lô lớn hơn.
+
+Cửa sổ gom và kích thước lô tối đa cấu hình qua BATCH_WINDOW_MS và MAX_BATCH;
+`stats()` báo kích thước lô và thời gian chờ trong hàng đợi (p50/p95) trên các
+lô gần nhất. Cả trang Streamlit lẫn dịch vụ REST dùng chung một bộ gom cho mỗi
+mô hình, nên yêu cầu từ mọi phiên được gom chung. Mỗi lô đã dự đoán được chuyển
+cho core.shadow nếu mô hình đó đang chạy shadow một ứng viên.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+from core import metrics, models, shadow
+from core.inference import predict_batch
+from core.schema import SCHEMAS
+
+BATCH_WINDOW = float(os.environ.get("BATCH_WINDOW_MS", "2")) / 1000
+MAX_BATCH = int(os.environ.get("MAX_BATCH", "256"))
+WORKERS = int(os.environ.get("BATCH_WORKERS", "2"))
+STATS_WINDOW = 1024
+
+
+class MicroBatcher:
+    def __init__(self, fn, name="", max_batch=MAX_BATCH, window=BATCH_WINDOW, workers=WORKERS,
+                 executor=None):
+        self.fn = fn
+        self.name = name
+        self.max_batch = max_batch
+        self.window = window
+        self._executor = executor or ThreadPoolExecutor(workers, thread_name_prefix=f"predict-{name}")
+        self._slots = threading.Semaphore(workers)
+        self._pending = deque()  # (X, future, thời điểm submit)
+        self._pending_rows = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._stats = {"requests": 0, "rows": 0, "batches": 0, "max_batch_rows": 0}
+        self._recent_sizes = deque(maxlen=STATS_WINDOW)
+        self._recent_delays = deque(maxlen=STATS_WINDOW)
+        self._thread = threading.Thread(target=self._run, name=f"batcher-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, X):
+        """
+        Đưa ma trận X (n dòng) vào lô kế tiếp; Future trả về mảng n kết quả.
+        """
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Bộ gom lô đã đóng")
+            self._pending.append((X, future, time.perf_counter()))
+            self._pending_rows += len(X)
+            self._stats["requests"] += 1
+            self._cond.notify()
+        return future
+
+    def stats(self):
+        with self._cond:
+            s = dict(self._stats, pending_rows=self._pending_rows)
+            sizes = np.array(self._recent_sizes, dtype=np.float64)
+            delays = np.array(self._recent_delays, dtype=np.float64)
+        s["avg_batch_rows"] = s["rows"] / s["batches"] if s["batches"] else None
+        s["window_ms"] = self.window * 1000
+        s["max_batch"] = self.max_batch
+        for q in (50, 95):
+            s[f"batch_rows_p{q}"] = float(np.percentile(sizes, q)) if len(sizes) else None
+            s[f"queue_ms_p{q}"] = float(np.percentile(delays, q)) * 1000 if len(delays) else None
+        return s
+
+    def close(self, wait=True):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._executor.shutdown(wait=wait)
+
+    # ==== LUỒNG GOM ====
+    def _take(self):
+        items, rows = [], 0
+        while self._pending and (not items or rows + len(self._pending[0][0]) <= self.max_batch):
+            item = self._pending.popleft()
+            items.append(item)
+            rows += len(item[0])
+        self._pending_rows -= rows
+        return items
+
+    def _run(self):
+        while True:
+            self._slots.acquire()  # chờ một luồng dự đoán rảnh
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    self._slots.release()
+                    return
+                deadline = self._pending[0][2] + self.window
+                while self._pending_rows < self.max_batch and not self._closed:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                items = self._take()
+            self._executor.submit(self._execute, items)
+
+    def _execute(self, items):
+        try:
+            self._predict(items)
+        finally:
+            self._slots.release()
+
+    def _predict(self, items):
+        started = time.perf_counter()
+        m = metrics.get_metrics()
+        delays = [started - submitted for _, _, submitted in items]
+        for delay in delays:
+            m.observe("batch_queue", self.name, delay)
+        sizes = [len(X) for X, _, _ in items]
+        X = np.concatenate([X for X, _, _ in items]) if len(items) > 1 else items[0][0]
+        try:
+            with m.timed("batch_predict", self.name):
+                results = self.fn(X)
+        except Exception as e:
+            for _, future, _ in items:
+                future.set_exception(e)
+            return
+        with self._cond:
+            s = self._stats
+            s["batches"] += 1
+            s["rows"] += sum(sizes)
+            s["max_batch_rows"] = max(s["max_batch_rows"], sum(sizes))
+            self._recent_sizes.append(sum(sizes))
+            self._recent_delays.extend(delays)
+        offset = 0
+        for (_, future, _), n in zip(items, sizes):
+            future.set_result(results[offset:offset + n])
+            offset += n
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(kind):
+    """
+    Bộ gom lô dùng chung trong tiến trình cho mô hình `kind` (mô hình lấy từ registry ở mỗi lô).
+    """
+    if kind not in SCHEMAS:
+        raise ValueError(f"Loại chẩn đoán không hợp lệ: {kind!r}")
+    batcher = _batchers.get(kind)
+    if batcher is None:
+        with _batchers_lock:
+            batcher = _batchers.get(kind)
+            if batcher is None:
+                registry = models.get_registry()
+
+                def predict(X, kind=kind):
+                    artifact = registry.get(kind)
+                    if artifact is None:
+                        raise RuntimeError(f"Mô hình '{kind}' không khả dụng: {registry.error(kind)}")
+                    version = registry.version(kind)
+                    started = time.perf_counter()
+                    results = predict_batch(kind, artifact, X)
+                    shadow.get_shadow().observe(kind, X, results, time.perf_counter() - started, version)
+                    return results
+
+                batcher = _batchers[kind] = MicroBatcher(predict, name=kind)
+    return batcher
+
+
+def stats():
+    """
+    Số liệu của các bộ gom lô đã tạo trong tiến trình, theo tên mô hình.
+    """
+    with _batchers_lock:
+        batchers = dict(_batchers)
+    return {kind: batcher.stats() for kind, batcher in sorted(batchers.items())}
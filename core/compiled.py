@@ -0,0 +1,304 @@
+"""
+Dạng suy luận gọn chỉ cần NumPy cho các mô hình trong Model/ (không phụ thuộc sklearn).
+
+Bước xuất chuyển artifact sklearn (.sav) thành một thư mục các file .npy (một
+file cho mỗi mảng): cây quyết định thành các mảng phẳng, `StandardScaler` thành
+mean/scale, KNN thành `core.knn.CompactKNN` (dữ liệu huấn luyện ghi sẵn theo
+thứ tự lưu trữ, theo cột). Bản xuất ghi kèm SHA-256 của .sav nguồn để registry
+bỏ qua bản xuất đã cũ. Các mảng được nạp bằng `np.load(mmap_mode="r")` và dùng
+nguyên không sao chép, nên các tiến trình dùng chung trang nhớ của dữ liệu
+huấn luyện KNN. Nạp bản xuất không import sklearn; dự đoán trùng khớp
+`estimator.predict`.
+
+    python -m core.compiled              # xuất mọi mô hình trong Model/
+    python -m core.compiled heart obesity
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+
+import numpy as np
+
+from core.knn import CompactKNN
+from core.schema import INT
+
+COMPILED_DIR = os.environ.get("MODEL_COMPILED_DIR", os.path.join(os.environ.get("MODEL_DIR", "Model"), "compiled"))
+
+# Dưới ngưỡng này duyệt cây bằng vòng lặp Python (nhanh hơn cho một dòng)
+SCALAR_ROWS = 8
+
+TREE_LEAF = -1
+
+
+class CompiledTree:
+    """
+    `DecisionTreeClassifier` một đầu ra dưới dạng mảng phẳng.
+    """
+
+    def __init__(self, children_left, children_right, feature, threshold, leaf_class, classes):
+        self.children_left = np.asarray(children_left, dtype=np.intp)
+        self.children_right = np.asarray(children_right, dtype=np.intp)
+        self.feature = np.asarray(feature, dtype=np.intp)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.leaf_class = np.asarray(leaf_class, dtype=np.intp)
+        self.classes_ = np.asarray(classes)
+        self._lists = (self.children_left.tolist(), self.children_right.tolist(),
+                       self.feature.tolist(), self.threshold.tolist())
+
+    @classmethod
+    def from_estimator(cls, tree):
+        t = tree.tree_
+        if t.n_outputs != 1:
+            raise ValueError("Chỉ hỗ trợ cây một đầu ra")
+        # Lớp đa số của mỗi nút; hòa chọn chỉ số nhỏ nhất như np.argmax trong sklearn
+        leaf_class = np.argmax(t.value[:, 0, :], axis=1)
+        return cls(t.children_left, t.children_right, t.feature, t.threshold, leaf_class, tree.classes_)
+
+    def apply(self, X):
+        """
+        Chỉ số lá cho từng dòng của X.
+        """
+        # sklearn ép X về float32 trước khi so với ngưỡng float64
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if len(X) <= SCALAR_ROWS:
+            left, right, feature, threshold = self._lists
+            leaves = []
+            for row in X.tolist():
+                node = 0
+                while left[node] != TREE_LEAF:
+                    node = left[node] if row[feature[node]] <= threshold[node] else right[node]
+                leaves.append(node)
+            return np.asarray(leaves, dtype=np.intp)
+        node = np.zeros(len(X), dtype=np.intp)
+        active = np.arange(len(X))
+        while len(active):
+            nd = node[active]
+            left = self.children_left[nd]
+            internal = left != TREE_LEAF
+            active, nd, left = active[internal], nd[internal], left[internal]
+            go_left = X[active, self.feature[nd]] <= self.threshold[nd]
+            node[active] = np.where(go_left, left, self.children_right[nd])
+        return node
+
+    def predict(self, X):
+        return self.classes_[self.leaf_class[self.apply(X)]]
+
+
+class CompiledScaler:
+    """
+    Phép biến đổi của `StandardScaler`: (X - mean) / scale trên float64.
+    """
+
+    def __init__(self, mean=None, scale=None):
+        self.mean_ = None if mean is None else np.asarray(mean, dtype=np.float64)
+        self.scale_ = None if scale is None else np.asarray(scale, dtype=np.float64)
+
+    @classmethod
+    def from_estimator(cls, scaler):
+        return cls(scaler.mean_ if scaler.with_mean else None,
+                   scaler.scale_ if scaler.with_std else None)
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        if self.mean_ is not None:
+            X -= self.mean_
+        if self.scale_ is not None:
+            X /= self.scale_
+        return X
+
+
+# ==== CHUYỂN ĐỔI ====
+def compile_estimator(est):
+    """
+    Bản NumPy của một estimator sklearn đã fit; ValueError nếu loại chưa hỗ trợ.
+    """
+    name = type(est).__name__
+    if name == "DecisionTreeClassifier":
+        return CompiledTree.from_estimator(est)
+    if name == "StandardScaler":
+        return CompiledScaler.from_estimator(est)
+    if name == "KNeighborsClassifier":
+        return CompactKNN.from_estimator(est)
+    raise ValueError(f"Chưa hỗ trợ xuất mô hình loại {name}")
+
+
+def compile_artifact(artifact):
+    """
+    Artifact là một estimator hoặc tuple (model, scaler) như NutriAI.sav.
+    """
+    if isinstance(artifact, tuple):
+        return tuple(compile_estimator(est) for est in artifact)
+    return compile_estimator(artifact)
+
+
+def _part_arrays(part):
+    if isinstance(part, CompiledTree):
+        return "tree", {
+            "children_left": part.children_left, "children_right": part.children_right,
+            "feature": part.feature, "threshold": part.threshold,
+            "leaf_class": part.leaf_class, "classes": part.classes_,
+        }
+    if isinstance(part, CompiledScaler):
+        arrays = {}
+        if part.mean_ is not None:
+            arrays["mean"] = part.mean_
+        if part.scale_ is not None:
+            arrays["scale"] = part.scale_
+        return "scaler", arrays
+    if isinstance(part, CompactKNN):
+        # Ghi đúng dạng CompactKNN giữ trong bộ nhớ (thứ tự cây, theo cột) để nạp mmap không sao chép
+        arrays = {
+            "fit_X": part.fit_X, "y": part.y, "classes": part.classes_,
+            "params": np.array([part.n_neighbors, part.p]),
+            "weights": np.array(part.weights), "fit_method": np.array(part.fit_method),
+        }
+        for key, value in (part.tree or {}).items():
+            arrays["tree_" + key] = value
+        return "knn", arrays
+    raise ValueError(f"Không ghi được thành phần {type(part).__name__}")
+
+
+def _part_from_arrays(kind, arrays):
+    if kind == "tree":
+        return CompiledTree(arrays["children_left"], arrays["children_right"], arrays["feature"],
+                            arrays["threshold"], arrays["leaf_class"], arrays["classes"])
+    if kind == "scaler":
+        return CompiledScaler(arrays.get("mean"), arrays.get("scale"))
+    if kind == "knn":
+        tree = {key[5:]: value for key, value in arrays.items() if key.startswith("tree_")} or None
+        n_neighbors, p = arrays["params"].tolist()
+        return CompactKNN(arrays["fit_X"], arrays["y"], arrays["classes"], int(n_neighbors), p=p,
+                          weights=str(arrays["weights"]), fit_method=str(arrays["fit_method"]),
+                          tree=tree, dtype=arrays["fit_X"].dtype, ordered=True)
+    raise ValueError(f"Thành phần không hợp lệ: {kind!r}")
+
+
+# ==== ĐỌC / GHI ====
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def compiled_path(source, compiled_dir=COMPILED_DIR):
+    return os.path.join(compiled_dir, os.path.splitext(os.path.basename(source))[0])
+
+
+def save(compiled, path, source_sha256=""):
+    parts = compiled if isinstance(compiled, tuple) else (compiled,)
+    arrays = {
+        "is_tuple": np.array(isinstance(compiled, tuple)),
+        "source_sha256": np.array(source_sha256),
+    }
+    kinds = []
+    for i, part in enumerate(parts):
+        kind, part_arrays = _part_arrays(part)
+        kinds.append(kind)
+        arrays.update({f"{i}.{key}": value for key, value in part_arrays.items()})
+    arrays["kinds"] = np.array(kinds)
+    tmp, old = f"{path}.{os.getpid()}.tmp", f"{path}.{os.getpid()}.old"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for key, value in arrays.items():
+        np.save(os.path.join(tmp, key + ".npy"), value, allow_pickle=False)
+    # Thay cả thư mục: người đọc thấy bản cũ hoặc bản mới, không thấy bản ghi dở
+    if os.path.exists(path):
+        os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def _read(path, key):
+    return np.load(os.path.join(path, key + ".npy"), mmap_mode="r", allow_pickle=False)
+
+
+def load(path, source=None):
+    """
+    Predictor từ thư mục bản xuất (mảng được ánh xạ bộ nhớ); None nếu `source`
+    (.sav) đã khác bản được xuất.
+    """
+    if source is not None and str(_read(path, "source_sha256")) != file_sha256(source):
+        return None
+    keys = [name[:-4] for name in os.listdir(path) if name.endswith(".npy")]
+    parts = []
+    for i, kind in enumerate(_read(path, "kinds").tolist()):
+        prefix = f"{i}."
+        arrays = {key[len(prefix):]: _read(path, key) for key in keys if key.startswith(prefix)}
+        parts.append(_part_from_arrays(kind, arrays))
+    return tuple(parts) if bool(_read(path, "is_tuple")) else parts[0]
+
+
+def _sample_rows(schema, n, seed=0):
+    """
+    Dữ liệu ngẫu nhiên trong miền giá trị của form để kiểm tra bản xuất.
+    """
+    rng = np.random.default_rng(seed)
+    X = np.empty((n, len(schema)), dtype=schema.dtype)
+    for j, feature in enumerate(schema.features):
+        if feature.options:
+            X[:, j] = rng.choice(list(feature.options.values()), n)
+            continue
+        lo = feature.min_value if feature.min_value is not None else 0
+        hi = feature.max_value if feature.max_value is not None else lo + 100
+        X[:, j] = rng.uniform(lo, hi, n)
+        if feature.dtype == INT:
+            X[:, j] = np.round(X[:, j])
+    return X
+
+
+def export(name, source, compiled_dir=COMPILED_DIR, check_rows=5000):
+    """
+    Xuất artifact `source` của mô hình `name`, kiểm tra dự đoán trùng khớp trên
+    dữ liệu ngẫu nhiên theo schema rồi ghi thư mục bản xuất. Trả về đường dẫn thư mục.
+    """
+    import joblib  # chỉ bước xuất mới cần sklearn
+
+    from core.inference import predict_batch
+    from core.schema import SCHEMAS
+
+    artifact = joblib.load(source)
+    compiled = compile_artifact(artifact)
+    X = _sample_rows(SCHEMAS[name], check_rows)
+    expected = predict_batch(name, artifact, X)
+    got = predict_batch(name, compiled, X)
+    mismatches = int(np.count_nonzero(expected != got))
+    if mismatches:
+        raise ValueError(f"Bản xuất của {name} lệch {mismatches}/{check_rows} dự đoán")
+    path = compiled_path(source, compiled_dir)
+    save(compiled, path, file_sha256(source))
+    return path
+
+
+def main(argv=None):
+    from core.models import ARTIFACTS, MODEL_DIR
+
+    parser = argparse.ArgumentParser(description="Xuất mô hình sang dạng chỉ cần NumPy")
+    parser.add_argument("names", nargs="*", help=f"mô hình cần xuất (mặc định: {', '.join(ARTIFACTS)})")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("-o", "--output-dir", default=COMPILED_DIR)
+    args = parser.parse_args(argv)
+
+    status = 0
+    for name in args.names or list(ARTIFACTS):
+        source = os.path.join(args.model_dir, ARTIFACTS[name])
+        if not os.path.exists(source):
+            print(f"{name}: bỏ qua, không tìm thấy {source}", file=sys.stderr)
+            continue
+        try:
+            path = export(name, source, args.output_dir)
+        except ValueError as e:
+            print(f"{name}: {e}", file=sys.stderr)
+            status = 1
+            continue
+        print(f"{name}: {source} -> {path}", file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
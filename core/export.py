@@ -0,0 +1,190 @@
+"""
+Xuất lịch sử chẩn đoán ra CSV/Parquet theo luồng, bộ nhớ giới hạn (không phụ thuộc Streamlit).
+
+    python -m core.export -o exports/ --format parquet
+    python -m core.export -o exports/ --format csv --page-size 5000
+
+Đọc `diagnoses` theo từng trang bằng truy vấn khoảng khóa (orderBy="$key",
+startAt/limitToFirst) thay vì tải cả `/diagnoses.json`, làm phẳng `inputs` theo
+schema của từng loại chẩn đoán thành các cột có kiểu rồi ghi nối từng khối vào
+một file cho mỗi loại (`diagnoses_heart.csv`, ...). Bộ nhớ dùng tối đa cỡ một
+trang cộng một khối mỗi loại, không phụ thuộc tổng số bản ghi.
+
+Parquet cần pyarrow (tùy chọn); mỗi khối là một row group.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+from core import storage
+from core.schema import CATEGORY, INT, SCHEMAS
+
+EXPORT_DIR = os.environ.get("EXPORT_DIR", "exports")
+PAGE_SIZE = int(os.environ.get("EXPORT_PAGE_SIZE", "2000"))
+CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", "20000"))
+FORMATS = ("csv", "parquet")
+BASE_COLUMNS = ("key", "user_name", "type", "result", "model_version", "timestamp")
+OTHER = "other"
+
+
+def iter_pages(client=None, path="diagnoses", page_size=PAGE_SIZE):
+    """
+    Các trang [(key, record)] tăng dần theo khóa, mỗi trang tối đa `page_size` bản ghi.
+    """
+    client = client or storage.get_client()
+    page = sorted((client.get(path, {"orderBy": "$key", "limitToFirst": page_size}) or {}).items())
+    while page:
+        yield page
+        if len(page) < page_size:
+            return
+        page = client.page_after(path, page[-1][0], page_size)
+
+
+# ==== BỐ CỤC CỘT ====
+def columns_for(kind):
+    """
+    [(tên cột, kiểu)] của file xuất cho loại `kind`; kiểu là "str", "int" hoặc "float".
+
+    Biến phân loại có hai cột: nhãn như trên form và mã số đưa vào mô hình.
+    """
+    columns = [(name, "str") for name in BASE_COLUMNS]
+    if kind not in SCHEMAS:
+        return columns + [("inputs", "str")]
+    for f in SCHEMAS[kind].features:
+        if f.dtype == CATEGORY:
+            columns += [(f.name, "str"), (f"{f.name}_code", "int")]
+        else:
+            columns.append((f.name, "int" if f.dtype == INT else "float"))
+    return columns
+
+
+def flatten(key, record, kind):
+    """
+    Một dòng (tuple theo `columns_for(kind)`); giá trị thiếu/không hợp lệ là None.
+    """
+    record = record if isinstance(record, dict) else {}
+    row = [key] + [None if record.get(name) is None else str(record[name]) for name in BASE_COLUMNS[1:]]
+    inputs = record.get("inputs")
+    inputs = inputs if isinstance(inputs, dict) else {}
+    if kind not in SCHEMAS:
+        return tuple(row + [json.dumps(inputs, ensure_ascii=False)])
+    for f in SCHEMAS[kind].features:
+        value = inputs.get(f.name)
+        try:
+            code = f.code(value) if value is not None else None
+        except ValueError:
+            code = None
+        if f.dtype == CATEGORY:
+            row += [None if value is None else str(value), code]
+        elif code is None or f.dtype != INT:
+            row.append(None if code is None else float(code))
+        else:
+            row.append(int(code) if float(code).is_integer() else None)
+    return tuple(row)
+
+
+# ==== GHI FILE ====
+class _CsvWriter:
+    def __init__(self, path, columns):
+        self._file = open(path, "w", encoding="utf-8-sig", newline="")
+        self._csv = csv.writer(self._file)
+        self._csv.writerow([name for name, _ in columns])
+
+    def write(self, rows):
+        self._csv.writerows(["" if v is None else v for v in row] for row in rows)
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path, columns):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Xuất Parquet cần cài pyarrow (pip install pyarrow)") from None
+        self._pa = pa
+        types = {"str": pa.string(), "int": pa.int64(), "float": pa.float64()}
+        self._schema = pa.schema([(name, types[kind]) for name, kind in columns])
+        self._writer = pq.ParquetWriter(path, self._schema, compression="zstd")
+
+    def write(self, rows):
+        arrays = [self._pa.array(list(values), type=field.type)
+                  for values, field in zip(zip(*rows), self._schema)]
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def export(out_dir, fmt="csv", client=None, path="diagnoses", page_size=PAGE_SIZE,
+           chunk_rows=CHUNK_ROWS, progress=None):
+    """
+    Xuất toàn bộ `path` vào `out_dir`, một file cho mỗi loại chẩn đoán (loại lạ vào "other").
+
+    `progress(số bản ghi đã đọc)` được gọi sau mỗi trang. Trả về {loại: (đường dẫn, số dòng)}.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Định dạng không hỗ trợ: {fmt!r}")
+    os.makedirs(out_dir, exist_ok=True)
+    writer_cls = _CsvWriter if fmt == "csv" else _ParquetWriter
+    writers, buffers, counts, paths = {}, {}, {}, {}
+    read = 0
+
+    def flush(kind):
+        if buffers[kind]:
+            writers[kind].write(buffers[kind])
+            counts[kind] += len(buffers[kind])
+            buffers[kind] = []
+
+    try:
+        for page in iter_pages(client, path, page_size):
+            for key, record in page:
+                kind = record.get("type") if isinstance(record, dict) else None
+                kind = kind if kind in SCHEMAS else OTHER
+                if kind not in writers:
+                    paths[kind] = os.path.join(out_dir, f"{path.strip('/').replace('/', '_')}_{kind}.{fmt}")
+                    writers[kind] = writer_cls(paths[kind], columns_for(kind))
+                    buffers[kind], counts[kind] = [], 0
+                buffers[kind].append(flatten(key, record, kind))
+                if len(buffers[kind]) >= chunk_rows:
+                    flush(kind)
+            read += len(page)
+            if progress is not None:
+                progress(read)
+        for kind in writers:
+            flush(kind)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return {kind: (paths[kind], counts[kind]) for kind in writers}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Xuất lịch sử chẩn đoán ra CSV/Parquet theo luồng.")
+    parser.add_argument("-o", "--out", default=EXPORT_DIR, help="thư mục đích")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--path", default="diagnoses")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE, help="số bản ghi mỗi truy vấn")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS,
+                        help="số dòng mỗi lần ghi (row group Parquet)")
+    args = parser.parse_args(argv)
+
+    def progress(n):
+        print(f"\rĐã đọc {n} bản ghi", end="", file=sys.stderr)
+
+    try:
+        files = export(args.out, args.format, path=args.path, page_size=args.page_size,
+                       chunk_rows=args.chunk_rows, progress=progress)
+    except RuntimeError as e:
+        parser.exit(1, f"{e}\n")
+    print(file=sys.stderr)
+    for kind, (file_path, rows) in sorted(files.items()):
+        print(f"{kind:<11} {rows:>9} dòng  {file_path}")
+
+
+if __name__ == "__main__":
+    main()
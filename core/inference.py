@@ -0,0 +1,120 @@
+"""
+Dự đoán theo lô cho ba mô hình chẩn đoán: tim mạch, trầm cảm, béo phì.
+
+Mỗi hàm `predict_*_batch` nhận ma trận đặc trưng 2 chiều (hoặc danh sách dict
+`inputs` như được lưu trong `diagnoses`), gọi `scaler.transform` + `predict`
+một lần cho mỗi khối và ánh xạ nhãn sang thông điệp bằng tra cứu mảng.
+"""
+import numpy as np
+
+from core.schema import DEPRESSION, HEART, OBESITY
+
+DEFAULT_CHUNK_SIZE = 4096
+
+UNKNOWN_RESULT = "Kết quả không xác định"
+
+# ==== THÔNG ĐIỆP KẾT QUẢ (chỉ số = nhãn dự đoán) ====
+HEART_MESSAGES = np.array([
+    "Chúc mừng bạn không có nguy cơ mắc bệnh tim mạch",
+    "Bạn có nguy cơ cao mắc bệnh tim mạch, hãy đi khám ngay!",
+], dtype=object)
+
+DEPRESSION_MESSAGES = np.array([
+    "Chúc mừng bạn không có nguy cơ trầm cảm",
+    "Bạn có nguy cơ trầm cảm, hãy đi gặp chuyên gia tâm lý!",
+], dtype=object)
+
+OBESITY_MESSAGES = np.array([
+    " Thiếu cân",
+    " Cân nặng bình thường",
+    " Thừa cân cấp độ I",
+    " Thừa cân cấp độ II",
+    " Béo phì loại I",
+    " Béo phì loại II",
+    " Béo phì loại III",
+], dtype=object)
+
+ALL_MESSAGES = list(HEART_MESSAGES) + list(DEPRESSION_MESSAGES) + list(OBESITY_MESSAGES)
+
+
+def _as_matrix(rows, schema):
+    """
+    Chuẩn hóa đầu vào thành ma trận 2 chiều (n_mẫu, n_đặc_trưng).
+
+    `rows` có thể là ma trận/danh sách đặc trưng đã mã hóa hoặc danh sách dict
+    `inputs`; dict được mã hóa qua schema của mô hình.
+    """
+    if isinstance(rows, np.ndarray):
+        X = rows
+    else:
+        rows = rows if isinstance(rows, (list, tuple)) else list(rows)
+        if rows and isinstance(rows[0], dict):
+            X, valid = schema.encode_many(rows)
+            if not valid.all():
+                bad = int(np.flatnonzero(~valid)[0])
+                schema.encode(rows[bad])  # ném ValueError với thông báo chi tiết
+            return X
+        X = np.asarray(rows, dtype=schema.dtype)
+    if X.ndim == 1:
+        X = X.reshape(1, -1)
+    if X.ndim != 2 or (X.size and X.shape[1] != len(schema)):
+        raise ValueError(f"Cần ma trận {len(schema)} cột, nhận được shape {X.shape}")
+    return X
+
+
+def predict_labels(model, X, scaler=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Trả về mảng nhãn dự đoán, mỗi khối `chunk_size` dòng chỉ gọi sklearn một lần.
+    """
+    n = X.shape[0]
+    labels = np.empty(n, dtype=np.int64)
+    for start in range(0, n, chunk_size):
+        block = X[start:start + chunk_size]
+        if scaler is not None:
+            # Scaler được huấn luyện trên float64, giữ độ chính xác như lúc fit
+            block = scaler.transform(block.astype(np.float64))
+        labels[start:start + len(block)] = model.predict(block)
+    return labels
+
+
+def _binary_messages(labels, messages):
+    # Giống logic cũ: 0 -> không có nguy cơ, mọi nhãn khác -> có nguy cơ
+    return messages[(labels != 0).astype(np.intp)]
+
+
+def _class_messages(labels, messages):
+    out = np.full(labels.shape, UNKNOWN_RESULT, dtype=object)
+    valid = (labels >= 0) & (labels < len(messages))
+    out[valid] = messages[labels[valid]]
+    return out
+
+
+# ==== API THEO LÔ ====
+def predict_heart_batch(model, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    X = _as_matrix(rows, HEART)
+    return _binary_messages(predict_labels(model, X, chunk_size=chunk_size), HEART_MESSAGES)
+
+
+def predict_depression_batch(model, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    X = _as_matrix(rows, DEPRESSION)
+    return _binary_messages(predict_labels(model, X, chunk_size=chunk_size), DEPRESSION_MESSAGES)
+
+
+def predict_obesity_batch(model, scaler, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    X = _as_matrix(rows, OBESITY)
+    labels = predict_labels(model, X, scaler=scaler, chunk_size=chunk_size)
+    return _class_messages(labels, OBESITY_MESSAGES)
+
+
+def predict_batch(kind, artifact, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Dự đoán theo loại chẩn đoán; `artifact` là mô hình (hoặc cặp (model, scaler) cho béo phì).
+    """
+    if kind == "heart":
+        return predict_heart_batch(artifact, rows, chunk_size)
+    if kind == "depression":
+        return predict_depression_batch(artifact, rows, chunk_size)
+    if kind == "obesity":
+        obesity_model, scaler = artifact
+        return predict_obesity_batch(obesity_model, scaler, rows, chunk_size)
+    raise ValueError(f"Loại chẩn đoán không hợp lệ: {kind!r}")
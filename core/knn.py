@@ -0,0 +1,321 @@
+"""
+Suy luận k láng giềng gần nhất không cần sklearn lúc chạy.
+
+`CompactKNN` giữ dữ liệu huấn luyện của một `KNeighborsClassifier` dưới dạng
+ma trận liên tục (float32 nếu chuyển đổi không mất chính xác) và tính khoảng
+cách theo khối bằng phép vector: mỗi khối truy vấn cộng dồn |x - q|^p theo
+từng cột (float64, cùng thứ tự cộng với sklearn nên khoảng cách trùng từng bit),
+bộ nhớ tạm chỉ là (số truy vấn trong khối × số mẫu huấn luyện).
+
+Khi nhiều điểm cách đều nhau ở ranh giới k (thường gặp với đặc trưng số
+nguyên), tập láng giềng phụ thuộc cách sklearn duyệt cây. Các dòng hòa như vậy
+được giải lại bằng cách mô phỏng đúng thuật toán của estimator gốc (duyệt
+BallTree/KDTree theo chiều sâu với cùng max-heap) nên nhãn trả về giống hệt
+`estimator.predict`. Với estimator fit bằng brute, sklearn chọn điểm hòa theo
+backend nội bộ nên chỉ các dòng hòa ở ranh giới k có thể khác.
+"""
+import math
+import warnings
+
+import numpy as np
+
+# Số phần tử tối đa của ma trận khoảng cách tạm cho mỗi khối truy vấn
+BLOCK_ELEMENTS = 1 << 16
+# Trên ngưỡng này (số mẫu huấn luyện) mỗi truy vấn duyệt cây thay vì tính mọi khoảng cách
+TREE_MIN_SAMPLES = 200_000
+
+
+class CompactKNN:
+    def __init__(self, fit_X, y, classes, n_neighbors, p=2, weights="uniform",
+                 fit_method="brute", tree=None, dtype=None, ordered=False):
+        # ordered=True: fit_X/y đã theo thứ tự lưu trữ, theo cột (vd. mảng mmap từ
+        # core.compiled) và được dùng nguyên, không sao chép
+        y = np.asarray(y, dtype=np.intp)
+        if fit_method in ("ball_tree", "kd_tree") and tree is None:
+            raise ValueError(f"Cần mảng cây cho fit_method={fit_method!r}")
+        if not ordered:
+            fit_X = np.asarray(fit_X, dtype=np.float64)
+            if tree is not None:
+                # Lưu theo thứ tự idx_array để mỗi lá là một đoạn liên tục
+                fit_X, y = fit_X[tree["idx_array"]], y[tree["idx_array"]]
+            if dtype is None:
+                # float32 chỉ khi dữ liệu huấn luyện biểu diễn chính xác được
+                dtype = np.float32 if np.array_equal(fit_X.astype(np.float32), fit_X) else np.float64
+        # Lưu theo cột: mỗi cột là một mảng liên tục
+        self.fit_X = np.asfortranarray(fit_X, dtype=dtype)
+        self._columns = [self.fit_X[:, j] for j in range(self.fit_X.shape[1])]
+        self.y = y
+        self.classes_ = np.asarray(classes)
+        self.n_neighbors = int(n_neighbors)
+        self.p = float(p)
+        self.weights = weights
+        self.fit_method = fit_method
+        # tree: dict idx_array, idx_start, idx_end, is_leaf, radius, node_bounds
+        self.tree = tree
+        self._nodes = None
+
+    @classmethod
+    def from_estimator(cls, knn, dtype=None):
+        """
+        Tạo từ một `KNeighborsClassifier` đã fit (metric minkowski/manhattan/euclidean).
+        """
+        metric = knn.effective_metric_
+        params = knn.effective_metric_params_ or {}
+        if metric == "manhattan":
+            p = 1
+        elif metric == "euclidean":
+            p = 2
+        elif metric == "minkowski":
+            p = params.get("p", knn.p)
+        else:
+            raise ValueError(f"Metric chưa được hỗ trợ: {metric!r}")
+        if knn.weights not in ("uniform", "distance"):
+            raise ValueError(f"weights chưa được hỗ trợ: {knn.weights!r}")
+        if knn.outputs_2d_:
+            raise ValueError("Chỉ hỗ trợ bài toán một đầu ra")
+        tree = None
+        if knn._fit_method in ("ball_tree", "kd_tree"):
+            _, idx_array, node_data, node_bounds = knn._tree.get_arrays()
+            tree = {
+                "idx_array": np.asarray(idx_array, dtype=np.intp),
+                "idx_start": np.asarray(node_data["idx_start"], dtype=np.intp),
+                "idx_end": np.asarray(node_data["idx_end"], dtype=np.intp),
+                "is_leaf": np.asarray(node_data["is_leaf"], dtype=bool),
+                "radius": np.asarray(node_data["radius"], dtype=np.float64),
+                "node_bounds": np.asarray(node_bounds, dtype=np.float64),
+            }
+        elif knn._fit_method != "brute":
+            raise ValueError(f"fit_method chưa được hỗ trợ: {knn._fit_method!r}")
+        return cls(knn._fit_X, knn._y, knn.classes_, knn.n_neighbors, p=p,
+                   weights=knn.weights, fit_method=knn._fit_method, tree=tree, dtype=dtype)
+
+    @property
+    def nbytes(self):
+        n = self.fit_X.nbytes + self.y.nbytes
+        if self.tree:
+            n += sum(a.nbytes for a in self.tree.values())
+        return n
+
+    # ==== KHOẢNG CÁCH ====
+    def _rdist_to_dist(self, rdist):
+        if self.p == 1:
+            return rdist
+        if self.p == 2:
+            return np.sqrt(rdist)
+        return np.power(rdist, 1.0 / self.p)
+
+    def _reduced_distances(self, Q):
+        """
+        Khoảng cách rút gọn (tổng |x - q|^p, chưa lấy căn) từ khối Q tới mọi điểm huấn luyện.
+        """
+        D = np.zeros((len(Q), len(self.fit_X)), dtype=np.float64)
+        tmp = np.empty_like(D)
+        for j, col in enumerate(self._columns):
+            np.subtract(Q[:, j, None], col, out=tmp)
+            np.abs(tmp, out=tmp)
+            if self.p == 2:
+                np.multiply(tmp, tmp, out=tmp)
+            elif self.p != 1:
+                np.power(tmp, self.p, out=tmp)
+            D += tmp
+        return D
+
+    # ==== TÌM LÁNG GIỀNG ====
+    def kneighbors(self, X, block_size=None):
+        """
+        Trả về (khoảng cách, chỉ số) của k láng giềng, sắp tăng dần theo khoảng cách.
+        """
+        rdist, pos = self._kneighbors(X, block_size)
+        if self.tree is not None:
+            pos = self.tree["idx_array"][pos]
+        return self._rdist_to_dist(rdist), pos
+
+    def _kneighbors(self, X, block_size=None):
+        # Khoảng cách rút gọn và vị trí (theo thứ tự lưu trữ) của k láng giềng
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n, k = len(X), self.n_neighbors
+        n_fit = len(self.fit_X)
+        if self.tree is not None and n_fit >= TREE_MIN_SAMPLES:
+            pos = np.empty((n, k), dtype=np.intp)
+            rdist = np.empty((n, k), dtype=np.float64)
+            for t in range(n):
+                pos[t], rdist[t] = self._tree_query(X[t])
+            order = np.argsort(rdist, axis=1, kind="stable")
+            r = np.arange(n)[:, None]
+            return rdist[r, order], pos[r, order]
+        block = block_size or max(1, BLOCK_ELEMENTS // max(1, n_fit))
+        rdist = np.empty((n, k), dtype=np.float64)
+        ind = np.empty((n, k), dtype=np.intp)
+        all_rows = np.arange(min(block, n))[:, None]
+        for start in range(0, n, block):
+            Q = X[start:start + block]
+            D = self._reduced_distances(Q)
+            r = all_rows[:len(Q)]
+            part = np.argpartition(D, k - 1, axis=1)[:, :k]
+            dk = D[r, part]
+            if self.tree is not None:
+                # Dòng hòa ở ranh giới k: nhiều hơn k điểm có khoảng cách <= khoảng cách thứ k
+                kth = dk.max(axis=1)
+                for t in np.flatnonzero(np.count_nonzero(D <= kth[:, None], axis=1) > k):
+                    part[t], _ = self._tree_query(Q[t], D[t])
+                    dk[t] = D[t, part[t]]
+            order = np.argsort(dk, axis=1, kind="stable")
+            ind[start:start + len(Q)] = part[r, order]
+            rdist[start:start + len(Q)] = dk[r, order]
+        return rdist, ind
+
+    def _node_lists(self):
+        # Dữ liệu cây dạng list Python: duyệt từng nút nhanh hơn nhiều so với chỉ mục numpy
+        if self._nodes is None:
+            t = self.tree
+            self._nodes = (t["is_leaf"].tolist(), t["idx_start"].tolist(), t["idx_end"].tolist(),
+                           t["radius"].tolist(), t["node_bounds"].tolist())
+        return self._nodes
+
+    def _min_rdist(self, node, pt):
+        # Cộng tuần tự theo cột, cùng công thức với sklearn để trùng từng bit
+        _, _, _, radius, bounds = self._node_lists()
+        p = self.p
+        rdist = 0.0
+        if self.fit_method == "kd_tree":
+            for x, lo, hi in zip(pt, bounds[0][node], bounds[1][node]):
+                d_lo = lo - x
+                d_hi = x - hi
+                rdist += (0.5 * ((d_lo + abs(d_lo)) + (d_hi + abs(d_hi)))) ** p
+            return rdist
+        # ball_tree: max(0, dist(pt, tâm) - bán kính) rồi đổi sang khoảng cách rút gọn
+        for x, c in zip(pt, bounds[0][node]):
+            rdist += abs(x - c) ** p
+        if p == 1:
+            dist = rdist
+        elif p == 2:
+            dist = math.sqrt(rdist)
+        else:
+            dist = rdist ** (1.0 / p)
+        dist = max(0.0, dist - radius[node])
+        return dist if p == 1 else dist ** p
+
+    def _leaf_rdist(self, pt, start, end):
+        M = np.abs(self.fit_X[start:end] - pt)
+        if self.p == 2:
+            M *= M
+        elif self.p != 1:
+            M **= self.p
+        acc = M[:, 0].copy()
+        for j in range(1, M.shape[1]):
+            acc += M[:, j]
+        return acc
+
+    def _tree_query(self, pt, rdist=None):
+        """
+        Mô phỏng BinaryTree.query (duyệt theo chiều sâu) của sklearn cho một điểm,
+        trả về (vị trí, khoảng cách rút gọn) của k láng giềng đúng như cây gốc
+        chọn. `rdist` là khoảng cách rút gọn tới mọi điểm huấn luyện nếu đã tính
+        sẵn; nếu không, chỉ các lá được duyệt mới được tính.
+        """
+        k = self.n_neighbors
+        heap_d = [math.inf] * k
+        heap_i = [0] * k
+        is_leaf, idx_start, idx_end, _, _ = self._node_lists()
+        n_nodes = len(is_leaf)
+        pt_arr, pt = pt, pt.tolist()
+
+        def push(val, i_val):
+            # Max-heap như NeighborsHeap._push
+            if val >= heap_d[0]:
+                return
+            i = 0
+            while True:
+                ic1 = 2 * i + 1
+                ic2 = ic1 + 1
+                if ic1 >= k:
+                    break
+                if ic2 >= k:
+                    if heap_d[ic1] > val:
+                        i_swap = ic1
+                    else:
+                        break
+                elif heap_d[ic1] >= heap_d[ic2]:
+                    if val < heap_d[ic1]:
+                        i_swap = ic1
+                    else:
+                        break
+                else:
+                    if val < heap_d[ic2]:
+                        i_swap = ic2
+                    else:
+                        break
+                heap_d[i] = heap_d[i_swap]
+                heap_i[i] = heap_i[i_swap]
+                i = i_swap
+            heap_d[i] = val
+            heap_i[i] = i_val
+
+        def visit(node, lower_bound):
+            if lower_bound > heap_d[0]:
+                return
+            if is_leaf[node]:
+                start, end = idx_start[node], idx_end[node]
+                vals = rdist[start:end] if rdist is not None else self._leaf_rdist(pt_arr, start, end)
+                # Gốc heap chỉ giảm dần nên điểm >= gốc hiện tại chắc chắn bị bỏ qua
+                keep = np.flatnonzero(vals < heap_d[0])
+                for i, val in zip(keep.tolist(), vals[keep].tolist()):
+                    push(val, start + i)
+                return
+            i1 = 2 * node + 1
+            i2 = i1 + 1
+            lb1 = self._min_rdist(i1, pt) if i1 < n_nodes else math.inf
+            lb2 = self._min_rdist(i2, pt) if i2 < n_nodes else math.inf
+            if lb1 <= lb2:
+                visit(i1, lb1)
+                visit(i2, lb2)
+            else:
+                visit(i2, lb2)
+                visit(i1, lb1)
+
+        visit(0, self._min_rdist(0, pt))
+        return np.asarray(heap_i, dtype=np.intp), np.asarray(heap_d, dtype=np.float64)
+
+    # ==== DỰ ĐOÁN ====
+    def predict_proba(self, X):
+        rdist, pos = self._kneighbors(X)
+        dist = self._rdist_to_dist(rdist)
+        labels = self.y[pos]
+        if self.weights == "distance":
+            with np.errstate(divide="ignore"):
+                w = 1.0 / dist
+            inf_mask = np.isinf(w)
+            inf_row = inf_mask.any(axis=1)
+            w[inf_row] = inf_mask[inf_row]
+        else:
+            w = np.ones_like(dist)
+        votes = np.zeros((len(labels), len(self.classes_)))
+        np.add.at(votes, (np.arange(len(labels))[:, None], labels), w)
+        votes /= votes.sum(axis=1, keepdims=True)
+        return votes
+
+    def predict(self, X):
+        # Hòa phiếu: argmax chọn lớp có chỉ số nhỏ nhất, như sklearn
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def compact_if_knn(model, sample=256):
+    """
+    Thay `KNeighborsClassifier` bằng `CompactKNN` nếu dự đoán trùng khớp trên
+    một mẫu dữ liệu huấn luyện; các mô hình khác được trả về nguyên vẹn.
+    """
+    if type(model).__name__ != "KNeighborsClassifier":
+        return model
+    try:
+        compact = CompactKNN.from_estimator(model)
+    except ValueError:
+        return model
+    X = np.asarray(model._fit_X[:sample])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # mô hình fit với tên cột
+        expected = model.predict(X)
+    if not np.array_equal(compact.predict(X), expected):
+        return model
+    return compact
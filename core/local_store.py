@@ -0,0 +1,719 @@
+"""
+Kho lưu trữ cục bộ thay cho Firebase RTDB, cùng giao diện với `storage.FirebaseClient`
+(get/push/put/update/delete/page_before/page_after), không cần mạng.
+
+    STORAGE_BACKEND=local LOCAL_STORE_DIR=.store streamlit run app.py
+    python -m core.local_store import firebase_export.json
+    python -m core.local_store compact
+    python -m core.local_store info
+
+Mọi lần ghi được nối vào `log.jsonl` (mỗi lời gọi một dòng, gồm các phép gán
+tuyệt đối nên phát lại nhiều lần vẫn cho cùng kết quả). Khi log đủ dài, cây
+`diagnoses` được nén thành một thư mục cột (`diagnoses.<thế hệ>/`):
+
+- khóa (bytes cố định, sắp tăng dần), mã loại chẩn đoán (int8), thời điểm (int64 giây);
+- `user_name`, `result` và `model_version` (tùy chọn, -1 nếu không có) mã hóa
+  từ điển (int32 + danh sách chuỗi);
+- `inputs` tách theo mô hình, mỗi đặc trưng một mảng: biến phân loại là vị trí
+  nhãn (int8), biến số là int64/float64;
+- bản ghi không biểu diễn chính xác được bằng cột (thiếu/thừa trường, nhãn lạ,
+  kiểu số khác schema...) giữ nguyên trong `overflow.json`.
+
+Các mảng là file .npy đọc bằng memory map (`open_columns`), nên trang thống kê
+và lịch sử quét cột mà không chép dữ liệu hay dựng lại dict. Các nhánh khác
+(`ips`, ...) nhỏ và được chụp vào `tree.json`. Kho dành cho một tiến trình ghi.
+"""
+import argparse
+import copy
+import json
+import os
+import shutil
+import sys
+import threading
+
+import numpy as np
+
+from core import storage
+from core.rtdb_stub import MemoryTree, query
+from core.schema import CATEGORY, INT, SCHEMAS
+
+STORE_DIR = os.environ.get("LOCAL_STORE_DIR", ".store")
+COMPACT_EVERY = int(os.environ.get("LOCAL_STORE_COMPACT_EVERY", "5000"))
+
+COLLECTION = "diagnoses"
+FIELDS = ("user_name", "type", "inputs", "result", "timestamp")
+OPTIONAL_FIELDS = ("model_version",)
+KINDS = list(SCHEMAS)
+OTHER_KIND = len(KINDS)
+NAT = np.datetime64("NaT", "s").astype(np.int64)
+FORMAT_VERSION = 2
+
+
+# ==== MÃ HÓA BẢN GHI ====
+def _parse_time(value):
+    if not isinstance(value, str):
+        return NAT
+    try:
+        return int(np.datetime64(value, "s").astype(np.int64))
+    except ValueError:
+        return NAT
+
+
+def _format_time(epoch):
+    return str(np.datetime64(int(epoch), "s")).replace("T", " ")
+
+
+def _feature_layout(kind):
+    """
+    [(tên, kiểu cột, danh sách nhãn)] của các đặc trưng trong `inputs` cho mô hình `kind`.
+    """
+    return [(f.name, "int8" if f.dtype == CATEGORY else "int64" if f.dtype == INT else "float64",
+             f.labels if f.dtype == CATEGORY else None)
+            for f in SCHEMAS[kind].features]
+
+
+def _encode_inputs(layout, inputs):
+    """
+    Tuple giá trị cột của `inputs`, hoặc None nếu không giải mã lại được đúng như cũ.
+    """
+    if not isinstance(inputs, dict) or len(inputs) != len(layout):
+        return None
+    row = []
+    for name, dtype, labels in layout:
+        value = inputs.get(name)
+        if labels is not None:
+            if not isinstance(value, str) or value not in labels:
+                return None
+            row.append(labels.index(value))
+        elif dtype == "int64":
+            if type(value) is not int or not -2**63 <= value < 2**63:
+                return None
+            row.append(value)
+        elif type(value) is float:
+            row.append(value)
+        else:
+            return None
+    return tuple(row)
+
+
+class _Encoder:
+    """
+    Gom các bản ghi mới thành cột; từ điển chuỗi dùng chung với phần đã nén.
+    """
+
+    def __init__(self, users, results, versions, layouts):
+        self.users = list(users)
+        self.results = list(results)
+        self.versions = list(versions)
+        self._user_codes = {u: i for i, u in enumerate(self.users)}
+        self._result_codes = {r: i for i, r in enumerate(self.results)}
+        self._version_codes = {v: i for i, v in enumerate(self.versions)}
+        self.layouts = layouts
+        self.keys, self.types, self.user, self.result, self.time, self.pos = [], [], [], [], [], []
+        self.version = []
+        self.inputs = {kind: [] for kind in KINDS}
+        self.overflow = {}
+
+    def _code(self, codes, labels, value):
+        value = value if isinstance(value, str) else "" if value is None else json.dumps(value, ensure_ascii=False)
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(labels)
+            labels.append(value)
+        return code
+
+    def add(self, key, record):
+        fields = record if isinstance(record, dict) else {}
+        kind = fields.get("type")
+        kind_code = KINDS.index(kind) if kind in KINDS else OTHER_KIND
+        epoch = _parse_time(fields.get("timestamp"))
+        self.keys.append(key)
+        self.types.append(kind_code)
+        self.user.append(self._code(self._user_codes, self.users, fields.get("user_name")))
+        self.result.append(self._code(self._result_codes, self.results, fields.get("result")))
+        self.time.append(epoch)
+        version = fields.get("model_version")
+        self.version.append(self._code(self._version_codes, self.versions, version)
+                            if isinstance(version, str) else -1)
+
+        row = None
+        extra = set(fields) - set(FIELDS)
+        if (kind_code != OTHER_KIND and all(f in fields for f in FIELDS)
+                and extra <= set(OPTIONAL_FIELDS) and all(isinstance(fields[f], str) for f in extra)
+                and isinstance(fields["user_name"], str) and isinstance(fields["result"], str)
+                and epoch != NAT and _format_time(epoch) == fields["timestamp"]):
+            row = _encode_inputs(self.layouts[kind], fields["inputs"])
+        if row is None:
+            self.overflow[key] = record
+            self.pos.append(-1)
+        else:
+            self.pos.append(len(self.inputs[kind]))
+            self.inputs[kind].append(row)
+
+
+# ==== ĐỌC CỘT ====
+class DiagnosisColumns:
+    """
+    Ảnh chụp dạng cột (chỉ đọc) của `diagnoses`; các mảng là memmap khi mở từ đĩa.
+
+    `keys` (bytes), `types` (mã theo KINDS, OTHER_KIND nếu lạ), `user_codes`/`users`,
+    `result_codes`/`results`, `version_codes`/`versions` (-1: không có `model_version`),
+    `times` (giây, NAT nếu không đọc được) có một dòng cho mỗi bản ghi, sắp theo khóa. `pos[i]` là vị trí của dòng i trong các cột
+    `inputs(kind)` (-1 nếu bản ghi nằm trong `overflow`).
+    """
+
+    ARRAYS = ("keys", "types", "user_codes", "result_codes", "version_codes", "times", "pos")
+
+    def __init__(self, arrays, users, results, versions, layouts, inputs, overflow, path=None):
+        self.keys = arrays["keys"]
+        self.types = arrays["types"]
+        self.user_codes = arrays["user_codes"]
+        self.result_codes = arrays["result_codes"]
+        self.version_codes = arrays["version_codes"]
+        self.times = arrays["times"]
+        self.pos = arrays["pos"]
+        self.users = users
+        self.results = results
+        self.versions = versions
+        self.layouts = layouts
+        self._inputs = inputs
+        self.overflow = overflow
+        self.path = path
+
+    @classmethod
+    def empty(cls):
+        arrays = {
+            "keys": np.zeros(0, dtype="S20"), "types": np.zeros(0, dtype=np.int8),
+            "user_codes": np.zeros(0, dtype=np.int32), "result_codes": np.zeros(0, dtype=np.int32),
+            "version_codes": np.zeros(0, dtype=np.int32),
+            "times": np.zeros(0, dtype=np.int64), "pos": np.zeros(0, dtype=np.int32),
+        }
+        layouts = {kind: _feature_layout(kind) for kind in KINDS}
+        inputs = {kind: {name: np.zeros(0, dtype=dtype) for name, dtype, _ in layouts[kind]}
+                  for kind in KINDS}
+        return cls(arrays, [], [], [], layouts, inputs, {})
+
+    @classmethod
+    def open(cls, path, mmap_mode="r"):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") not in (1, FORMAT_VERSION):
+            raise ValueError(f"Không đọc được định dạng cột phiên bản {meta.get('version')} tại {path}")
+        load = lambda name: np.load(os.path.join(path, name + ".npy"), mmap_mode=mmap_mode)
+        arrays = {name: load(name) for name in cls.ARRAYS if name != "version_codes"}
+        # Phiên bản 1 chưa có cột model_version
+        arrays["version_codes"] = (load("version_codes") if meta["version"] > 1
+                                   else np.full(meta["rows"], -1, dtype=np.int32))
+        layouts = {kind: [tuple(item) for item in layout] for kind, layout in meta["layouts"].items()}
+        inputs = {kind: {name: load(f"{kind}.{name}") for name, _, _ in layout}
+                  for kind, layout in layouts.items()}
+        with open(os.path.join(path, "overflow.json"), encoding="utf-8") as f:
+            overflow = json.load(f)
+        return cls(arrays, meta["users"], meta["results"], meta.get("versions", []), layouts,
+                   inputs, overflow, path)
+
+    def save(self, path):
+        os.makedirs(path)
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, name + ".npy"), getattr(self, name))
+        for kind, columns in self._inputs.items():
+            for name, values in columns.items():
+                np.save(os.path.join(path, f"{kind}.{name}.npy"), values)
+        with open(os.path.join(path, "overflow.json"), "w", encoding="utf-8") as f:
+            json.dump(self.overflow, f, ensure_ascii=False)
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": FORMAT_VERSION, "rows": len(self), "users": self.users,
+                       "results": self.results, "versions": self.versions,
+                       "layouts": self.layouts}, f, ensure_ascii=False)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def inputs(self, kind):
+        """
+        {tên đặc trưng: mảng} cho các bản ghi đều đặn của mô hình `kind`.
+        """
+        return self._inputs[kind]
+
+    def find(self, key):
+        """
+        Chỉ số dòng của `key`, hoặc None.
+        """
+        k = key.encode()
+        i = int(np.searchsorted(self.keys, k))
+        return i if i < len(self.keys) and self.keys[i] == k else None
+
+    def record(self, i):
+        """
+        Dựng lại dict bản ghi của dòng `i` (đúng như lúc ghi).
+        """
+        pos = int(self.pos[i])
+        if pos < 0:
+            return copy.deepcopy(self.overflow[self.keys[i].decode()])
+        kind = KINDS[self.types[i]]
+        columns = self._inputs[kind]
+        inputs = {}
+        for name, dtype, labels in self.layouts[kind]:
+            value = columns[name][pos]
+            inputs[name] = labels[value] if labels is not None else value.item()
+        record = {
+            "user_name": self.users[self.user_codes[i]],
+            "type": kind,
+            "inputs": inputs,
+            "result": self.results[self.result_codes[i]],
+            "timestamp": _format_time(self.times[i]),
+        }
+        if self.version_codes[i] >= 0:
+            record["model_version"] = self.versions[self.version_codes[i]]
+        return record
+
+    def records(self, rows):
+        """
+        {key: record} cho các dòng `rows` (mảng chỉ số tăng dần), giải mã theo cột.
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        keys = [k.decode() for k in self.keys[rows].tolist()]
+        types = self.types[rows].tolist()
+        users = [self.users[c] for c in self.user_codes[rows].tolist()]
+        results = [self.results[c] for c in self.result_codes[rows].tolist()]
+        versions = [self.versions[c] if c >= 0 else None for c in self.version_codes[rows].tolist()]
+        times = [t.replace("T", " ") for t in self.times[rows].astype("datetime64[s]").astype(str).tolist()]
+        pos = self.pos[rows].tolist()
+        # Cột inputs của từng mô hình chuyển sang list một lần cho các dòng cần đọc
+        inputs = {}
+        for k, kind in enumerate(KINDS):
+            sel = self.pos[rows][self.types[rows] == k]
+            sel = sel[sel >= 0]
+            if not len(sel):
+                continue
+            columns = []
+            for name, _, labels in self.layouts[kind]:
+                values = self._inputs[kind][name][sel].tolist()
+                columns.append((name, [labels[v] for v in values] if labels is not None else values))
+            inputs[kind] = dict(zip(sel.tolist(), (
+                dict(zip([name for name, _ in columns], vals))
+                for vals in zip(*[values for _, values in columns]))))
+        out = {}
+        for key, t, user, result, version, ts, p in zip(keys, types, users, results, versions, times, pos):
+            if p < 0:
+                out[key] = copy.deepcopy(self.overflow[key])
+                continue
+            kind = KINDS[t]
+            out[key] = {"user_name": user, "type": kind, "inputs": dict(inputs[kind][p]),
+                        "result": result, "timestamp": ts}
+            if version is not None:
+                out[key]["model_version"] = version
+        return out
+
+    def nbytes(self):
+        total = sum(getattr(self, name).nbytes for name in self.ARRAYS)
+        return total + sum(a.nbytes for columns in self._inputs.values() for a in columns.values())
+
+    def merge(self, changes):
+        """
+        Bảng cột mới = dòng hiện có không bị `changes` ({key: record|None}) thay thế,
+        cộng các bản ghi trong `changes`; chỉ bản ghi mới phải mã hóa từng dòng.
+        """
+        keep = np.ones(len(self), dtype=bool)
+        if changes:
+            keep &= ~np.isin(self.keys, np.array([k.encode() for k in changes], dtype="S"))
+        layouts = {kind: _feature_layout(kind) for kind in KINDS}
+        # Dòng cũ chỉ giữ cột inputs nếu bố cục đặc trưng không đổi
+        compatible = {kind: [tuple(x) for x in self.layouts.get(kind, [])] == [tuple(x) for x in layouts[kind]]
+                      for kind in KINDS}
+        kept = np.flatnonzero(keep)
+        enc = _Encoder(self.users, self.results, self.versions, layouts)
+        for i in kept[~np.isin(self.types[kept], [KINDS.index(k) for k in KINDS if compatible[k]])
+                      & (self.pos[kept] >= 0)]:
+            # Bố cục đổi: mã hóa lại các dòng cũ của mô hình đó
+            enc.add(self.keys[i].decode(), self.record(i))
+            keep[i] = False
+        kept = np.flatnonzero(keep)
+        for key in sorted(changes):
+            if changes[key] is not None:
+                enc.add(key, changes[key])
+
+        width = max([self.keys.dtype.itemsize] + [len(k.encode()) for k in enc.keys])
+        keys = np.concatenate([self.keys[kept].astype(f"S{width}"), np.array(enc.keys, dtype=f"S{width}")])
+        types = np.concatenate([self.types[kept], np.array(enc.types, dtype=np.int8)])
+        user_codes = np.concatenate([self.user_codes[kept], np.array(enc.user, dtype=np.int32)])
+        result_codes = np.concatenate([self.result_codes[kept], np.array(enc.result, dtype=np.int32)])
+        version_codes = np.concatenate([self.version_codes[kept], np.array(enc.version, dtype=np.int32)])
+        times = np.concatenate([self.times[kept], np.array(enc.time, dtype=np.int64)])
+        old_pos = np.array(self.pos[kept], dtype=np.int64)
+        new_pos = np.array(enc.pos, dtype=np.int64)
+
+        order = np.argsort(keys, kind="stable")
+        keys, types, user_codes, result_codes, version_codes, times = (
+            a[order] for a in (keys, types, user_codes, result_codes, version_codes, times))
+        # Vị trí nguồn trong cột ghép (cột cũ rồi tới cột mới) của từng dòng
+        pos = np.full(len(keys), -1, dtype=np.int32)
+        inputs = {}
+        for k, kind in enumerate(KINDS):
+            old_columns = self._inputs.get(kind, {})
+            n_old = len(next(iter(old_columns.values()))) if old_columns and compatible[kind] else 0
+            source = np.concatenate([old_pos, np.where(new_pos >= 0, new_pos + n_old, -1)])[order]
+            rows = np.flatnonzero((types == k) & (source >= 0))
+            pos[rows] = np.arange(len(rows), dtype=np.int32)
+            new_rows = enc.inputs[kind]
+            inputs[kind] = {}
+            for j, (name, dtype, _) in enumerate(layouts[kind]):
+                new_values = np.array([r[j] for r in new_rows], dtype=dtype)
+                column = np.concatenate([old_columns[name][:n_old], new_values]) if n_old else new_values
+                inputs[kind][name] = column[source[rows]]
+
+        # Bỏ chuỗi không còn dùng trong từ điển
+        users, user_codes = _prune(enc.users, user_codes)
+        results, result_codes = _prune(enc.results, result_codes)
+        versions, version_codes = _prune(enc.versions, version_codes)
+        overflow = {key: record for key, record in self.overflow.items()
+                    if key not in changes}
+        overflow.update(enc.overflow)
+        arrays = {"keys": keys, "types": types, "user_codes": user_codes,
+                  "result_codes": result_codes, "version_codes": version_codes,
+                  "times": times, "pos": pos}
+        return DiagnosisColumns(arrays, users, results, versions, layouts, inputs, overflow)
+
+
+def _prune(labels, codes):
+    """
+    Bỏ nhãn không còn dùng; mã âm (không có giá trị) giữ nguyên -1.
+    """
+    codes = np.asarray(codes)
+    present = codes >= 0
+    used, inverse = np.unique(codes[present], return_inverse=True)
+    out = np.full(len(codes), -1, dtype=np.int32)
+    out[present] = inverse
+    return [labels[i] for i in used], out
+
+
+def open_columns(directory=STORE_DIR):
+    """
+    Mở (memory map, chỉ đọc) thế hệ cột hiện hành trong `directory`, hoặc bảng rỗng.
+
+    Chỉ gồm phần đã nén; các ghi sau lần nén cuối còn trong log, dùng
+    `LocalStore.columns()` nếu cần dữ liệu mới nhất.
+    """
+    try:
+        with open(os.path.join(directory, "CURRENT"), encoding="utf-8") as f:
+            generation = f.read().strip()
+    except FileNotFoundError:
+        return DiagnosisColumns.empty()
+    return DiagnosisColumns.open(os.path.join(directory, generation))
+
+
+# ==== KHO ====
+class LocalStore:
+    """
+    Thay thế `storage.FirebaseClient` bằng file cục bộ; đường dẫn và kết quả trả
+    về giống REST của RTDB (kể cả truy vấn orderBy/limitTo... và giá trị máy chủ `.sv`).
+    """
+
+    def __init__(self, directory=STORE_DIR, compact_every=COMPACT_EVERY, fsync=False):
+        self.directory = directory
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._tree = MemoryTree()
+        self._changes = {}  # key -> record | None (đã xóa), ghi sau lần nén cuối
+        self._log_entries = 0
+        self._compactions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._base = open_columns(directory)
+        tree_path = os.path.join(directory, "tree.json")
+        if os.path.exists(tree_path):
+            with open(tree_path, encoding="utf-8") as f:
+                self._tree.root = json.load(f)
+        self._log_path = os.path.join(directory, "log.jsonl")
+        self._replay_log()
+        self._log = open(self._log_path, "a", encoding="utf-8")
+
+    # ==== LOG ====
+    def _replay_log(self):
+        if not os.path.exists(self._log_path):
+            return
+        with open(self._log_path, "rb") as f:
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                sets = json.loads(line)["sets"]
+            except (ValueError, KeyError):
+                continue
+            for path, value in sets:
+                self._set(MemoryTree._parts(path), value)
+            self._log_entries += 1
+        if end != len(data):
+            # Dòng ghi dở khi tiến trình bị dừng
+            with open(self._log_path, "r+b") as f:
+                f.truncate(end)
+
+    def _write(self, sets):
+        """
+        Áp dụng các phép gán [(parts, giá trị đã giải .sv)] rồi ghi một dòng log.
+        """
+        for parts, value in sets:
+            self._set(parts, value)
+        self._log.write(json.dumps({"sets": [["/".join(p), v] for p, v in sets]}, ensure_ascii=False) + "\n")
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+        self._log_entries += 1
+        if self.compact_every and self._log_entries >= self.compact_every:
+            self.compact()
+
+    # ==== CÂY TRONG BỘ NHỚ ====
+    def _record(self, key):
+        if key in self._changes:
+            return self._changes[key]
+        i = self._base.find(key)
+        return None if i is None else self._base.record(i)
+
+    def _live_keys(self, lo=None, hi=None, first=None, last=None):
+        """
+        Các khóa còn sống trong [lo, hi], sắp tăng dần; chỉ lấy `first`/`last` khóa đầu/cuối.
+        """
+        base = self._base.keys
+        start = 0 if lo is None else int(np.searchsorted(base, lo.encode(), side="left"))
+        stop = len(base) if hi is None else int(np.searchsorted(base, hi.encode(), side="right"))
+        # Các khóa bị thay thế đều nằm trong _changes nên lấy dư len(_changes) là đủ
+        extra = len(self._changes)
+        if last is not None:
+            start = max(start, stop - last - extra)
+        if first is not None:
+            stop = min(stop, start + first + extra)
+        keys = [k.decode() for k in base[start:stop]]
+        keys = [k for k in keys if k not in self._changes]
+        keys += [k for k, v in self._changes.items()
+                 if v is not None and (lo is None or k >= lo) and (hi is None or k <= hi)]
+        keys.sort()
+        if last is not None:
+            keys = keys[-last:] if last else []
+        if first is not None:
+            keys = keys[:first]
+        return keys
+
+    def _collection(self, keys=None):
+        if keys is None:
+            base = self._base
+            if self._changes:
+                keep = ~np.isin(base.keys, np.array([k.encode() for k in self._changes], dtype="S"))
+                rows = np.flatnonzero(keep)
+            else:
+                rows = np.arange(len(base))
+            out = base.records(rows)
+            out.update((k, copy.deepcopy(v)) for k, v in self._changes.items() if v is not None)
+            return dict(sorted(out.items()))
+        # Khóa đọc từ cột được giải mã theo lô; bản ghi trong _changes được sao chép
+        base_keys = [k for k in keys if k not in self._changes]
+        rows = np.searchsorted(self._base.keys, np.array([k.encode() for k in base_keys], dtype="S"))
+        out = self._base.records(rows) if base_keys else {}
+        return {k: out[k] if k in out else copy.deepcopy(self._changes[k]) for k in keys}
+
+    def _get(self, parts):
+        if not parts:
+            root = self._tree._get([]) or {}
+            root = dict(root)
+            collection = self._collection()
+            if collection:
+                root[COLLECTION] = collection
+            return root or None
+        if parts[0] != COLLECTION:
+            return self._tree._get(parts)
+        if len(parts) == 1:
+            return self._collection() or None
+        node = self._record(parts[1])
+        for p in parts[2:]:
+            if not isinstance(node, dict) or p not in node:
+                return None
+            node = node[p]
+        return node
+
+    def _set(self, parts, value):
+        if not parts:
+            value = value if isinstance(value, dict) else {}
+            self._set([COLLECTION], value.get(COLLECTION))
+            self._tree._set([], {k: v for k, v in value.items() if k != COLLECTION})
+            return
+        if parts[0] != COLLECTION:
+            self._tree._set(parts, value)
+            return
+        if len(parts) == 1:
+            self._changes.update((k, None) for k in self._live_keys())
+            for key, record in (value or {}).items():
+                self._changes[key] = record
+            return
+        key = parts[1]
+        if len(parts) > 2:
+            tree = MemoryTree(copy.deepcopy(self._record(key)) if isinstance(self._record(key), dict) else {})
+            tree._set(parts[2:], value)
+            value = tree.root or None
+        self._changes[key] = value
+
+    # ==== GIAO DIỆN NHƯ FirebaseClient ====
+    def get(self, path, params=None):
+        params = params or {}
+        parts = MemoryTree._parts(path)
+        with self._lock:
+            if parts == [COLLECTION] and params.get("orderBy") == "$key" and not params.get("shallow"):
+                # Truy vấn theo khóa: chọn khóa trên cột đã sắp, chỉ dựng các bản ghi được chọn
+                lo, hi = params.get("startAt"), params.get("endAt")
+                if "equalTo" in params:
+                    lo = hi = params["equalTo"]
+                keys = self._live_keys(
+                    lo=str(lo) if lo is not None else None, hi=str(hi) if hi is not None else None,
+                    first=int(params["limitToFirst"]) if "limitToFirst" in params else None,
+                    last=int(params["limitToLast"]) if "limitToLast" in params else None)
+                return self._collection(keys)
+            if parts == [COLLECTION] and params.get("shallow"):
+                return {k: True for k in self._live_keys()} or None
+            if parts == [COLLECTION]:
+                # Bản ghi dựng lại từ cột đã là bản sao, không cần deepcopy cả nhánh
+                return query(self._collection() or None, params)
+            return query(copy.deepcopy(self._get(parts)), params)
+
+    def push(self, path, data):
+        key = storage.generate_push_id()
+        self.put(f"{path.strip('/')}/{key}", data)
+        return {"name": key}
+
+    def put(self, path, data):
+        parts = MemoryTree._parts(path)
+        with self._lock:
+            value = MemoryTree._resolve(data, self._get(parts))
+            self._write([(parts, value)])
+        return value
+
+    def update(self, path, data):
+        """
+        PATCH; khóa dạng "a/b" cập nhật nhiều đường dẫn trong một dòng log.
+        """
+        base = MemoryTree._parts(path)
+        with self._lock:
+            sets = []
+            for key, value in data.items():
+                parts = base + MemoryTree._parts(key)
+                sets.append((parts, MemoryTree._resolve(value, self._get(parts))))
+            self._write(sets)
+        return data
+
+    def delete(self, path):
+        with self._lock:
+            self._write([(MemoryTree._parts(path), None)])
+
+    page_before = storage.FirebaseClient.page_before
+    page_after = storage.FirebaseClient.page_after
+
+    def close(self):
+        with self._lock:
+            self._log.close()
+
+    # ==== NÉN ====
+    def compact(self):
+        """
+        Gộp log vào một thế hệ cột mới, chụp các nhánh khác vào tree.json rồi xóa log.
+        """
+        with self._lock:
+            columns = self._base.merge(self._changes)
+            generation = f"{COLLECTION}.{_generation(self.directory) + 1:06d}"
+            path = os.path.join(self.directory, generation)
+            if os.path.exists(path):
+                shutil.rmtree(path)
+            columns.save(path)
+            _atomic_write(os.path.join(self.directory, "tree.json"),
+                          json.dumps(self._tree.root, ensure_ascii=False))
+            _atomic_write(os.path.join(self.directory, "CURRENT"), generation)
+            # Từ đây log cũ phát lại trên bảng mới vẫn cho cùng kết quả, có thể xóa
+            self._log.seek(0)
+            self._log.truncate()
+            old = self._base.path
+            self._base = DiagnosisColumns.open(path)
+            self._changes = {}
+            self._log_entries = 0
+            self._compactions += 1
+            if old and os.path.abspath(old) != os.path.abspath(path):
+                # Trên Windows file đang map không xóa được; thế hệ cũ sẽ bị bỏ qua
+                shutil.rmtree(old, ignore_errors=True)
+            return self._base
+
+    def columns(self):
+        """
+        Bảng cột (memmap) gồm cả các ghi mới nhất; nén trước nếu log còn thay đổi.
+        """
+        with self._lock:
+            return self.compact() if self._changes else self._base
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rows": len(self._base), "pending_changes": len(self._changes),
+                "log_entries": self._log_entries, "column_bytes": self._base.nbytes(),
+                "overflow": len(self._base.overflow), "compactions": self._compactions,
+            }
+
+
+def _generation(directory):
+    try:
+        with open(os.path.join(directory, "CURRENT"), encoding="utf-8") as f:
+            return int(f.read().strip().rsplit(".", 1)[1])
+    except (FileNotFoundError, IndexError, ValueError):
+        return 0
+
+
+def _atomic_write(path, text):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """
+    Kho dùng chung trong cả tiến trình (được `storage.get_client()` dùng khi STORAGE_BACKEND=local).
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = LocalStore()
+    return _store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kho lưu trữ cục bộ dạng cột cho lịch sử chẩn đoán.")
+    parser.add_argument("--dir", default=STORE_DIR, help="thư mục kho (mặc định LOCAL_STORE_DIR)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="nạp file JSON xuất từ Firebase (toàn bộ cây hoặc chỉ diagnoses)")
+    imp.add_argument("file")
+    imp.add_argument("--path", default="", help="đường dẫn đích, ví dụ diagnoses nếu file chỉ chứa nhánh đó")
+    sub.add_parser("compact", help="gộp log vào thế hệ cột mới")
+    sub.add_parser("info", help="số dòng và dung lượng")
+    args = parser.parse_args(argv)
+
+    store = LocalStore(args.dir, compact_every=0)
+    try:
+        if args.command == "import":
+            with open(args.file, encoding="utf-8") as f:
+                store.put(args.path, json.load(f))
+            store.compact()
+        elif args.command == "compact":
+            store.compact()
+        stats = store.stats()
+        if store._base.path:
+            stats["disk_bytes"] = sum(os.path.getsize(os.path.join(store._base.path, name))
+                                      for name in os.listdir(store._base.path))
+        json.dump(stats, sys.stdout, indent=2)
+        print()
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
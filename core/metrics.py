@@ -0,0 +1,187 @@
+"""
+Đo độ trễ và số lỗi trên đường xử lý chẩn đoán (không phụ thuộc Streamlit).
+
+Mỗi chuỗi số liệu được định danh bởi (op, target), ví dụ ("predict", "heart")
+hay ("firebase", "get"). `timed` đo thời gian một khối lệnh: chỉ tốn hai lần
+đọc đồng hồ và một lần ghi vào ring buffer cố định, đủ nhẹ để bật thường trực.
+p50/p95/p99 tính trên METRICS_WINDOW mẫu gần nhất lúc đọc số liệu.
+
+Số liệu có thể xem dưới dạng văn bản Prometheus qua `render_prometheus`, hoặc
+qua HTTP (`/metrics`) khi đặt biến môi trường METRICS_PORT.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+WINDOW = int(os.environ.get("METRICS_WINDOW", "2048"))
+METRICS_PORT = os.environ.get("METRICS_PORT")
+METRICS_HOST = os.environ.get("METRICS_HOST", "0.0.0.0")
+
+QUANTILES = (0.5, 0.95, 0.99)
+PREFIX = "diagnosis"
+
+
+class _Series:
+    __slots__ = ("samples", "count", "errors", "total")
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+
+
+class _Timer:
+    __slots__ = ("metrics", "op", "target", "started")
+
+    def __init__(self, metrics, op, target):
+        self.metrics = metrics
+        self.op = op
+        self.target = target
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.op, self.target, time.perf_counter() - self.started,
+                             error=exc_type is not None and issubclass(exc_type, Exception))
+        return False
+
+
+class Metrics:
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, op, target, seconds, error=False):
+        key = (op, target)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(self.window)
+            series.samples.append(seconds)
+            series.count += 1
+            series.total += seconds
+            if error:
+                series.errors += 1
+
+    def timed(self, op, target=""):
+        """
+        Context manager đo thời gian khối lệnh; ngoại lệ được tính là lỗi rồi ném tiếp.
+        """
+        return _Timer(self, op, target)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self):
+        """
+        Danh sách dict {op, target, count, errors, total, p50, p95, p99} (giây), sắp theo (op, target).
+        """
+        import numpy as np  # chỉ cần khi đọc số liệu, không cần khi ghi
+
+        with self._lock:
+            rows = [(key, np.fromiter(s.samples, dtype=np.float64, count=len(s.samples)),
+                     s.count, s.errors, s.total)
+                    for key, s in sorted(self._series.items())]
+        out = []
+        for (op, target), samples, count, errors, total in rows:
+            row = {"op": op, "target": target, "count": count, "errors": errors, "total": total}
+            qs = np.quantile(samples, QUANTILES) if len(samples) else [float("nan")] * len(QUANTILES)
+            for q, v in zip(QUANTILES, qs):
+                row[f"p{int(q * 100)}"] = float(v)
+            out.append(row)
+        return out
+
+    def render_prometheus(self):
+        """
+        Số liệu ở định dạng văn bản của Prometheus (summary độ trễ + counter lỗi).
+        """
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {PREFIX}_latency_seconds Độ trễ theo thao tác (op) và đối tượng (target).",
+            f"# TYPE {PREFIX}_latency_seconds summary",
+        ]
+        for row in snapshot:
+            labels = f'op="{_escape(row["op"])}",target="{_escape(row["target"])}"'
+            for q in QUANTILES:
+                lines.append(f'{PREFIX}_latency_seconds{{{labels},quantile="{q}"}} '
+                             f'{row[f"p{int(q * 100)}"]:.9g}')
+            lines.append(f"{PREFIX}_latency_seconds_sum{{{labels}}} {row['total']:.9g}")
+            lines.append(f"{PREFIX}_latency_seconds_count{{{labels}}} {row['count']}")
+        lines += [
+            f"# HELP {PREFIX}_errors_total Số lần thao tác ném ngoại lệ.",
+            f"# TYPE {PREFIX}_errors_total counter",
+        ]
+        for row in snapshot:
+            labels = f'op="{_escape(row["op"])}",target="{_escape(row["target"])}"'
+            lines.append(f"{PREFIX}_errors_total{{{labels}}} {row['errors']}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    """
+    Bộ số liệu dùng chung trong cả tiến trình.
+    """
+    return _metrics
+
+
+def timed(op, target=""):
+    return _metrics.timed(op, target)
+
+
+# ==== HTTP /metrics ====
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = _metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_exporter(port=METRICS_PORT, host=METRICS_HOST):
+    """
+    Mở endpoint `/metrics` trong luồng nền (một lần mỗi tiến trình); không làm gì
+    nếu không cấu hình cổng. Trả về server hoặc None.
+    """
+    global _server
+    if port is None or port == "":
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                server = ThreadingHTTPServer((host, int(port)), _Handler)
+            except OSError as e:
+                logger.warning("Không mở được cổng metrics %s: %s", port, e)
+                return None
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True).start()
+            _server = server
+    return _server
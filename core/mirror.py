@@ -0,0 +1,207 @@
+"""
+Bản sao cục bộ (dùng chung trong tiến trình) của cây `diagnoses` trên RTDB.
+
+Lần đầu tải toàn bộ; sau đó khi quá `ttl` giây chỉ hỏi các khóa từ một cửa sổ
+lùi `delta_lookback` giây trước khóa lớn nhất đã thấy (truy vấn
+orderBy="$key"/startAt theo tiền tố thời gian của push ID). Push ID được sinh
+phía client lúc enqueue, nên bản ghi qua hàng đợi ghi nền hoặc phát lại từ
+spool tới server muộn với khóa nhỏ hơn khóa lớn nhất; cửa sổ lùi lấy được các
+bản ghi đó thay vì phải chờ lần đồng bộ toàn bộ. Sửa/xóa từ trang admin
+được vá trực tiếp vào bản sao. Vì delta theo khóa không thấy sửa/xóa từ tiến
+trình khác, bản sao được đồng bộ lại toàn bộ sau mỗi `full_sync_interval` giây.
+
+Bản sao giữ thêm danh sách khóa đã sắp (`page`), để các trang duyệt theo thứ
+tự mới nhất trước mà không phải sao chép và sắp lại cả cây ở mỗi lần rerun.
+"""
+import bisect
+import os
+import threading
+import time
+
+from core import storage
+
+CACHE_TTL = float(os.environ.get("DIAGNOSES_CACHE_TTL", "30"))
+FULL_SYNC_INTERVAL = float(os.environ.get("DIAGNOSES_FULL_SYNC_INTERVAL", "600"))
+# Khoảng thời gian (giây) đọc lại dưới khóa lớn nhất ở mỗi lần delta
+DELTA_LOOKBACK = float(os.environ.get("DIAGNOSES_DELTA_LOOKBACK", "300"))
+
+
+class DiagnosesMirror:
+    def __init__(self, client=None, path="diagnoses", ttl=CACHE_TTL,
+                 full_sync_interval=FULL_SYNC_INTERVAL, delta_lookback=DELTA_LOOKBACK):
+        self.client = client or storage.get_client()
+        self.path = path
+        self.ttl = ttl
+        self.full_sync_interval = full_sync_interval
+        self.delta_lookback = delta_lookback
+
+        self._records = {}
+        self._keys = []              # khóa đã sắp tăng dần
+        self._max_key = None
+        self._loaded_at = None       # lần đồng bộ gần nhất (toàn bộ hoặc delta)
+        self._full_sync_at = None
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._listeners = []
+        self.stats = {"full_syncs": 0, "delta_syncs": 0, "delta_records": 0}
+
+    # ==== ĐỒNG BỘ ====
+    def _full_sync(self):
+        data = self.client.get(self.path) or {}
+        now = time.monotonic()
+        with self._lock:
+            self._keys = sorted(data)
+            self._records = {key: data[key] for key in self._keys}
+            self._max_key = self._keys[-1] if self._keys else None
+            self._loaded_at = self._full_sync_at = now
+            self.stats["full_syncs"] += 1
+            self._notify("reset", self._records)
+
+    def _delta_sync(self):
+        with self._lock:
+            start_key = self._max_key
+        if start_key is None:
+            return self._full_sync()
+        max_ms = storage.push_id_time(start_key)
+        if max_ms is not None and self.delta_lookback > 0:
+            # Khóa nhỏ hơn mọi push ID sinh trong cửa sổ lùi (page_after bỏ qua chính khóa này)
+            since_ms = max(0, max_ms - int(self.delta_lookback * 1000))
+            start_key = min(start_key, storage.push_id_prefix(since_ms))
+        items = self.client.page_after(self.path, start_key)
+        with self._lock:
+            # Bản ghi trong cửa sổ lùi đã có và không đổi thì không báo lại
+            changed = {key: record for key, record in items if self._records.get(key) != record}
+            for key in changed:
+                if key not in self._records:
+                    bisect.insort(self._keys, key)
+            self._records.update(changed)
+            if changed:
+                self._notify("upsert", changed)
+            if items:
+                self._max_key = max(self._max_key, items[-1][0])
+            self._loaded_at = time.monotonic()
+            self.stats["delta_syncs"] += 1
+            self.stats["delta_records"] += len(changed)
+
+    def refresh(self, force=False):
+        """
+        Đồng bộ nếu đã hết hạn. Khi một phiên đang đồng bộ, các phiên khác
+        dùng dữ liệu hiện có thay vì cùng tải lại (chỉ lần tải đầu tiên phải chờ).
+        """
+        now = time.monotonic()
+        with self._lock:
+            loaded = self._loaded_at is not None
+            fresh = loaded and now - self._loaded_at < self.ttl
+            full_due = not loaded or now - self._full_sync_at >= self.full_sync_interval
+        if fresh and not force:
+            return
+        if not self._refresh_lock.acquire(blocking=not loaded):
+            return
+        try:
+            if full_due or force:
+                self._full_sync()
+            else:
+                self._delta_sync()
+        finally:
+            self._refresh_lock.release()
+
+    def invalidate(self):
+        """
+        Buộc lần đọc tới đồng bộ lại toàn bộ.
+        """
+        with self._lock:
+            self._loaded_at = None
+            self._full_sync_at = None
+
+    # ==== ĐỌC ====
+    def records(self):
+        """
+        Ảnh chụp {key: record} (bản sao nông của cả cây; để hiển thị theo trang dùng `page`).
+        """
+        self.refresh()
+        with self._lock:
+            return dict(self._records)
+
+    def get(self, key):
+        self.refresh()
+        with self._lock:
+            return self._records.get(key)
+
+    def get_many(self, keys):
+        """
+        {key: record} cho các khóa trong `keys` còn tồn tại.
+        """
+        self.refresh()
+        with self._lock:
+            return {key: self._records[key] for key in keys if key in self._records}
+
+    def page(self, offset, limit, newest_first=True):
+        """
+        [(key, record)] thứ `offset`..`offset + limit` theo thứ tự khóa (mặc định mới nhất trước).
+        """
+        self.refresh()
+        with self._lock:
+            n = len(self._keys)
+            if newest_first:
+                keys = self._keys[max(0, n - offset - limit):max(0, n - offset)][::-1]
+            else:
+                keys = self._keys[offset:offset + limit]
+            return [(key, self._records[key]) for key in keys]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._records)
+
+    # ==== VÁ CỤC BỘ SAU KHI GHI ====
+    def apply_update(self, key, data):
+        """
+        Áp dụng PATCH `data` lên bản ghi `key` (tạo mới nếu chưa có).
+        """
+        with self._lock:
+            if key not in self._records:
+                bisect.insort(self._keys, key)
+            record = dict(self._records.get(key) or {})
+            record.update(data)
+            # Không đẩy _max_key: khóa nhỏ hơn do tiến trình khác ghi vẫn phải được delta lấy về
+            self._records[key] = record
+            self._notify("upsert", {key: record})
+
+    def apply_delete(self, key):
+        with self._lock:
+            if key in self._records:
+                del self._records[key]
+                del self._keys[bisect.bisect_left(self._keys, key)]
+                self._notify("delete", key)
+
+    # ==== THEO DÕI THAY ĐỔI ====
+    def subscribe(self, listener):
+        """
+        Đăng ký `listener(event, payload)` nhận mọi thay đổi: ("reset", {key: record}),
+        ("upsert", {key: record}) hoặc ("delete", key). Nếu đã có dữ liệu, listener
+        nhận ngay một sự kiện "reset". Listener được gọi khi đang giữ khóa nên phải nhanh.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+            if self._loaded_at is not None or self._records:
+                listener("reset", self._records)
+
+    def _notify(self, event, payload):
+        for listener in self._listeners:
+            listener(event, payload)
+
+
+_mirror = None
+_mirror_lock = threading.Lock()
+
+
+def get_mirror():
+    """
+    Bản sao dùng chung cho mọi phiên Streamlit trong tiến trình.
+    """
+    global _mirror
+    if _mirror is None:
+        with _mirror_lock:
+            if _mirror is None:
+                _mirror = DiagnosesMirror()
+    return _mirror
+
@@ -0,0 +1,365 @@
+"""
+Registry nạp các mô hình đã huấn luyện trong thư mục Model/ (không phụ thuộc Streamlit).
+
+Mỗi mô hình chỉ được nạp khi cần lần đầu. File .sav gốc được chuyển một lần
+sang định dạng joblib không nén trong thư mục cache rồi nạp bằng
+`joblib.load(mmap_mode="r")`, để các mảng lớn được ánh xạ bộ nhớ và các tiến
+trình Streamlit dùng chung trang nhớ thay vì mỗi tiến trình giữ một bản sao.
+Nếu Model/compiled/ có bản xuất NumPy (`python -m core.compiled`) khớp với
+file .sav, registry nạp bản đó (các file .npy cũng được ánh xạ bộ nhớ) và không
+cần import sklearn. Ngược lại mô hình KNN được thay bằng `core.knn.CompactKNN`
+(cùng kết quả, nhanh hơn cho từng truy vấn) trừ khi đặt KNN_ENGINE=sklearn;
+CompactKNN dựng từ .sav giữ bản sao riêng của dữ liệu huấn luyện (theo cột),
+nên muốn chia sẻ trang nhớ giữa các tiến trình thì cần bản xuất. Sau khi nạp, mô hình chạy
+thử một dự đoán (warm-up). Thiếu file hoặc lỗi nạp chỉ vô hiệu hóa chẩn đoán
+tương ứng.
+
+Mỗi mô hình có phiên bản dạng "<tên file>@<SHA-256 rút gọn>" (vd.
+"NutriAI@3f2a..."), được lưu cùng kết quả trong bản ghi chẩn đoán (`model_version`).
+File dùng cho từng mô hình mặc định theo ARTIFACTS và có thể được đổi lúc chạy
+bằng `promote` (ghi vào Model/active.json, MODEL_ACTIVE_FILE). Registry kiểm tra
+file nguồn và active.json định kỳ (MODEL_CHECK_INTERVAL giây); khi có thay đổi,
+mô hình mới được nạp trong luồng nền trong lúc mô hình cũ vẫn phục vụ, rồi được
+hoán đổi và các listener (ví dụ cache dự đoán) được báo tên mô hình.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from core import compiled
+from core.inference import predict_batch
+from core.knn import compact_if_knn
+from core.schema import SCHEMAS
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = os.environ.get("MODEL_DIR", "Model")
+CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", os.path.join(MODEL_DIR, ".cache"))
+KNN_ENGINE = os.environ.get("KNN_ENGINE", "compact")
+USE_COMPILED = os.environ.get("MODEL_COMPILED", "1") != "0"
+CHECK_INTERVAL = float(os.environ.get("MODEL_CHECK_INTERVAL", 5))
+ACTIVE_FILE = os.environ.get("MODEL_ACTIVE_FILE", os.path.join(MODEL_DIR, "active.json"))
+
+# Mô hình béo phì là cặp (obesity_model, scaler)
+ARTIFACTS = {
+    "heart": "ML_heartattack.sav",
+    "depression": "CDTC_knn.sav",
+    "obesity": "NutriAI.sav",
+}
+
+
+def _mmap_copy(path, cache_dir):
+    """
+    Đường dẫn bản joblib không nén của `path` trong cache (tạo lại nếu file gốc mới hơn).
+    """
+    import joblib  # chỉ cần khi không có bản xuất NumPy (core.compiled)
+
+    cached = os.path.join(cache_dir, os.path.basename(path) + ".joblib")
+    if os.path.exists(cached) and os.path.getmtime(cached) >= os.path.getmtime(path):
+        return cached
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{cached}.{os.getpid()}.tmp"
+    joblib.dump(joblib.load(path), tmp)
+    os.replace(tmp, cached)  # ghi nguyên tử, an toàn khi nhiều tiến trình cùng tạo
+    return cached
+
+
+def load_artifact(path, cache_dir=CACHE_DIR, mmap=True):
+    import joblib  # chỉ cần khi không có bản xuất NumPy (core.compiled)
+
+    if not mmap:
+        return joblib.load(path)
+    try:
+        cached = _mmap_copy(path, cache_dir)
+    except OSError as e:
+        logger.warning("Không tạo được cache mmap cho %s: %s", path, e)
+        return joblib.load(path)
+    return joblib.load(cached, mmap_mode="r")
+
+
+class ModelRegistry:
+    def __init__(self, model_dir=MODEL_DIR, artifacts=None, cache_dir=None, mmap=True, warm_up=True,
+                 knn_engine=KNN_ENGINE, use_compiled=USE_COMPILED, compiled_dir=None,
+                 check_interval=CHECK_INTERVAL, active_file=None):
+        self.model_dir = model_dir
+        self.artifacts = dict(artifacts or ARTIFACTS)
+        self._defaults = dict(self.artifacts)
+        # "" tắt active.json (vd. registry của mô hình ứng viên trong core.shadow)
+        self.active_file = (active_file if active_file is not None
+                            else ACTIVE_FILE if model_dir == MODEL_DIR
+                            else os.path.join(model_dir, "active.json"))
+        self.cache_dir = cache_dir or (CACHE_DIR if model_dir == MODEL_DIR
+                                       else os.path.join(model_dir, ".cache"))
+        self.mmap = mmap
+        self.warm_up = warm_up
+        self.knn_engine = knn_engine
+        self.use_compiled = use_compiled
+        self.compiled_dir = compiled_dir or (compiled.COMPILED_DIR if model_dir == MODEL_DIR
+                                             else os.path.join(model_dir, "compiled"))
+        self.check_interval = check_interval
+        self._models = {}
+        self._errors = {}
+        self._versions = {}
+        self._stamps = {}  # tên -> (mtime_ns, size) của file nguồn lúc nạp
+        self._next_check = {}
+        self._listeners = []
+        self._locks = {name: threading.Lock() for name in self.artifacts}
+        self._refreshing = set()
+        self._active_stamp = None
+        self._refresh_active()
+
+    def path(self, name):
+        return os.path.join(self.model_dir, self.artifacts[name])
+
+    def available(self, name):
+        """
+        File mô hình có tồn tại và chưa từng nạp lỗi (không nạp mô hình).
+        """
+        return name in self.artifacts and name not in self._errors and os.path.exists(self.path(name))
+
+    def get(self, name):
+        """
+        Mô hình đã nạp (nạp lần đầu khi được gọi), hoặc None nếu không dùng được.
+        """
+        model = self._models.get(name)
+        if model is not None:
+            if time.monotonic() >= self._next_check.get(name, 0) and self._changed(name):
+                self._refresh_in_background(name)
+            return model
+        if not self.available(name):
+            return None
+        with self._locks[name]:
+            if name not in self._models and name not in self._errors:
+                self._load(name)
+        return self._models.get(name)
+
+    def _stamp(self, name):
+        try:
+            st = os.stat(self.path(name))
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _changed(self, name):
+        self._next_check[name] = time.monotonic() + self.check_interval
+        self._refresh_active()
+        return self._stamp(name) != self._stamps.get(name)
+
+    # ==== FILE ĐANG DÙNG (active.json) ====
+    def _read_active(self):
+        try:
+            with open(self.active_file, encoding="utf-8") as f:
+                active = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning("Bỏ qua %s: %s", self.active_file, e)
+            return {}
+        return active if isinstance(active, dict) else {}
+
+    def _refresh_active(self):
+        """
+        Áp dụng active.json nếu file đổi; mô hình có file đổi sẽ khác stamp và được nạp lại.
+        """
+        if not self.active_file:
+            return
+        try:
+            st = os.stat(self.active_file)
+            stamp = st.st_mtime_ns, st.st_size
+        except OSError:
+            stamp = None
+        if stamp == self._active_stamp:
+            return
+        self._active_stamp = stamp
+        active = self._read_active()
+        for name in self.artifacts:
+            self.artifacts[name] = active.get(name) or self._defaults[name]
+
+    # ==== NẠP ====
+    def _build(self, name, filename=None):
+        """
+        (mô hình đã warm-up, phiên bản, stamp) từ file `filename` (mặc định file hiện hành).
+        """
+        path = os.path.join(self.model_dir, filename) if filename else self.path(name)
+        st = os.stat(path)
+        stamp = st.st_mtime_ns, st.st_size
+        version = f"{os.path.splitext(os.path.basename(path))[0]}@{compiled.file_sha256(path)[:12]}"
+        artifact = self._load_compiled(path)
+        if artifact is None:
+            artifact = load_artifact(path, self.cache_dir, self.mmap)
+            if self.knn_engine == "compact" and name != "obesity":
+                artifact = compact_if_knn(artifact)
+        if self.warm_up:
+            predict_batch(name, artifact, SCHEMAS[name].default_row()[None, :])
+        return artifact, version, stamp
+
+    def _install(self, name, artifact, version, stamp):
+        self._versions[name] = version
+        self._stamps[name] = stamp
+        self._next_check[name] = time.monotonic() + self.check_interval
+        self._models[name] = artifact
+
+    def _load(self, name):
+        try:
+            built = self._build(name)
+        except Exception as e:
+            logger.exception("Không nạp được mô hình '%s' từ %s", name, self.path(name))
+            self._errors[name] = f"{type(e).__name__}: {e}"
+            return
+        self._install(name, *built)
+
+    def _refresh_in_background(self, name):
+        with self._locks[name]:
+            if name in self._refreshing:
+                return
+            self._refreshing.add(name)
+        threading.Thread(target=self._refresh, args=(name,), name=f"reload-{name}", daemon=True).start()
+
+    def _refresh(self, name):
+        """
+        Nạp bản mới ngoài luồng xử lý yêu cầu rồi hoán đổi; lỗi thì giữ mô hình cũ.
+        """
+        try:
+            if os.path.exists(self.path(name)):
+                built = self._build(name)
+            else:
+                built = None
+        except Exception:
+            logger.exception("Không nạp lại được mô hình '%s' từ %s, giữ bản cũ", name, self.path(name))
+            built = None
+        with self._locks[name]:
+            self._refreshing.discard(name)
+            if built is None:
+                self._stamps[name] = self._stamp(name)  # không thử lại tới khi file đổi tiếp
+                return
+            self._install(name, *built)
+        logger.info("Đã nạp lại mô hình '%s' (%s)", name, built[1])
+        self._notify(name)
+
+    def promote(self, name, filename):
+        """
+        Dùng `filename` (trong model_dir) cho mô hình `name` mà không cần khởi động lại.
+
+        Mô hình mới được nạp và warm-up trước, sau đó mới hoán đổi và ghi vào
+        active.json để các tiến trình khác cũng chuyển sang; trả về phiên bản mới.
+        Ném lỗi (và giữ nguyên mô hình cũ) nếu file không nạp hoặc không dự đoán được.
+        """
+        if name not in self.artifacts:
+            raise ValueError(f"Mô hình không hợp lệ: {name!r}")
+        if os.path.basename(filename) != filename:
+            raise ValueError(f"Tên file không hợp lệ: {filename!r}")
+        built = self._build(name, filename)
+        with self._locks[name]:
+            self.artifacts[name] = filename
+            self._errors.pop(name, None)
+            self._install(name, *built)
+        if self.active_file:
+            active = self._read_active()
+            active[name] = filename
+            _atomic_write_json(self.active_file, active)
+            self._refresh_active()
+        logger.info("Chuyển mô hình '%s' sang %s (%s)", name, filename, built[1])
+        self._notify(name)
+        return built[1]
+
+    def candidates(self, name):
+        """
+        Các file .sav trong model_dir có thể dùng cho mô hình `name` (chưa kiểm tra tương thích).
+        """
+        try:
+            files = sorted(f for f in os.listdir(self.model_dir) if f.endswith(".sav"))
+        except OSError:
+            return []
+        current = self.artifacts.get(name)
+        return [current] + [f for f in files if f != current] if current in files else files
+
+    def version(self, name):
+        """
+        Phiên bản của mô hình đang nạp (nạp nếu cần), hoặc None.
+        """
+        if self.get(name) is None:
+            return None
+        return self._versions.get(name)
+
+    def reload(self, name):
+        """
+        Bỏ mô hình đã nạp (và lỗi cũ) để lần `get` sau nạp lại từ file; báo cho listener.
+        """
+        with self._locks[name]:
+            self._models.pop(name, None)
+            self._errors.pop(name, None)
+            self._versions.pop(name, None)
+            self._stamps.pop(name, None)
+        logger.info("Nạp lại mô hình '%s'", name)
+        self._notify(name)
+
+    def _notify(self, name):
+        for listener in list(self._listeners):
+            listener(name)
+
+    def subscribe(self, listener):
+        """
+        Đăng ký `listener(tên)` được gọi mỗi khi một mô hình bị nạp lại.
+        """
+        self._listeners.append(listener)
+
+    def _load_compiled(self, path):
+        if not self.use_compiled:
+            return None
+        compiled_path = compiled.compiled_path(path, self.compiled_dir)
+        if not os.path.exists(compiled_path):
+            return None
+        try:
+            artifact = compiled.load(compiled_path, source=path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Bỏ qua bản xuất %s: %s", compiled_path, e)
+            return None
+        if artifact is None:
+            logger.warning("Bản xuất %s đã cũ so với %s, chạy lại `python -m core.compiled`",
+                           compiled_path, path)
+        return artifact
+
+    def error(self, name):
+        if name in self._errors:
+            return self._errors[name]
+        if name in self.artifacts and not os.path.exists(self.path(name)):
+            return f"Không tìm thấy file {self.path(name)}"
+        return None
+
+    def status(self):
+        """
+        {tên: "loaded" | "not loaded" | thông báo lỗi} cho từng mô hình.
+        """
+        return {name: "loaded" if name in self._models else (self.error(name) or "not loaded")
+                for name in self.artifacts}
+
+    def versions(self):
+        """
+        {tên: phiên bản} của các mô hình đã nạp.
+        """
+        return dict(self._versions)
+
+
+def _atomic_write_json(path, obj):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """
+    Registry dùng chung trong cả tiến trình.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
@@ -0,0 +1,129 @@
+"""
+Cache kết quả dự đoán dùng chung trong cả tiến trình (không phụ thuộc Streamlit).
+
+Khóa là (tên mô hình, phiên bản mô hình, vector đặc trưng đã mã hóa theo dtype
+của schema), nên một form được gửi lại hoặc bản ghi admin lưu mà không đổi
+đầu vào trả kết quả ngay, không gọi mô hình. Cache LRU giới hạn số mục
+(PREDICTION_CACHE_SIZE) và thời gian sống (PREDICTION_CACHE_TTL giây). Khi
+registry nạp lại một mô hình, chỉ các mục của mô hình đó bị xóa. Khi không
+có trong cache, dự đoán đi qua bộ gom lô dùng chung (core.batching) để các
+phiên đồng thời chia sẻ một lần gọi mô hình.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from core import batching, models
+from core.schema import SCHEMAS
+
+MAX_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", 4096))
+TTL = float(os.environ.get("PREDICTION_CACHE_TTL", 3600))
+
+
+class PredictionCache:
+    def __init__(self, max_size=MAX_SIZE, ttl=TTL, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()  # khóa -> (kết quả, hết hạn lúc)
+        self._lock = threading.Lock()
+        self._hits = {}
+        self._misses = {}
+
+    @staticmethod
+    def key(kind, version, features):
+        """
+        Khóa chuẩn: cùng giá trị sau khi mã hóa theo dtype của schema cho cùng khóa.
+        """
+        row = np.asarray(features, dtype=SCHEMAS[kind].dtype).ravel()
+        return kind, version, tuple(row.tolist())
+
+    def get(self, key, default=None):
+        kind = key[0]
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self._hits[kind] = self._hits.get(kind, 0) + 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self._misses[kind] = self._misses.get(kind, 0) + 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, self._clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, kind, version, features, compute):
+        key = self.key(kind, version, features)
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def invalidate(self, kind=None):
+        """
+        Xóa các mục của mô hình `kind` (hoặc toàn bộ cache nếu None).
+        """
+        with self._lock:
+            if kind is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == kind]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            kinds = sorted(set(self._hits) | set(self._misses))
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": sum(self._hits.values()),
+                "misses": sum(self._misses.values()),
+                "by_model": {k: {"hits": self._hits.get(k, 0), "misses": self._misses.get(k, 0)}
+                             for k in kinds},
+            }
+
+
+_MISSING = object()
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Cache dùng chung trong cả tiến trình (mọi phiên Streamlit), tự xóa mục của
+    mô hình khi registry nạp lại mô hình đó.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cache = PredictionCache()
+                models.get_registry().subscribe(cache.invalidate)
+                _cache = cache
+    return _cache
+
+
+def predict_one(kind, features, registry=None):
+    """
+    Thông điệp kết quả cho một vector đặc trưng đã mã hóa, qua cache.
+    """
+    registry = registry or models.get_registry()
+    version = registry.version(kind)
+    return get_cache().get_or_compute(
+        kind, version, features, lambda: batching.get_batcher(kind).submit(features).result()[0])
@@ -0,0 +1,231 @@
+"""
+Chấm điểm lại toàn bộ cây `diagnoses` từ file export, không cần Streamlit.
+
+Ví dụ:
+    python -m core.rescore diagnoses.json -o diagnoses_rescored.jsonl --workers 8
+
+Đầu vào là file JSON export của nút `/diagnoses` ({key: record, ...}) hoặc
+JSONL với mỗi dòng là {key: record}. File được đọc dạng luồng nên không cần
+nạp toàn bộ cây vào bộ nhớ. Đầu ra có cùng định dạng, chọn theo đuôi file.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from core import models
+from core.inference import predict_batch
+from core.schema import SCHEMAS
+
+DEFAULT_CHUNK_SIZE = 5000
+READ_BUFFER_SIZE = 1 << 20
+
+
+# ==== ĐỌC FILE EXPORT DẠNG LUỒNG ====
+def _iter_json_object(f):
+    """
+    Duyệt từng cặp (key, value) của một object JSON lớn mà không nạp cả file.
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+
+    def refill():
+        nonlocal buf, pos, eof
+        chunk = f.read(READ_BUFFER_SIZE)
+        eof = not chunk
+        buf, pos = buf[pos:] + chunk, 0
+
+    def skip_ws():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            refill()
+
+    def decode():
+        nonlocal pos
+        while True:
+            try:
+                value, pos = decoder.raw_decode(buf, pos)
+                return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                refill()
+
+    def expect(chars):
+        nonlocal pos
+        skip_ws()
+        if pos >= len(buf) or buf[pos] not in chars:
+            raise ValueError(f"File JSON không hợp lệ: cần một trong {chars!r}")
+        pos += 1
+        return buf[pos - 1]
+
+    refill()
+    expect("{")
+    skip_ws()
+    if pos < len(buf) and buf[pos] == "}":
+        return
+    while True:
+        skip_ws()
+        key = decode()
+        expect(":")
+        skip_ws()
+        yield key, decode()
+        if expect(",}") == "}":
+            return
+
+
+def _iter_jsonl(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield from json.loads(line).items()
+
+
+def iter_records(path):
+    """
+    Trả về các cặp (key, record) từ file export JSON hoặc JSONL.
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            yield from _iter_jsonl(f)
+        else:
+            yield from _iter_json_object(f)
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ==== CHẤM ĐIỂM TRONG TIẾN TRÌNH CON ====
+# Mỗi tiến trình con có registry riêng; mô hình được nạp lần đầu khi cần (bản xuất
+# trong Model/compiled/ được ánh xạ bộ nhớ nên các tiến trình con dùng chung trang nhớ),
+# mô hình thiếu file trả về None và các bản ghi loại đó được giữ nguyên.
+def score_chunk(items):
+    """
+    Chấm điểm lại một khối [(key, record)], trả về (items, số bản ghi đổi kết quả, số bỏ qua).
+    """
+    groups = {}
+    skipped = 0
+    for i, (_, record) in enumerate(items):
+        kind = record.get("type") if isinstance(record, dict) else None
+        if kind not in SCHEMAS or not isinstance(record.get("inputs"), dict):
+            skipped += 1
+            continue
+        groups.setdefault(kind, []).append(i)
+
+    changed = 0
+    for kind, idx in groups.items():
+        registry = models.get_registry()
+        model = registry.get(kind)
+        if model is None:
+            skipped += len(idx)
+            continue
+        version = registry.version(kind)
+        # Mã hóa cả nhóm vào một ma trận; bản ghi lỗi bị bỏ qua, không làm hỏng lô
+        X, valid = SCHEMAS[kind].encode_many([items[i][1]["inputs"] for i in idx])
+        skipped += int((~valid).sum())
+        if not valid.any():
+            continue
+        idx = np.asarray(idx)[valid]
+        results = predict_batch(kind, model, X[valid])
+        for i, result in zip(idx, results):
+            record = items[i][1]
+            record["model_version"] = version
+            if record.get("result") != result:
+                record["result"] = str(result)
+                changed += 1
+    return items, changed, skipped
+
+
+# ==== GHI KẾT QUẢ ====
+class _Writer:
+    def __init__(self, path):
+        self.jsonl = path.endswith(".jsonl")
+        self.f = open(path, "w", encoding="utf-8")
+        self.first = True
+        if not self.jsonl:
+            self.f.write("{")
+
+    def write(self, items):
+        for key, record in items:
+            if self.jsonl:
+                self.f.write(json.dumps({key: record}, ensure_ascii=False) + "\n")
+            else:
+                sep = "" if self.first else ","
+                self.f.write(f"{sep}\n{json.dumps(key)}: {json.dumps(record, ensure_ascii=False)}")
+                self.first = False
+
+    def close(self):
+        if not self.jsonl:
+            self.f.write("\n}\n")
+        self.f.close()
+
+
+def rescore(input_path, output_path, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, log=sys.stderr):
+    """
+    Chấm điểm lại file export và ghi ra `output_path`, trả về thống kê tổng.
+    """
+    workers = workers or os.cpu_count() or 1
+    writer = _Writer(output_path)
+    total = changed = skipped = 0
+    started = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+
+            def drain_one():
+                nonlocal total, changed, skipped
+                items, n_changed, n_skipped = pending.popleft().result()
+                writer.write(items)
+                total += len(items)
+                changed += n_changed
+                skipped += n_skipped
+                elapsed = time.perf_counter() - started
+                print(f"[khối] {len(items)} bản ghi | tổng {total} | đổi {changed} | bỏ qua {skipped}"
+                      f" | {total / elapsed:,.0f} bản ghi/giây", file=log)
+
+            # Giới hạn số khối đang xử lý để bộ nhớ không phụ thuộc kích thước file
+            for chunk in _chunks(iter_records(input_path), chunk_size):
+                pending.append(pool.submit(score_chunk, chunk))
+                if len(pending) >= 2 * workers:
+                    drain_one()
+            while pending:
+                drain_one()
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    return {"total": total, "changed": changed, "skipped": skipped, "seconds": elapsed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chấm điểm lại các bản ghi chẩn đoán từ file export.")
+    parser.add_argument("input", help="File export .json hoặc .jsonl của nút diagnoses")
+    parser.add_argument("-o", "--output", required=True, help="File kết quả (.json hoặc .jsonl)")
+    parser.add_argument("--workers", type=int, default=None, help="Số tiến trình (mặc định: số CPU)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Số bản ghi mỗi khối")
+    args = parser.parse_args(argv)
+
+    stats = rescore(args.input, args.output, workers=args.workers, chunk_size=args.chunk_size)
+    print(f"Hoàn tất: {stats['total']} bản ghi, {stats['changed']} đổi kết quả, "
+          f"{stats['skipped']} bỏ qua, {stats['seconds']:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+RTDB giả lập trong bộ nhớ, nói cùng giao thức REST với Firebase Realtime Database.
+
+Dùng cho test và benchmark không cần mạng:
+    python -m core.rtdb_stub --port 9000
+    FIREBASE_URL=http://127.0.0.1:9000 streamlit run app.py
+
+Hỗ trợ GET/PUT/POST/PATCH/DELETE, PATCH nhiều đường dẫn, `shallow` và các
+truy vấn orderBy ("$key", "$value" hoặc tên trường con), startAt, endAt,
+equalTo, limitToFirst, limitToLast.
+"""
+import argparse
+import copy
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from core.storage import generate_push_id
+
+
+class MemoryTree:
+    """
+    Cây JSON trong bộ nhớ, thao tác theo đường dẫn "a/b/c".
+    """
+
+    def __init__(self, data=None):
+        self.root = data or {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _parts(path):
+        return [p for p in path.strip("/").split("/") if p]
+
+    def _get(self, parts):
+        node = self.root
+        for p in parts:
+            if not isinstance(node, dict) or p not in node:
+                return None
+            node = node[p]
+        return node
+
+    def _set(self, parts, value):
+        if not parts:
+            self.root = value if isinstance(value, dict) else {}
+            return
+        node = self.root
+        for p in parts[:-1]:
+            if not isinstance(node.get(p), dict):
+                node[p] = {}
+            node = node[p]
+        if value is None:
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = value
+        self._prune(parts[:-1])
+
+    def _prune(self, parts):
+        # RTDB không giữ nút rỗng
+        while parts:
+            if self._get(parts) == {}:
+                self._get(parts[:-1]).pop(parts[-1], None)
+                parts = parts[:-1]
+            else:
+                return
+
+    @staticmethod
+    def _resolve(value, current):
+        # Hỗ trợ giá trị máy chủ {".sv": "timestamp"} / {".sv": {"increment": n}}
+        if isinstance(value, dict):
+            if ".sv" in value:
+                sv = value[".sv"]
+                if isinstance(sv, dict) and "increment" in sv:
+                    base = current if isinstance(current, (int, float)) else 0
+                    return base + sv["increment"]
+                if sv == "timestamp":
+                    return int(time.time() * 1000)
+            return {k: MemoryTree._resolve(v, current.get(k) if isinstance(current, dict) else None)
+                    for k, v in value.items()}
+        return value
+
+    def get(self, path):
+        with self.lock:
+            return copy.deepcopy(self._get(self._parts(path)))
+
+    def put(self, path, value):
+        with self.lock:
+            parts = self._parts(path)
+            value = self._resolve(value, self._get(parts))
+            self._set(parts, value)
+            return value
+
+    def push(self, path, value):
+        key = generate_push_id()
+        self.put(f"{path}/{key}", value)
+        return key
+
+    def update(self, path, values):
+        with self.lock:
+            base = self._parts(path)
+            for key, value in values.items():
+                parts = base + self._parts(key)
+                self._set(parts, self._resolve(value, self._get(parts)))
+            return values
+
+    def delete(self, path):
+        self.put(path, None)
+
+
+def _sort_key(value):
+    # Thứ tự của RTDB: null < false < true < số < chuỗi < object
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    return (4, 0)
+
+
+def query(node, params):
+    """
+    Áp dụng các tham số truy vấn RTDB lên một nút dict.
+    """
+    if not isinstance(node, dict):
+        return node
+    if params.get("shallow"):
+        return {k: True for k in node}
+    order_by = params.get("orderBy")
+    if order_by is None:
+        return node
+
+    if order_by == "$key":
+        value_of = lambda kv: kv[0]
+    elif order_by == "$value":
+        value_of = lambda kv: kv[1]
+    else:
+        field = order_by.split("/")
+        def value_of(kv):
+            v = kv[1]
+            for f in field:
+                v = v.get(f) if isinstance(v, dict) else None
+            return v
+
+    items = sorted(node.items(), key=lambda kv: (_sort_key(value_of(kv)), kv[0]))
+    if "equalTo" in params:
+        items = [kv for kv in items if value_of(kv) == params["equalTo"]]
+    if "startAt" in params:
+        lo = _sort_key(params["startAt"])
+        items = [kv for kv in items if _sort_key(value_of(kv)) >= lo]
+    if "endAt" in params:
+        hi = _sort_key(params["endAt"])
+        items = [kv for kv in items if _sort_key(value_of(kv)) <= hi]
+    if "limitToFirst" in params:
+        items = items[:int(params["limitToFirst"])]
+    if "limitToLast" in params:
+        n = int(params["limitToLast"])
+        items = items[-n:] if n else []
+    return dict(items)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    tree = None
+
+    def log_message(self, *args):
+        pass
+
+    def _parse(self):
+        url = urlsplit(self.path)
+        path = url.path[:-5] if url.path.endswith(".json") else url.path
+        params = {}
+        for k, v in parse_qs(url.query).items():
+            if k in ("print", "format", "auth"):
+                params[k] = v[0]
+            else:
+                try:
+                    params[k] = json.loads(v[0])
+                except ValueError:
+                    params[k] = v[0]
+        return path, params
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def _send(self, value, status=200):
+        body = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path, params = self._parse()
+        self._send(query(self.tree.get(path), params))
+
+    def do_PUT(self):
+        path, _ = self._parse()
+        self._send(self.tree.put(path, self._body()))
+
+    def do_POST(self):
+        path, _ = self._parse()
+        self._send({"name": self.tree.push(path, self._body())})
+
+    def do_PATCH(self):
+        path, _ = self._parse()
+        body = self._body()
+        if not isinstance(body, dict):
+            self._send({"error": "PATCH body phải là object"}, status=400)
+            return
+        self._send(self.tree.update(path, body))
+
+    def do_DELETE(self):
+        path, _ = self._parse()
+        self.tree.delete(path)
+        self._send(None)
+
+
+def make_server(host="127.0.0.1", port=0, data=None):
+    """
+    Tạo server (chưa chạy); `server.server_address` cho biết cổng thực tế.
+    """
+    handler = type("Handler", (_Handler,), {"tree": MemoryTree(data)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.tree = handler.tree
+    return server
+
+
+def start_in_thread(host="127.0.0.1", port=0, data=None):
+    """
+    Chạy server ở luồng nền, trả về (server, base_url).
+    """
+    server = make_server(host, port, data)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RTDB giả lập trong bộ nhớ.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--data", help="File JSON dữ liệu ban đầu")
+    args = parser.parse_args(argv)
+
+    data = None
+    if args.data:
+        with open(args.data, encoding="utf-8") as f:
+            data = json.load(f)
+    server = make_server(args.host, args.port, data)
+    print(f"RTDB giả lập tại http://{args.host}:{server.server_address[1]}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""
+Schema đặc trưng cho từng mô hình: `HEART`, `DEPRESSION`, `OBESITY`.
+"""
+from core.schema.base import CATEGORY, FLOAT, INT, Feature, Schema
+from core.schema.depression import SCHEMA as DEPRESSION
+from core.schema.heart import SCHEMA as HEART
+from core.schema.obesity import SCHEMA as OBESITY
+
+SCHEMAS = {
+    "heart": HEART,
+    "depression": DEPRESSION,
+    "obesity": OBESITY,
+}
+
+__all__ = ["CATEGORY", "FLOAT", "INT", "Feature", "Schema",
+           "HEART", "DEPRESSION", "OBESITY", "SCHEMAS"]
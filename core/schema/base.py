@@ -0,0 +1,142 @@
+"""
+Mô tả khai báo cho đặc trưng đầu vào của mô hình và bộ mã hóa tương ứng.
+
+Mỗi `Schema` giữ thứ tự đặc trưng, kiểu dữ liệu, bảng nhãn -> mã cho biến
+phân loại và giới hạn cho biến số. Mã hóa ghi thẳng vào hàng/ma trận cấp phát
+sẵn (mặc định float32) bằng tra cứu bảng, thay cho `int(x.split("(")[1].rstrip(")"))`.
+"""
+import math
+
+import numpy as np
+
+INT = "int"
+FLOAT = "float"
+CATEGORY = "category"
+
+
+class Feature:
+    """
+    Một đặc trưng đầu vào.
+
+    `name` là khóa trong `inputs` lưu trên Firebase, `label` là nhãn trên form.
+    Với biến phân loại, `options` là bảng {nhãn hiển thị: mã} theo thứ tự hiển thị.
+    `widget`, `column`, `placeholder` chỉ dùng để dựng form Streamlit.
+    """
+
+    def __init__(self, name, label, dtype, options=None, min_value=None, max_value=None,
+                 step=None, widget=None, column=0, placeholder=False):
+        self.name = name
+        self.label = label
+        self.dtype = dtype
+        self.options = dict(options or {})
+        self.min_value = min_value
+        self.max_value = max_value
+        self.step = step
+        self.widget = widget or ("select" if dtype == CATEGORY else "number")
+        self.column = column
+        self.placeholder = placeholder
+        # Chấp nhận cả mã số trực tiếp (vd. dữ liệu từ API) ngoài nhãn hiển thị
+        self._lookup = dict(self.options)
+        for code in self.options.values():
+            self._lookup[code] = code
+            self._lookup[float(code)] = code
+
+    @property
+    def labels(self):
+        return list(self.options)
+
+    def code(self, value):
+        """
+        Mã số của một giá trị; ném ValueError nếu không hợp lệ.
+        """
+        if self.dtype == CATEGORY:
+            try:
+                return self._lookup[value]
+            except (KeyError, TypeError):
+                pass
+            # Nhãn cũ khác chữ nhưng cùng mã "(n)" vẫn được chấp nhận
+            if isinstance(value, str) and value.endswith(")") and "(" in value:
+                code = value[value.rindex("(") + 1:-1]
+                if code.lstrip("-").isdigit() and int(code) in self.options.values():
+                    return int(code)
+            raise ValueError(f"Giá trị không hợp lệ cho '{self.name}': {value!r}")
+        if isinstance(value, bool) or not isinstance(value, (int, float, np.number)):
+            raise ValueError(f"'{self.name}' phải là số, nhận được {value!r}")
+        if not math.isfinite(value):
+            raise ValueError(f"'{self.name}' phải là số hữu hạn, nhận được {value!r}")
+        if self.min_value is not None and value < self.min_value:
+            raise ValueError(f"'{self.name}' nhỏ hơn giới hạn {self.min_value}: {value}")
+        if self.max_value is not None and value > self.max_value:
+            raise ValueError(f"'{self.name}' lớn hơn giới hạn {self.max_value}: {value}")
+        return value
+
+    def label_for(self, value):
+        """
+        Nhãn hiển thị tương ứng với một giá trị đã lưu (nhãn hoặc mã).
+        """
+        code = self.code(value)
+        for label, c in self.options.items():
+            if c == code:
+                return label
+        raise ValueError(f"Không có nhãn cho mã {code} của '{self.name}'")
+
+
+class Schema:
+    """
+    Danh sách đặc trưng có thứ tự của một mô hình.
+    """
+
+    def __init__(self, name, features, dtype=np.float32):
+        self.name = name
+        self.features = list(features)
+        self.dtype = dtype
+        self.names = [f.name for f in self.features]
+        self.index = {f.name: i for i, f in enumerate(self.features)}
+
+    def __len__(self):
+        return len(self.features)
+
+    def __getitem__(self, name):
+        return self.features[self.index[name]]
+
+    def default_inputs(self):
+        """
+        Một bộ `inputs` hợp lệ: lựa chọn đầu tiên / giá trị nhỏ nhất (dùng để warm-up, benchmark).
+        """
+        return {f.name: f.labels[0] if f.dtype == CATEGORY else (f.min_value or 0)
+                for f in self.features}
+
+    def default_row(self):
+        return self.encode(self.default_inputs())
+
+    def encode(self, inputs, out=None):
+        """
+        Mã hóa một dict `inputs` thành hàng `self.dtype`; ném ValueError nếu sai.
+        """
+        if out is None:
+            out = np.empty(len(self.features), dtype=self.dtype)
+        try:
+            out[:] = [f.code(inputs[f.name]) for f in self.features]
+        except KeyError as e:
+            raise ValueError(f"Thiếu đặc trưng {e} cho mô hình '{self.name}'") from None
+        return out
+
+    def encode_many(self, records, out=None):
+        """
+        Mã hóa danh sách dict thành ma trận (n, số đặc trưng) cấp phát sẵn.
+
+        Trả về (X, valid): bản ghi lỗi được đánh dấu False trong `valid`
+        thay vì làm hỏng cả lô.
+        """
+        records = records if isinstance(records, (list, tuple)) else list(records)
+        n = len(records)
+        if out is None:
+            out = np.zeros((n, len(self.features)), dtype=self.dtype)
+        valid = np.ones(n, dtype=bool)
+        for i, inputs in enumerate(records):
+            try:
+                self.encode(inputs, out[i])
+            except (ValueError, TypeError):
+                out[i] = 0
+                valid[i] = False
+        return out, valid
@@ -0,0 +1,34 @@
+"""
+Đặc trưng của mô hình trầm cảm (Model/CDTC_knn.sav), đúng thứ tự huấn luyện.
+"""
+import numpy as np
+
+from core.schema.base import CATEGORY, FLOAT, INT, Feature, Schema
+
+YES_NO = {"Không (0)": 0, "Có (1)": 1}
+
+# cgpa có phần thập phân; float32 có thể đổi thứ tự các láng giềng gần bằng nhau nên giữ float64
+SCHEMA = Schema("depression", [
+    Feature("gender", "Giới tính:", CATEGORY, options={"Nam (1)": 1, "Nữ (0)": 0},
+            column=0, placeholder=True),
+    Feature("age", "Tuổi:", INT, min_value=1, step=1, column=0),
+    Feature("study_pressure", "Áp lực học tập (0-5):", INT, min_value=0, max_value=5,
+            widget="slider", column=0),
+    Feature("cgpa", "Điểm trung bình (0.0-10.0):", FLOAT, min_value=0.0, max_value=10.0,
+            step=0.01, column=0),
+    Feature("satisfaction", "Mức độ hài lòng (0-5):", INT, min_value=0, max_value=5,
+            widget="slider", column=0),
+    Feature("sleep", "Giờ ngủ:", CATEGORY,
+            options={"Dưới 5 giờ (1)": 1, "5-6 giờ (2)": 2, "7-8 giờ (3)": 3, "Trên 8 giờ (4)": 4},
+            column=0, placeholder=True),
+    Feature("diet", "Thói quen ăn uống:", CATEGORY,
+            options={"Không lành mạnh (1)": 1, "Trung bình (2)": 2, "Lành mạnh (3)": 3},
+            column=1, placeholder=True),
+    Feature("suicide_thoughts", "Từng nghĩ tự tử?", CATEGORY, options=YES_NO,
+            column=1, placeholder=True),
+    Feature("study_hours", "Giờ học/ngày:", INT, min_value=1, step=1, column=1),
+    Feature("financial_pressure", "Áp lực tài chính (0-5):", INT, min_value=0, max_value=5,
+            widget="slider", column=1),
+    Feature("family_history", "Tiền sử bệnh tâm thần gia đình:", CATEGORY, options=YES_NO,
+            column=1, placeholder=True),
+], dtype=np.float64)
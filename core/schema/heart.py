@@ -0,0 +1,22 @@
+"""
+Đặc trưng của mô hình tim mạch (Model/ML_heartattack.sav), đúng thứ tự huấn luyện:
+Age, Gender, Type, Blood_pressure, Cholesterol, Heartbeat, Thalassemia.
+"""
+from core.schema.base import CATEGORY, INT, Feature, Schema
+
+SCHEMA = Schema("heart", [
+    Feature("age", "Tuổi:", INT, min_value=1, step=1, column=0),
+    Feature("gender", "Giới tính:", CATEGORY, options={"Nam (0)": 0, "Nữ (1)": 1},
+            column=0, placeholder=True),
+    Feature("chest_pain", "Đau ngực:", CATEGORY,
+            options={"Typical angina (1)": 1, "Asymptomatic (0)": 0,
+                     "Non-anginal pain (3)": 3, "Atypical angina (2)": 2},
+            column=0, placeholder=True),
+    Feature("blood_pressure", "Huyết áp:", INT, min_value=1, step=1, column=0),
+    Feature("cholesterol", "Cholesterol:", INT, min_value=1, step=1, column=1),
+    Feature("heartbeat", "Nhịp tim:", INT, min_value=1, step=1, column=1),
+    Feature("thalassemia", "Thalassemia:", CATEGORY,
+            options={"Bình thường (3)": 3, "Khiếm khuyết cố định (6)": 6,
+                     "Khuyết có thể đảo ngược (7)": 7},
+            column=1, placeholder=True),
+])
@@ -0,0 +1,41 @@
+"""
+Đặc trưng của mô hình béo phì (Model/NutriAI.sav), đúng thứ tự huấn luyện:
+Gender, Age, Height, Weight, family_history_with_overweight, FAVC, FCVC, NCP,
+CAEC, SMOKE, CH2O, SCC, FAF, TUE, CALC, MTRANS.
+"""
+import numpy as np
+
+from core.schema.base import CATEGORY, FLOAT, INT, Feature, Schema
+
+YES_NO = {"Yes (1)": 1, "No (0)": 0}
+FREQUENCY = {"Không (0)": 0, "Thi thoảng (1)": 1, "Thường xuyên (2)": 2, "Luôn (3)": 3}
+
+# float32 làm tròn Height/Weight đủ để đổi nhánh cây sau StandardScaler nên giữ float64
+SCHEMA = Schema("obesity", [
+    Feature("gender", "Giới tính:", CATEGORY, options={"Nam (1)": 1, "Nữ (0)": 0},
+            column=0, placeholder=True),
+    Feature("age", "Tuổi:", INT, min_value=1, step=1, column=0),
+    Feature("height", "Chiều cao (m):", FLOAT, min_value=0.5, max_value=2.5, step=0.01, column=0),
+    Feature("weight", "Cân nặng (kg):", FLOAT, min_value=1.0, step=0.1, column=0),
+    Feature("family_history", "Gia đình có thừa cân?", CATEGORY, options=YES_NO,
+            column=0, placeholder=True),
+    Feature("caloric_food", "Tiêu thụ thực phẩm giàu calo?", CATEGORY, options=YES_NO,
+            column=0, placeholder=True),
+    Feature("veg_intake", "Ăn rau:", CATEGORY,
+            options={"Ăn ít (0)": 0, "Ăn đủ (1)": 1, "Ăn nhiều (2)": 2},
+            column=0, placeholder=True),
+    Feature("meals_per_day", "Số bữa chính/ngày:", CATEGORY,
+            options={"1 (1)": 1, "2 (2)": 2, "3 (3)": 3, "4+ (4)": 4}, column=0),
+    Feature("snacking", "Ăn vặt:", CATEGORY, options=FREQUENCY, column=1),
+    Feature("smoking", "Hút thuốc?", CATEGORY, options=YES_NO, column=1),
+    Feature("water_liter", "Nước uống (lít):", FLOAT, min_value=0.1, step=0.1, column=1),
+    Feature("track_calories", "Theo dõi calo?", CATEGORY, options=YES_NO, column=1),
+    Feature("activity", "Hoạt động thể chất:", CATEGORY,
+            options={"Không (0)": 0, "Thấp (1)": 1, "Bình thường (2)": 2, "Cao (3)": 3}, column=1),
+    Feature("device_time", "Giờ dùng thiết bị:", CATEGORY,
+            options={"Thấp (0)": 0, "Trung bình (1)": 1, "Cao (2)": 2}, column=1),
+    Feature("alcohol", "Tiêu thụ rượu:", CATEGORY, options=FREQUENCY, column=1),
+    Feature("transport", "Phương tiện chính:", CATEGORY,
+            options={"Public (0)": 0, "Automobile (1)": 1, "Walking (2)": 2,
+                     "Motorbike (3)": 3, "Bike (4)": 4}, column=1),
+], dtype=np.float64)
@@ -0,0 +1,121 @@
+"""
+Sàng lọc tổng hợp: một bệnh nhân, cả ba mô hình trong một lần gửi (không phụ thuộc Streamlit).
+
+Các đặc trưng chung (cùng tên, kiểu, nhãn trên form và cùng tập lựa chọn) như
+tuổi, giới tính chỉ nhập một lần. Biến phân loại chung được hiển thị bằng phần
+nhãn trước " (" ("Nam", "Nữ") vì mã số mỗi mô hình có thể khác nhau (tim mạch mã
+hóa Nam = 0, trầm cảm/béo phì Nam = 1); `split` đổi lại về nhãn của từng schema.
+Đặc trưng cùng tên nhưng khác nghĩa (vd. `family_history`) vẫn nhập riêng.
+
+`predict_all` gửi ba dự đoán song song vào pool luồng (SCREENING_WORKERS), mỗi
+dự đoán đi qua cache và bộ gom lô như trang chẩn đoán đơn, nên tổng thời gian
+xấp xỉ mô hình chậm nhất thay vì tổng của cả ba.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core import metrics, prediction_cache
+from core.schema import CATEGORY, SCHEMAS, Feature, Schema
+
+WORKERS = int(os.environ.get("SCREENING_WORKERS", "3"))
+KINDS = list(SCHEMAS)
+
+
+def stem(label):
+    """
+    Phần nhãn trước mã số: "Nam (0)" -> "Nam".
+    """
+    return label.split(" (")[0].strip()
+
+
+def _same(features):
+    first = features[0]
+    if any((f.dtype, f.label) != (first.dtype, first.label) for f in features[1:]):
+        return False
+    if first.dtype == CATEGORY:
+        stems = [stem(label) for label in first.labels]
+        return len(set(stems)) == len(stems) and all(
+            sorted(stem(label) for label in f.labels) == sorted(stems) for f in features[1:])
+    return True
+
+
+def _merged(features):
+    first = features[0]
+    if first.dtype == CATEGORY:
+        options = {stem(label): i for i, label in enumerate(first.labels)}
+        return Feature(first.name, first.label, first.dtype, options=options,
+                       column=first.column, placeholder=any(f.placeholder for f in features))
+    # Giới hạn giao nhau để giá trị chung hợp lệ với mọi mô hình
+    lows = [f.min_value for f in features if f.min_value is not None]
+    highs = [f.max_value for f in features if f.max_value is not None]
+    return Feature(first.name, first.label, first.dtype,
+                   min_value=max(lows) if lows else None, max_value=min(highs) if highs else None,
+                   step=first.step, widget=first.widget, column=first.column)
+
+
+def _build(kinds):
+    schemas = [SCHEMAS[k] for k in kinds]
+    names = [f.name for f in schemas[0].features
+             if all(f.name in s.index for s in schemas[1:]) and _same([s[f.name] for s in schemas])]
+    shared = Schema("screening", [_merged([s[n] for s in schemas]) for n in names])
+    specific = {k: Schema(k, [f for f in SCHEMAS[k].features if f.name not in shared.index])
+                for k in kinds}
+    return shared, specific
+
+
+# Bố cục form tổng hợp: phần chung và phần riêng từng loại
+SHARED, SPECIFIC = _build(KINDS)
+
+
+def split(shared_inputs, specific_inputs):
+    """
+    {loại: inputs} theo đúng thứ tự và nhãn của schema từng loại, từ phần chung
+    và {loại: inputs riêng}.
+    """
+    out = {}
+    for kind, own in specific_inputs.items():
+        s = SCHEMAS[kind]
+        inputs = {}
+        for f in s.features:
+            if f.name not in SHARED.index:
+                inputs[f.name] = own[f.name]
+                continue
+            value = shared_inputs[f.name]
+            if f.dtype == CATEGORY:
+                value = next((label for label in f.labels if stem(label) == value), value)
+            inputs[f.name] = value
+        out[kind] = inputs
+    return out
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Pool luồng dùng chung trong tiến trình cho các lần sàng lọc tổng hợp.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(WORKERS, thread_name_prefix="screening")
+    return _executor
+
+
+def _predict(kind, features):
+    with metrics.timed("predict", kind):
+        return prediction_cache.predict_one(kind, features)
+
+
+def predict_all(features_by_kind):
+    """
+    {loại: thông điệp kết quả} cho {loại: vector đặc trưng đã mã hóa}, các mô hình chạy song song.
+    """
+    executor = get_executor()
+    with metrics.timed("predict", "screening"):
+        futures = {kind: executor.submit(_predict, kind, features)
+                   for kind, features in features_by_kind.items()}
+        return {kind: future.result() for kind, future in futures.items()}
@@ -0,0 +1,217 @@
+"""
+Chỉ mục trong bộ nhớ để tìm kiếm/lọc lịch sử chẩn đoán.
+
+Các cột được giữ dưới dạng mảng NumPy: tên người dùng (chữ thường) sắp xếp sẵn
+để tìm theo tiền tố bằng `searchsorted`, mã loại chẩn đoán, thời điểm
+(datetime64[s]) và mã kết quả (mã hóa từ điển). Mỗi truy vấn chỉ là vài phép
+so sánh vector trên các cột này, không duyệt lại các dict bản ghi.
+
+Chỉ mục được cập nhật tăng dần qua các sự kiện của `core.mirror.DiagnosesMirror`:
+bản ghi sửa/xóa được đánh dấu chết, bản ghi mới được nối vào cuối; phần chưa
+sắp xếp được gộp vào mảng đã sắp khi vượt ngưỡng.
+"""
+import threading
+from datetime import date, datetime
+
+import numpy as np
+
+from core import mirror
+
+TYPES = ["heart", "depression", "obesity"]
+_TYPE_CODES = {t: i for i, t in enumerate(TYPES)}
+OTHER_TYPE = len(TYPES)
+
+MERGE_THRESHOLD = 2048
+_PREFIX_END = "\U0010ffff"
+_NAT = np.datetime64("NaT", "s").astype(np.int64)
+
+
+def _parse_timestamps(values):
+    try:
+        return np.array(values, dtype="datetime64[s]").astype(np.int64)
+    except ValueError:
+        out = np.empty(len(values), dtype=np.int64)
+        for i, v in enumerate(values):
+            try:
+                out[i] = np.datetime64(v, "s").astype(np.int64)
+            except (ValueError, TypeError):
+                out[i] = _NAT
+        return out
+
+
+def to_epoch(value, end_of_day=False):
+    """
+    Chuyển date/datetime/chuỗi thành số giây theo cùng quy ước với cột thời điểm.
+    Với `end_of_day=True`, một ngày (date) được hiểu là giây cuối cùng của ngày đó.
+    """
+    epoch = int(np.datetime64(value, "s").astype(np.int64))
+    if end_of_day and isinstance(value, date) and not isinstance(value, datetime):
+        epoch += 86399
+    return epoch
+
+
+class DiagnosisIndex:
+    def __init__(self, records=None):
+        self._lock = threading.RLock()
+        self.reset(records or {})
+
+    # ==== XÂY DỰNG / CẬP NHẬT ====
+    def reset(self, records):
+        """
+        Xây lại toàn bộ chỉ mục từ {key: record} bằng các phép vector.
+        """
+        keys = list(records)
+        values = list(records.values())
+        with self._lock:
+            self._result_codes = {}
+            self._result_labels = []
+            self._keys = keys
+            self._row_of = {k: i for i, k in enumerate(keys)}
+            self._names = np.array([str(r.get("user_name", "")).lower() for r in values], dtype=object)
+            self._types = np.array([_TYPE_CODES.get(r.get("type"), OTHER_TYPE) for r in values],
+                                   dtype=np.int8)
+            self._times = _parse_timestamps([str(r.get("timestamp", "")) for r in values])
+            self._results = np.array([self._result_code(r.get("result")) for r in values],
+                                     dtype=np.int32)
+            self._alive = np.ones(len(keys), dtype=bool)
+            self._sort_names()
+
+    def _result_code(self, result):
+        result = str(result) if result is not None else ""
+        code = self._result_codes.get(result)
+        if code is None:
+            code = self._result_codes[result] = len(self._result_labels)
+            self._result_labels.append(result)
+        return code
+
+    def _sort_names(self):
+        order = np.argsort(self._names, kind="stable")
+        self._sorted_names = self._names[order].astype(str)
+        self._sorted_rows = order
+        self._unsorted_from = len(self._keys)
+
+    def upsert(self, records):
+        """
+        Thêm/cập nhật nhiều bản ghi {key: record}; dòng cũ bị đánh dấu chết.
+        """
+        if not records:
+            return
+        keys = list(records)
+        values = list(records.values())
+        with self._lock:
+            for key in keys:
+                row = self._row_of.get(key)
+                if row is not None:
+                    self._alive[row] = False
+            base = len(self._keys)
+            self._keys.extend(keys)
+            self._row_of.update((k, base + i) for i, k in enumerate(keys))
+            names = np.array([str(r.get("user_name", "")).lower() for r in values], dtype=object)
+            self._names = np.concatenate([self._names, names])
+            self._types = np.concatenate([self._types, np.array(
+                [_TYPE_CODES.get(r.get("type"), OTHER_TYPE) for r in values], dtype=np.int8)])
+            self._times = np.concatenate([self._times, _parse_timestamps(
+                [str(r.get("timestamp", "")) for r in values])])
+            self._results = np.concatenate([self._results, np.array(
+                [self._result_code(r.get("result")) for r in values], dtype=np.int32)])
+            self._alive = np.concatenate([self._alive, np.ones(len(keys), dtype=bool)])
+            if len(self._keys) - self._unsorted_from >= MERGE_THRESHOLD:
+                self._compact()
+
+    def delete(self, key):
+        with self._lock:
+            row = self._row_of.pop(key, None)
+            if row is not None:
+                self._alive[row] = False
+
+    def _compact(self):
+        """
+        Bỏ các dòng chết và sắp xếp lại cột tên.
+        """
+        keep = np.flatnonzero(self._alive)
+        self._keys = [self._keys[i] for i in keep]
+        self._row_of = {k: i for i, k in enumerate(self._keys)}
+        self._names = self._names[keep]
+        self._types = self._types[keep]
+        self._times = self._times[keep]
+        self._results = self._results[keep]
+        self._alive = np.ones(len(keep), dtype=bool)
+        self._sort_names()
+
+    def on_mirror_event(self, event, payload):
+        """
+        Nhận sự kiện từ DiagnosesMirror.subscribe: ("reset"|"upsert", {key: record})
+        hoặc ("delete", key).
+        """
+        if event == "reset":
+            self.reset(payload)
+        elif event == "upsert":
+            self.upsert(payload)
+        elif event == "delete":
+            self.delete(payload)
+
+    # ==== TRUY VẤN ====
+    @property
+    def result_labels(self):
+        with self._lock:
+            return list(self._result_labels)
+
+    def __len__(self):
+        with self._lock:
+            return int(self._alive.sum())
+
+    def search(self, name_prefix=None, types=None, start=None, end=None, results=None):
+        """
+        Trả về danh sách khóa khớp mọi điều kiện, sắp theo khóa giảm dần (mới nhất trước).
+
+        `start`/`end` là date/datetime/chuỗi (bao gồm hai đầu, `end` là date thì tính cả ngày), `types` là tập
+        loại chẩn đoán, `results` là tập chuỗi kết quả.
+        """
+        with self._lock:
+            mask = self._alive.copy()
+            if name_prefix:
+                prefix = name_prefix.lower()
+                hit = np.zeros(len(mask), dtype=bool)
+                lo = np.searchsorted(self._sorted_names, prefix, side="left")
+                hi = np.searchsorted(self._sorted_names, prefix + _PREFIX_END, side="left")
+                hit[self._sorted_rows[lo:hi]] = True
+                # Phần mới nối thêm chưa được sắp xếp
+                tail = self._names[self._unsorted_from:].astype(str)
+                if len(tail):
+                    hit[self._unsorted_from:] = np.char.startswith(tail, prefix)
+                mask &= hit
+            if types:
+                codes = [_TYPE_CODES.get(t, OTHER_TYPE) for t in types]
+                mask &= np.isin(self._types, codes)
+            if start is not None or end is not None:
+                mask &= self._times != _NAT
+                if start is not None:
+                    mask &= self._times >= to_epoch(start)
+                if end is not None:
+                    mask &= self._times <= to_epoch(end, end_of_day=True)
+            if results:
+                codes = [self._result_codes[r] for r in results if r in self._result_codes]
+                mask &= np.isin(self._results, codes)
+            rows = np.flatnonzero(mask)
+            keys = [self._keys[i] for i in rows]
+        keys.sort(reverse=True)
+        return keys
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Chỉ mục dùng chung trong tiến trình, cập nhật theo bản sao `core.mirror`.
+    """
+    global _index
+    m = mirror.get_mirror()
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = DiagnosisIndex()
+                m.subscribe(_index.on_mirror_event)
+    m.refresh()
+    return _index
@@ -0,0 +1,202 @@
+"""
+Chạy shadow một mô hình ứng viên trên lưu lượng thật để so với mô hình đang dùng
+(không phụ thuộc Streamlit).
+
+    SHADOW_MODELS="obesity=NutriAI1.sav" streamlit run app.py
+
+Mỗi lô mà bộ gom lô (core.batching) đã dự đoán bằng mô hình chính được gửi kèm
+kết quả và thời gian chạy sang `observe`; việc này chỉ đặt lô vào hàng đợi của
+một pool luồng riêng rồi trả về ngay, nên không làm chậm đường xử lý yêu cầu.
+Luồng shadow chấm lại lô bằng mô hình ứng viên rồi cộng dồn tỷ lệ trùng kết quả,
+các cặp kết quả lệch nhau và chênh lệch độ trễ (ứng viên trừ chính) trên cùng lô.
+Khi hàng đợi đầy (SHADOW_MAX_PENDING lô), lô mới bị bỏ qua và đếm vào `dropped`;
+SHADOW_SAMPLE (0-1) chỉ chấm một phần lưu lượng.
+
+Số liệu được tính riêng cho từng cặp (phiên bản chính, phiên bản ứng viên) và
+bắt đầu lại khi một trong hai đổi, vd. sau `ModelRegistry.promote`.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from core import metrics, models
+from core.inference import predict_batch
+
+SAMPLE = float(os.environ.get("SHADOW_SAMPLE", "1"))
+MAX_PENDING = int(os.environ.get("SHADOW_MAX_PENDING", "64"))
+STATS_WINDOW = 1024
+
+
+def parse_candidates(spec):
+    """
+    "obesity=NutriAI1.sav,heart=x.sav" -> {"obesity": "NutriAI1.sav", "heart": "x.sav"}.
+    """
+    out = {}
+    for item in (spec or "").split(","):
+        name, sep, filename = item.partition("=")
+        if sep and name.strip() and filename.strip():
+            out[name.strip()] = filename.strip()
+    return out
+
+
+CANDIDATES = parse_candidates(os.environ.get("SHADOW_MODELS", ""))
+
+
+class _Comparison:
+    __slots__ = ("primary", "candidate", "batches", "rows", "agree", "disagreements",
+                 "primary_ms", "candidate_ms", "deltas")
+
+    def __init__(self, primary, candidate):
+        self.primary = primary
+        self.candidate = candidate
+        self.batches = 0
+        self.rows = 0
+        self.agree = 0
+        self.disagreements = {}  # (kết quả chính, kết quả ứng viên) -> số dòng
+        self.primary_ms = 0.0
+        self.candidate_ms = 0.0
+        self.deltas = deque(maxlen=STATS_WINDOW)  # ms trên mỗi lô
+
+
+class ShadowEvaluator:
+    def __init__(self, registry=None, candidates=None, sample=SAMPLE, max_pending=MAX_PENDING):
+        self.registry = registry or models.get_registry()
+        self.sample = sample
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._candidates = {}  # tên -> ModelRegistry chỉ chứa mô hình ứng viên
+        self._comparisons = {}
+        self._pending = 0
+        self._dropped = {}
+        self._errors = {}
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="shadow")
+        for name, filename in (CANDIDATES if candidates is None else candidates).items():
+            self.set_candidate(name, filename)
+
+    def set_candidate(self, name, filename):
+        """
+        Chạy shadow `filename` cho mô hình `name`; `filename=None` tắt shadow của mô hình đó.
+        """
+        with self._lock:
+            if filename is None:
+                self._candidates.pop(name, None)
+            else:
+                self._candidates[name] = models.ModelRegistry(
+                    model_dir=self.registry.model_dir, artifacts={name: filename}, active_file="")
+            self._comparisons.pop(name, None)
+            self._errors.pop(name, None)
+
+    def candidate(self, name):
+        """
+        File ứng viên đang chạy shadow cho `name`, hoặc None.
+        """
+        registry = self._candidates.get(name)
+        return registry.artifacts[name] if registry is not None else None
+
+    def observe(self, name, X, results, seconds, version):
+        """
+        Đặt một lô đã dự đoán bởi mô hình chính (`version`, mất `seconds`) vào hàng đợi shadow.
+        """
+        if name not in self._candidates or (self.sample < 1 and random.random() >= self.sample):
+            return
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._dropped[name] = self._dropped.get(name, 0) + 1
+                return
+            self._pending += 1
+        self._executor.submit(self._score, name, X, results, seconds, version)
+
+    def _score(self, name, X, results, seconds, version):
+        try:
+            registry = self._candidates.get(name)
+            model = registry.get(name) if registry is not None else None
+            if model is None:
+                if registry is not None:
+                    self._errors[name] = registry.error(name)
+                return
+            started = time.perf_counter()
+            with metrics.timed("shadow_predict", name):
+                candidate = predict_batch(name, model, X)
+            elapsed = time.perf_counter() - started
+            self._record(name, version, registry.version(name), np.asarray(results, dtype=object),
+                         np.asarray(candidate, dtype=object), seconds, elapsed)
+        except Exception as e:
+            self._errors[name] = f"{type(e).__name__}: {e}"
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _record(self, name, primary, candidate, results, candidate_results, seconds, elapsed):
+        same = results == candidate_results
+        with self._lock:
+            c = self._comparisons.get(name)
+            if c is None or (c.primary, c.candidate) != (primary, candidate):
+                c = self._comparisons[name] = _Comparison(primary, candidate)
+            c.batches += 1
+            c.rows += len(results)
+            c.agree += int(same.sum())
+            for pair in zip(results[~same].tolist(), candidate_results[~same].tolist()):
+                c.disagreements[pair] = c.disagreements.get(pair, 0) + 1
+            c.primary_ms += seconds * 1000
+            c.candidate_ms += elapsed * 1000
+            c.deltas.append((elapsed - seconds) * 1000)
+
+    def flush(self, timeout=None):
+        """
+        Chờ các lô đang chờ chấm xong (dùng khi đo/kiểm thử); trả về False nếu hết thời gian.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._pending:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def stats(self):
+        """
+        {tên: số liệu so sánh} cho các mô hình đang chạy shadow.
+        """
+        with self._lock:
+            names = sorted(self._candidates)
+            comparisons = {n: self._comparisons.get(n) for n in names}
+            out = {}
+            for name in names:
+                c = comparisons[name]
+                s = {"candidate_file": self.candidate(name), "dropped": self._dropped.get(name, 0),
+                     "error": self._errors.get(name)}
+                if c is not None:
+                    deltas = np.array(c.deltas, dtype=np.float64)
+                    s.update({
+                        "primary_version": c.primary, "candidate_version": c.candidate,
+                        "batches": c.batches, "rows": c.rows,
+                        "agreement": c.agree / c.rows if c.rows else None,
+                        "disagreements": sorted(((p, q, n) for (p, q), n in c.disagreements.items()),
+                                                key=lambda x: -x[2]),
+                        "primary_ms_per_batch": c.primary_ms / c.batches,
+                        "candidate_ms_per_batch": c.candidate_ms / c.batches,
+                        "delta_ms_p50": float(np.percentile(deltas, 50)),
+                        "delta_ms_p95": float(np.percentile(deltas, 95)),
+                    })
+                out[name] = s
+        return out
+
+
+_shadow = None
+_shadow_lock = threading.Lock()
+
+
+def get_shadow():
+    """
+    Bộ chạy shadow dùng chung trong tiến trình (ứng viên ban đầu từ SHADOW_MODELS).
+    """
+    global _shadow
+    if _shadow is None:
+        with _shadow_lock:
+            if _shadow is None:
+                _shadow = ShadowEvaluator()
+    return _shadow
@@ -0,0 +1,174 @@
+"""
+Đo thời gian khởi động nguội của các trang Streamlit (không phụ thuộc Streamlit khi import).
+
+    python -m core.startup                               # app.py, pages/lich_su.py, pages/admin.py
+    python -m core.startup pages/admin.py --top 15
+    python -m core.startup --target-ms 1500              # mã thoát 1 nếu trang nào vượt mục tiêu
+
+Mỗi trang được chạy trong một tiến trình Python mới với `-X importtime`: tiến
+trình con import streamlit trước (phần server Streamlit đã trả sẵn), rồi chạy
+lần render đầu của trang bằng `streamlit.testing.v1.AppTest`. Báo cáo gồm thời
+gian render đầu (gồm import của trang và mọi thứ trang nạp trong lần chạy đầu),
+thời gian import theo gói (tổng thời gian tự thân của các module trong gói) và
+các module nặng / mô hình đã bị nạp. Trang chạy với cấu hình lưu trữ hiện tại
+(STORAGE_BACKEND...), nên nên đo với kho cục bộ hoặc RTDB giả lập.
+
+Khi chạy thật, mỗi trang gọi `first_render(tên trang)` sau lần render đầu; thời
+gian từ lúc tiến trình khởi động tới đó được ghi vào core.metrics (op "startup")
+một lần cho mỗi trang trong tiến trình.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from core import metrics
+
+PAGES = ("app.py", "pages/lich_su.py", "pages/admin.py")
+TARGET_MS = float(os.environ.get("STARTUP_TARGET_MS", "0"))
+HEAVY_MODULES = ("numpy", "pandas", "pyarrow", "sklearn", "joblib", "requests", "pytz")
+MARKER = "--- core.startup: page ---"
+
+_imported_at = time.time()
+_seen = set()
+_seen_lock = threading.Lock()
+
+
+def process_age():
+    """
+    Số giây từ lúc tiến trình khởi động (Linux: /proc), hoặc từ lúc import module này.
+    """
+    try:
+        with open("/proc/self/stat", encoding="ascii") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", encoding="ascii") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.time() - _imported_at
+
+
+def first_render(page):
+    """
+    Ghi thời gian tới lần render đầu của `page` (một lần mỗi trang mỗi tiến trình).
+    """
+    if page in _seen:
+        return
+    with _seen_lock:
+        if page in _seen:
+            return
+        _seen.add(page)
+    metrics.get_metrics().observe("startup", page, process_age())
+
+
+# ==== BÁO CÁO ====
+def parse_importtime(lines):
+    """
+    [(module, tự thân µs, tích lũy µs, độ sâu)] từ stderr của `python -X importtime`.
+    """
+    out = []
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # dòng tiêu đề
+        name = parts[2].rstrip()
+        stripped = name.lstrip()
+        out.append((stripped, int(parts[0]), int(parts[1]), (len(name) - len(stripped) - 1) // 2))
+    return out
+
+
+def by_package(entries):
+    """
+    [(gói, ms)] tổng thời gian import tự thân theo gói cấp cao nhất, giảm dần.
+    """
+    totals = {}
+    for name, self_us, _, _ in entries:
+        package = name.split(".")[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return sorted(((p, us / 1000) for p, us in totals.items()), key=lambda x: -x[1])
+
+
+def _child(page):
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    streamlit_ms = (time.perf_counter() - started) * 1000
+    print(MARKER, file=sys.stderr, flush=True)
+
+    started = time.perf_counter()
+    at = AppTest.from_file(os.path.abspath(page), default_timeout=300).run()
+    render_ms = (time.perf_counter() - started) * 1000
+    models = sys.modules.get("core.models")
+    loaded = []
+    if models is not None and models._registry is not None:
+        loaded = [name for name, status in models._registry.status().items() if status == "loaded"]
+    print(json.dumps({
+        "page": page,
+        "streamlit_import_ms": streamlit_ms,
+        "first_render_ms": render_ms,
+        "exceptions": [str(e.value) for e in at.exception],
+        "heavy_modules": [m for m in HEAVY_MODULES if m in sys.modules],
+        "models_loaded": loaded,
+    }, ensure_ascii=False))
+
+
+def profile(page):
+    """
+    Đo một trang trong tiến trình mới; trả về dict kết quả kèm `imports` [(gói, ms)].
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-m", "core.startup", "--child", page],
+                          capture_output=True, text=True)
+    if proc.returncode != 0 or not proc.stdout.strip():
+        raise RuntimeError(f"Không đo được {page}: {proc.stderr.strip().splitlines()[-1:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    stderr = proc.stderr.splitlines()
+    after = stderr[stderr.index(MARKER) + 1:] if MARKER in stderr else stderr
+    entries = parse_importtime(after)
+    result["import_ms"] = sum(e[1] for e in entries) / 1000
+    result["modules"] = len(entries)
+    result["imports"] = by_package(entries)
+    return result
+
+
+def format_report(result, top=10):
+    lines = [
+        f"{result['page']}: render đầu {result['first_render_ms']:.0f} ms "
+        f"(import {result['import_ms']:.0f} ms, {result['modules']} module; "
+        f"streamlit nạp trước {result['streamlit_import_ms']:.0f} ms)",
+        f"  module nặng: {', '.join(result['heavy_modules']) or '-'}",
+        f"  mô hình đã nạp: {', '.join(result['models_loaded']) or '-'}",
+    ]
+    if result["exceptions"]:
+        lines.append(f"  lỗi: {result['exceptions']}")
+    lines += [f"  {package:<24} {ms:>8.1f} ms" for package, ms in result["imports"][:top]]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đo thời gian khởi động nguội của các trang Streamlit.")
+    parser.add_argument("pages", nargs="*", default=list(PAGES))
+    parser.add_argument("--top", type=int, default=10, help="số gói hiển thị")
+    parser.add_argument("--target-ms", type=float, default=TARGET_MS,
+                        help="mục tiêu thời gian render đầu (0: không kiểm tra)")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        return _child(args.child)
+
+    results = [profile(page) for page in args.pages]
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print("\n\n".join(format_report(r, args.top) for r in results))
+    over = [r["page"] for r in results if args.target_ms and r["first_render_ms"] > args.target_ms]
+    if over:
+        parser.exit(1, f"Vượt mục tiêu {args.target_ms:.0f} ms: {', '.join(over)}\n")
+
+
+if __name__ == "__main__":
+    main()
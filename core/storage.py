@@ -0,0 +1,214 @@
+"""
+Client HTTP dùng chung cho Firebase Realtime Database (REST).
+
+Một `requests.Session` với pool kết nối keep-alive được dùng lại cho mọi lời
+gọi, có timeout, retry với backoff và base URL cấu hình được qua biến môi
+trường, để test/benchmark có thể trỏ sang RTDB giả lập (core.rtdb_stub).
+Với STORAGE_BACKEND=local, `get_client()` trả về kho cục bộ (core.local_store)
+cùng giao diện, không cần Firebase.
+"""
+import json
+import os
+import random
+import threading
+import time
+
+DEFAULT_FIREBASE_URL = "https://bai-test-2ae56-default-rtdb.asia-southeast1.firebasedatabase.app"
+
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "firebase")
+FIREBASE_URL = os.environ.get("FIREBASE_URL", DEFAULT_FIREBASE_URL).rstrip("/")
+CONNECT_TIMEOUT = float(os.environ.get("FIREBASE_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.environ.get("FIREBASE_READ_TIMEOUT", "10"))
+MAX_RETRIES = int(os.environ.get("FIREBASE_MAX_RETRIES", "3"))
+BACKOFF_FACTOR = float(os.environ.get("FIREBASE_BACKOFF_FACTOR", "0.2"))
+POOL_SIZE = int(os.environ.get("FIREBASE_POOL_SIZE", "20"))
+
+# POST (push) không idempotent nên chỉ được thử lại khi lỗi kết nối,
+# các phương thức còn lại được thử lại cả khi server trả lỗi tạm thời.
+RETRY_METHODS = frozenset({"GET", "PUT", "PATCH", "DELETE"})
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Tham số truy vấn truyền nguyên văn, các tham số khác (orderBy, startAt...) mã hóa JSON
+RAW_PARAMS = frozenset({"print", "format", "timeout", "writeSizeLimit"})
+
+PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+
+class FirebaseClient:
+    """
+    Client REST cho RTDB; mọi lỗi HTTP được ném ra dưới dạng `requests.RequestException`.
+    """
+
+    def __init__(self, base_url=None, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 max_retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR, pool_size=POOL_SIZE,
+                 auth=None):
+        self.base_url = (base_url or FIREBASE_URL).rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.auth = auth
+        # Nạp requests khi tạo client đầu tiên, không nạp khi chỉ import module (vd. trang
+        # chưa cần dữ liệu hoặc STORAGE_BACKEND=local)
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=RETRY_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def url(self, path):
+        return f"{self.base_url}/{path.strip('/')}.json"
+
+    def _params(self, params):
+        # RTDB yêu cầu giá trị của orderBy/startAt/... là chuỗi JSON
+        out = {k: (v if k in RAW_PARAMS else json.dumps(v))
+               for k, v in (params or {}).items() if v is not None}
+        if self.auth:
+            out["auth"] = self.auth
+        return out
+
+    def request(self, method, path, data=None, params=None):
+        resp = self.session.request(
+            method, self.url(path),
+            json=data, params=self._params(params), timeout=self.timeout,
+        )
+        resp.raise_for_status()
+        return resp.json() if resp.content else None
+
+    def get(self, path, params=None):
+        return self.request("GET", path, params=params)
+
+    def push(self, path, data):
+        """
+        POST một bản ghi mới, trả về {"name": <key>}.
+        """
+        return self.request("POST", path, data)
+
+    def put(self, path, data):
+        return self.request("PUT", path, data)
+
+    def update(self, path, data):
+        """
+        PATCH cập nhật một phần; khóa dạng "a/b" cho phép cập nhật nhiều đường dẫn.
+        """
+        return self.request("PATCH", path, data)
+
+    def delete(self, path):
+        return self.request("DELETE", path)
+
+    # ==== PHÂN TRANG THEO KHÓA ====
+    # Push ID tăng dần theo thời gian nên sắp theo $key cũng là sắp theo thời điểm tạo.
+    # REST trả về object không có thứ tự, các hàm dưới trả về list (key, value) đã sắp.
+    def page_before(self, path, limit, end_key=None):
+        """
+        Tối đa `limit` bản ghi mới nhất có khóa nhỏ hơn `end_key` (tăng dần theo khóa).
+        """
+        params = {"orderBy": "$key", "limitToLast": limit}
+        if end_key is not None:
+            params["endAt"] = end_key
+            params["limitToLast"] = limit + 1
+        items = sorted((self.get(path, params) or {}).items())
+        if end_key is not None:
+            items = [kv for kv in items if kv[0] < end_key]
+        return items[-limit:]
+
+    def page_after(self, path, start_key, limit=None):
+        """
+        Các bản ghi có khóa lớn hơn `start_key` (tăng dần theo khóa), tối đa `limit`.
+        """
+        params = {"orderBy": "$key", "startAt": start_key}
+        if limit is not None:
+            params["limitToFirst"] = limit + 1
+        items = [kv for kv in sorted((self.get(path, params) or {}).items()) if kv[0] > start_key]
+        return items if limit is None else items[:limit]
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Client dùng chung trong cả tiến trình (mọi trang/phiên Streamlit).
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if STORAGE_BACKEND == "local":
+                    from core import local_store
+                    _client = local_store.get_store()
+                else:
+                    _client = FirebaseClient()
+    return _client
+
+
+def set_client(client):
+    """
+    Thay client dùng chung, ví dụ để trỏ sang RTDB giả lập khi test.
+    """
+    global _client
+    with _client_lock:
+        _client = client
+
+
+_last_push_time = 0
+_last_rand = []
+_push_lock = threading.Lock()
+
+
+def generate_push_id():
+    """
+    Sinh khóa 20 ký tự tăng dần theo thời gian giống push ID của Firebase.
+    """
+    global _last_push_time, _last_rand
+    with _push_lock:
+        now = int(time.time() * 1000)
+        if now == _last_push_time:
+            # Cùng mili-giây: tăng phần ngẫu nhiên để giữ thứ tự
+            for i in range(11, -1, -1):
+                if _last_rand[i] != 63:
+                    _last_rand[i] += 1
+                    break
+                _last_rand[i] = 0
+        else:
+            _last_rand = [random.randrange(64) for _ in range(12)]
+        _last_push_time = now
+        return push_id_prefix(now) + "".join(PUSH_CHARS[r] for r in _last_rand)
+
+
+def push_id_prefix(ms):
+    """
+    8 ký tự đầu của push ID sinh ở thời điểm `ms` (mili-giây epoch); mọi push ID
+    sinh từ thời điểm đó trở đi đều lớn hơn hoặc bằng chuỗi này.
+    """
+    ts = []
+    for _ in range(8):
+        ts.append(PUSH_CHARS[ms % 64])
+        ms //= 64
+    return "".join(reversed(ts))
+
+
+def push_id_time(key):
+    """
+    Thời điểm (mili-giây epoch) mã hóa trong push ID, hoặc None nếu `key` không phải push ID.
+    """
+    if len(key) != 20:
+        return None
+    ms = 0
+    for ch in key[:8]:
+        i = PUSH_CHARS.find(ch)
+        if i < 0:
+            return None
+        ms = ms * 64 + i
+    return ms
@@ -0,0 +1,407 @@
+"""
+Hàng đợi ghi nền (write-behind) cho các bản ghi chẩn đoán.
+
+`enqueue` sinh push ID phía client, ghi bản ghi vào spool trên đĩa rồi trả về
+ngay; một luồng nền gom các bản ghi thành một PATCH nhiều đường dẫn. Vì khóa
+được sinh trước, gửi lại sau khi khởi động lại hay sau lỗi mạng là idempotent.
+Bản ghi có thể kèm các bộ đếm cần tăng (`increments`), được cộng dồn trong lô
+và gửi trong cùng PATCH dưới dạng giá trị máy chủ {".sv": {"increment": n}};
+khác với bản ghi, phần này không idempotent khi gửi lại (xem core.aggregates).
+`enqueue_many` đưa nhiều bản ghi vào cùng một nhóm: nhóm không bao giờ bị chia
+giữa hai lô nên các bản ghi của nó được ghi (hoặc thất bại) trong cùng một PATCH.
+Mỗi dịch vụ có spool riêng (`get_queue(service)` -> `<WRITE_SPOOL_DIR>/<service>.jsonl`:
+Streamlit dùng "diagnoses", API dùng "api"). Spool được giữ bằng khóa file
+(`<spool>.lock`) suốt đời hàng đợi; nếu tiến trình khác đang giữ (vd. nhiều
+worker cùng dịch vụ), hàng đợi dùng spool riêng theo PID (`<service>.<pid>.jsonl`).
+Tiến trình giữ được spool chính nhận lại các spool theo PID không còn ai giữ.
+
+Bản ghi được tuần tự hóa ngay khi `enqueue` (JSON chuẩn, không NaN/Infinity,
+khóa không chứa ký tự RTDB cấm) nên bản ghi hỏng bị từ chối bằng ValueError
+thay vì chặn hàng đợi. Lô gặp lỗi vĩnh viễn khi ghi (HTTP 4xx, dữ liệu không
+hợp lệ) được gửi lại theo từng nhóm; nhóm vẫn lỗi được chuyển sang file
+dead-letter (`<spool>.dead.jsonl`) và hàng đợi tiếp tục xả. Lỗi tạm thời
+(mạng, 5xx, 408/429) được thử lại với backoff như trước.
+"""
+import atexit
+import glob
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+
+from core import storage
+
+try:
+    import fcntl
+except ImportError:  # Windows: không khóa, mỗi dịch vụ vẫn có spool riêng
+    fcntl = None
+
+SPOOL_DIR = os.environ.get("WRITE_SPOOL_DIR", ".spool")
+BATCH_SIZE = int(os.environ.get("WRITE_BATCH_SIZE", "200"))
+FLUSH_INTERVAL = float(os.environ.get("WRITE_FLUSH_INTERVAL", "0.2"))
+MAX_BACKOFF = 30.0
+# Ký tự RTDB không cho phép trong khóa
+FORBIDDEN_KEY_CHARS = frozenset(".$#[]/")
+_PID_SUFFIX = re.compile(r"\d+(_\d+)?")
+
+
+class WriteBehindQueue:
+    def __init__(self, client=None, spool_path=None, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, fsync=False):
+        self.client = client or storage.get_client()
+        self.spool_path = spool_path or os.path.join(SPOOL_DIR, "diagnoses.jsonl")
+        self._lock_file = None
+        os.makedirs(os.path.dirname(self.spool_path) or ".", exist_ok=True)
+        primary = self._claim_spool()
+        self.dead_letter_path = os.path.splitext(self.spool_path)[0] + ".dead.jsonl"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._closed = False
+        self._stats = {
+            "enqueued": 0, "flushed": 0, "flushes": 0, "failed_flushes": 0, "dead_lettered": 0,
+            "last_flush_latency": None, "avg_flush_latency": None, "last_error": None,
+        }
+
+        self._replay_spool(self._orphans() if primary else [])
+        self._spool = open(self.spool_path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    # ==== SPOOL TRÊN ĐĨA ====
+    def _claim_spool(self):
+        """
+        Giữ khóa spool; nếu tiến trình khác đang giữ thì chuyển sang spool theo PID.
+        Trả về True nếu giữ được spool chính.
+        """
+        self._lock_file = _try_lock(self.spool_path)
+        if self._lock_file is not None:
+            return True
+        base, ext = os.path.splitext(self.spool_path)
+        n = 0
+        while self._lock_file is None:
+            suffix = str(os.getpid()) if n == 0 else f"{os.getpid()}_{n}"
+            self.spool_path = f"{base}.{suffix}{ext}"
+            self._lock_file = _try_lock(self.spool_path)
+            n += 1
+        return False
+
+    def _orphans(self):
+        """
+        [(đường dẫn, file khóa đã giữ)] các spool theo PID không còn tiến trình nào giữ.
+        """
+        base, ext = os.path.splitext(self.spool_path)
+        out = []
+        for path in glob.glob(f"{glob.escape(base)}.*{ext}"):
+            if not _PID_SUFFIX.fullmatch(path[len(base) + 1:len(path) - len(ext)]):
+                continue
+            lock = _try_lock(path)
+            if lock is not None:
+                out.append((path, lock))
+        return out
+
+    def _replay_spool(self, orphans=()):
+        """
+        Nạp lại các bản ghi chưa được xác nhận từ lần chạy trước (kể cả từ các spool mồ côi).
+        """
+        entries = {}
+        for path in [self.spool_path] + [path for path, _ in orphans]:
+            _read_spool(path, entries)
+        self._pending.extend(entries.values())
+        # Viết lại spool chỉ còn bản ghi chưa gửi
+        with open(self.spool_path, "w", encoding="utf-8") as f:
+            for entry in self._pending:
+                f.write(json.dumps(_spool_item(*entry), ensure_ascii=False) + "\n")
+        # Bản ghi của spool mồ côi giờ đã nằm trong spool này
+        for path, lock in orphans:
+            os.remove(path)
+            os.remove(lock.name)
+            lock.close()
+
+    def _spool_write(self, obj):
+        self._spool_write_lines(json.dumps(obj, ensure_ascii=False) + "\n")
+
+    def _spool_write_lines(self, text):
+        self._spool.write(text)
+        self._spool.flush()
+        if self.fsync:
+            os.fsync(self._spool.fileno())
+
+    def _dead_letter(self, entries, error):
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                item = dict(_spool_item(*entry), error=error)
+                f.write(json.dumps(item, ensure_ascii=False, default=str) + "\n")
+
+    # ==== API ====
+    def enqueue(self, path, data, increments=None):
+        """
+        Đưa một bản ghi vào hàng đợi để POST vào `path`, trả về khóa đã sinh.
+
+        `increments` ({đường dẫn: số}) được tăng trên server trong cùng lần ghi.
+        """
+        key = storage.generate_push_id()
+        line = _encode(_spool_item(path, key, data, increments))
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Hàng đợi ghi đã đóng")
+            self._spool_write_lines(line)
+            self._pending.append((path, key, data, increments, None))
+            self._stats["enqueued"] += 1
+            self._cond.notify()
+        return key
+
+    def enqueue_many(self, path, records, increments=None):
+        """
+        Đưa nhiều bản ghi vào `path` như một nhóm ghi trong cùng một PATCH; trả về danh sách khóa.
+
+        `increments` của cả nhóm được gắn vào bản ghi đầu tiên.
+        """
+        keys = [storage.generate_push_id() for _ in records]
+        group = keys[0] if len(keys) > 1 else None
+        entries = [(path, key, data, increments if i == 0 else None, group)
+                   for i, (key, data) in enumerate(zip(keys, records))]
+        text = "".join(_encode(_spool_item(*e)) for e in entries)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Hàng đợi ghi đã đóng")
+            # Một lần ghi spool cho cả nhóm để không còn nhóm ghi dở sau khi tiến trình dừng
+            self._spool_write_lines(text)
+            self._pending.extend(entries)
+            self._stats["enqueued"] += len(entries)
+            self._cond.notify()
+        return keys
+
+    def depth(self):
+        with self._cond:
+            return len(self._pending) + self._in_flight
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, depth=len(self._pending) + self._in_flight)
+
+    def flush(self, timeout=None):
+        """
+        Chờ tới khi hàng đợi trống; trả về False nếu hết thời gian chờ.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify()
+            while self._pending or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=5.0):
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        self._spool.close()
+        self._lock_file.close()
+
+    # ==== LUỒNG NỀN ====
+    def _take_batch(self):
+        batch = []
+        while self._pending and len(batch) < self.batch_size:
+            batch.append(self._pending.popleft())
+        # Không tách một nhóm: lấy nốt các bản ghi cùng nhóm dù vượt batch_size
+        group = batch[-1][4] if batch else None
+        while group is not None and self._pending and self._pending[0][4] == group:
+            batch.append(self._pending.popleft())
+        self._in_flight = len(batch)
+        return batch
+
+    def _run(self):
+        backoff = 0.0
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._pending:
+                    return
+                # Chờ thêm một chút để gom thành lô lớn hơn
+                if len(self._pending) < self.batch_size and not self._closed:
+                    self._cond.wait(self.flush_interval)
+                batch = self._take_batch()
+
+            started = time.perf_counter()
+            dead, rest, error = [], [], None
+            try:
+                self._send(batch)
+            except Exception as e:
+                if _permanent(e):
+                    # Tìm nhóm gây lỗi: gửi lại từng nhóm, nhóm lỗi vĩnh viễn vào dead-letter
+                    dead, rest, error = self._send_units(batch)
+                else:
+                    rest, error = batch, str(e)
+            if rest:
+                with self._cond:
+                    # Trả phần chưa gửi (luôn là đuôi của lô) về đầu hàng đợi, giữ nguyên thứ tự
+                    done = batch[:len(batch) - len(rest)]
+                    if done:
+                        self._spool_write({"ack": [key for _, key, *_ in done]})
+                    self._pending.extendleft(reversed(rest))
+                    self._in_flight = 0
+                    self._stats["failed_flushes"] += 1
+                    self._stats["flushed"] += len(done) - len(dead)
+                    self._stats["dead_lettered"] += len(dead)
+                    self._stats["last_error"] = error
+                    closed = self._closed
+                if closed:
+                    return  # phần còn lại vẫn nằm trong spool cho lần chạy sau
+                backoff = min(MAX_BACKOFF, backoff * 2 or self.flush_interval or 0.1)
+                time.sleep(backoff)
+                continue
+
+            latency = time.perf_counter() - started
+            backoff = 0.0
+            with self._cond:
+                self._spool_write({"ack": [key for _, key, *_ in batch]})
+                self._in_flight = 0
+                s = self._stats
+                s["flushed"] += len(batch) - len(dead)
+                s["dead_lettered"] += len(dead)
+                s["flushes"] += 1
+                s["last_flush_latency"] = latency
+                avg = s["avg_flush_latency"]
+                s["avg_flush_latency"] = latency if avg is None else 0.9 * avg + 0.1 * latency
+                s["last_error"] = error
+                if not self._pending:
+                    # Mọi bản ghi đã được xác nhận: thu gọn spool
+                    self._spool.seek(0)
+                    self._spool.truncate()
+                self._cond.notify_all()
+
+    def _send(self, batch):
+        payload = {f"{path}/{key}": data for path, key, data, *_ in batch}
+        totals = {}
+        for *_, inc, _ in batch:
+            for counter, n in (inc or {}).items():
+                totals[counter] = totals.get(counter, 0) + n
+        payload.update((counter, {".sv": {"increment": n}}) for counter, n in totals.items() if n)
+        self.client.update("", payload)
+
+    def _send_units(self, batch):
+        """
+        Gửi lần lượt từng nhóm của lô; trả về (bản ghi đã chuyển dead-letter, bản ghi
+        chưa gửi do lỗi tạm thời, lỗi cuối cùng).
+        """
+        units = []
+        for entry in batch:
+            if units and entry[4] is not None and units[-1][0][4] == entry[4]:
+                units[-1].append(entry)
+            else:
+                units.append([entry])
+        dead, error = [], None
+        for i, unit in enumerate(units):
+            try:
+                self._send(unit)
+            except Exception as e:
+                error = str(e)
+                if not _permanent(e):
+                    return dead, [entry for u in units[i:] for entry in u], error
+                self._dead_letter(unit, error)
+                dead += unit
+        return dead, [], error
+
+
+def _try_lock(spool_path):
+    """
+    File khóa của spool đã được giữ (không chờ), hoặc None nếu tiến trình khác đang giữ.
+    """
+    f = open(os.path.splitext(spool_path)[0] + ".lock", "a", encoding="utf-8")
+    if fcntl is not None:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return None
+    return f
+
+
+def _read_spool(path, entries):
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue  # dòng ghi dở khi tiến trình bị dừng
+            if "ack" in item:
+                for key in item["ack"]:
+                    entries.pop(key, None)
+            else:
+                entries[item["key"]] = (item["path"], item["key"], item["data"], item.get("inc"),
+                                        item.get("group"))
+
+
+def _permanent(error):
+    """
+    Lỗi mà gửi lại cũng không khỏi: dữ liệu không tuần tự hóa được hoặc HTTP 4xx (trừ 408/429).
+    """
+    if isinstance(error, (ValueError, TypeError)) and not isinstance(error, OSError):
+        return True
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status is not None and 400 <= status < 500 and status not in (408, 429)
+
+
+def _check_keys(value, where):
+    if isinstance(value, dict):
+        for k, v in value.items():
+            if not isinstance(k, str) or not k or FORBIDDEN_KEY_CHARS.intersection(k):
+                raise ValueError(f"Khóa không hợp lệ cho RTDB tại {where}: {k!r}")
+            _check_keys(v, f"{where}/{k}")
+    elif isinstance(value, list):
+        for i, v in enumerate(value):
+            _check_keys(v, f"{where}/{i}")
+
+
+def _encode(item):
+    """
+    Dòng spool của một bản ghi; ném ValueError nếu bản ghi không ghi được lên RTDB.
+    """
+    _check_keys(item["data"], f"{item['path']}/{item['key']}")
+    try:
+        return json.dumps(item, ensure_ascii=False, allow_nan=False) + "\n"
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Bản ghi không tuần tự hóa được thành JSON: {e}") from None
+
+
+def _spool_item(path, key, data, inc, group=None):
+    item = {"path": path, "key": key, "data": data}
+    if inc:
+        item["inc"] = inc
+    if group:
+        item["group"] = group
+    return item
+
+
+_queues = {}
+_queue_lock = threading.Lock()
+
+
+def get_queue(service="diagnoses"):
+    """
+    Hàng đợi dùng chung trong cả tiến trình cho dịch vụ `service` (spool
+    `<WRITE_SPOOL_DIR>/<service>.jsonl`); được xả khi tiến trình thoát.
+    """
+    queue = _queues.get(service)
+    if queue is None:
+        with _queue_lock:
+            queue = _queues.get(service)
+            if queue is None:
+                queue = _queues[service] = WriteBehindQueue(
+                    spool_path=os.path.join(SPOOL_DIR, f"{service}.jsonl"))
+                atexit.register(queue.close)
+    return queue
@@ -0,0 +1,103 @@
+"""
+Dựng form Streamlit từ schema đặc trưng (core.schema) cho trang chẩn đoán và trang admin.
+"""
+import streamlit as st
+
+PLACEHOLDER = "-- Chọn --"
+
+
+def _widget(feature, value=None, placeholder=False, key=None):
+    if feature.widget == "select":
+        options = feature.labels
+        index = 0
+        if placeholder and feature.placeholder:
+            options = [PLACEHOLDER] + options
+        elif value is not None:
+            index = options.index(feature.label_for(value))
+        return st.selectbox(feature.label, options, index=index, key=key)
+
+    cast = int if feature.dtype == "int" else float
+    if feature.widget == "slider":
+        default = feature.min_value if value is None else value
+        return st.slider(feature.label, cast(feature.min_value), cast(feature.max_value),
+                         cast(default), key=key)
+
+    kwargs = {"min_value": cast(feature.min_value), "step": cast(feature.step or 1)}
+    if feature.max_value is not None:
+        kwargs["max_value"] = cast(feature.max_value)
+    if value is not None:
+        kwargs["value"] = cast(value)
+    return st.number_input(feature.label, key=key, **kwargs)
+
+
+def render_form(schema, values=None, columns=2, placeholder=True, key_prefix=None):
+    """
+    Hiển thị các ô nhập theo schema và trả về dict `inputs` {tên đặc trưng: giá trị}.
+
+    `values` là `inputs` đã lưu (form chỉnh sửa); `placeholder=True` thêm lựa chọn
+    "-- Chọn --" cho các ô bắt buộc chọn như form chẩn đoán ban đầu.
+    """
+    cols = st.columns(columns) if columns > 1 else None
+    inputs = {}
+    for feature in schema.features:
+        key = f"{key_prefix}_{feature.name}" if key_prefix else None
+        value = values.get(feature.name) if values else None
+        if cols is not None:
+            with cols[min(feature.column, columns - 1)]:
+                inputs[feature.name] = _widget(feature, value, placeholder, key)
+        else:
+            inputs[feature.name] = _widget(feature, value, placeholder, key)
+    return inputs
+
+
+def missing_choices(inputs):
+    """
+    True nếu còn ô chọn đang ở "-- Chọn --".
+    """
+    return any(v == PLACEHOLDER for v in inputs.values())
+
+
+TYPE_LABELS = {"heart": "Tim mạch", "depression": "Trầm cảm", "obesity": "Béo phì"}
+
+
+def render_search_filters(result_options, key_prefix="search"):
+    """
+    Ô tìm kiếm theo tên và các bộ lọc loại/thời gian/kết quả.
+    Trả về kwargs cho `DiagnosisIndex.search`, hoặc None nếu không có điều kiện nào.
+    """
+    with st.expander("🔎 Tìm kiếm / lọc", expanded=False):
+        name = st.text_input("Tên người dùng bắt đầu bằng:", key=f"{key_prefix}_name").strip()
+        col1, col2 = st.columns(2)
+        with col1:
+            types = st.multiselect("Loại chẩn đoán:", list(TYPE_LABELS),
+                                   format_func=TYPE_LABELS.get, key=f"{key_prefix}_types")
+        with col2:
+            dates = st.date_input("Khoảng thời gian:", value=[], key=f"{key_prefix}_dates")
+        results = st.multiselect("Kết quả:", result_options, key=f"{key_prefix}_results")
+
+    start = dates[0] if len(dates) > 0 else None
+    end = dates[1] if len(dates) > 1 else start
+    if not (name or types or start or results):
+        return None
+    return {"name_prefix": name or None, "types": types, "start": start, "end": end,
+            "results": results}
+
+
+def render_screening_form(titles, key_prefix="screen"):
+    """
+    Form sàng lọc tổng hợp: phần thông tin chung (tuổi, giới tính...) nhập một lần,
+    sau đó phần riêng của từng loại trong `titles` ({loại: tiêu đề}).
+    Trả về {loại: inputs} theo nhãn của schema từng loại (core.screening.split),
+    hoặc None nếu còn ô chọn chưa chọn.
+    """
+    from core import screening  # kéo theo cache/bộ gom dự đoán, chỉ trang chẩn đoán cần
+
+    st.subheader("👤 Thông tin chung")
+    shared = render_form(screening.SHARED, key_prefix=f"{key_prefix}_shared")
+    specific = {}
+    for kind, title in titles.items():
+        st.subheader(title)
+        specific[kind] = render_form(screening.SPECIFIC[kind], key_prefix=f"{key_prefix}_{kind}")
+    if missing_choices(shared) or any(missing_choices(v) for v in specific.values()):
+        return None
+    return screening.split(shared, specific)
@@ -1,36 +1,119 @@
 import streamlit as st
-import requests
+from core import mirror, search, startup, storage
+from core.inference import ALL_MESSAGES
+from forms import render_search_filters
 
-# ==== CẤU HÌNH FIREBASE ====
-FIREBASE_URL = "https://bai-test-2ae56-default-rtdb.asia-southeast1.firebasedatabase.app"
+PAGE_SIZE = 20
 
-def fetch_diagnosis_history():
+def fetch_page(before_key=None):
     """
-    Lấy lịch sử chẩn đoán từ Firebase RTDB
+    Lấy một trang lịch sử chẩn đoán từ Firebase RTDB (mới nhất trước).
+    Chỉ tải `PAGE_SIZE` bản ghi qua truy vấn orderBy="$key"/limitToLast.
     """
-    url = f"{FIREBASE_URL}/diagnoses.json"
     try:
-        resp = requests.get(url)
-        resp.raise_for_status()
-        data = resp.json()
-        return data if data else {}
+        items = storage.get_client().page_before("diagnoses", PAGE_SIZE, end_key=before_key)
+        return list(reversed(items))
     except Exception as e:
         st.error(f"Không thể tải lịch sử chẩn đoán: {e}")
-        return {}
+        return []
+
+def fetch_newer(after_key):
+    """
+    Chỉ lấy các bản ghi mới hơn khóa mới nhất đã thấy (mới nhất trước).
+    """
+    try:
+        return list(reversed(storage.get_client().page_after("diagnoses", after_key)))
+    except Exception as e:
+        st.error(f"Không thể tải lịch sử chẩn đoán: {e}")
+        return []
+
+def init_state():
+    # Các bản ghi đã tải trong phiên, sắp mới nhất trước
+    if "history_items" not in st.session_state:
+        st.session_state.history_items = fetch_page()
+        st.session_state.history_page = 0
+        st.session_state.history_exhausted = len(st.session_state.history_items) < PAGE_SIZE
+
+def load_older():
+    items = st.session_state.history_items
+    older = fetch_page(items[-1][0]) if items else fetch_page()
+    items.extend(older)
+    if len(older) < PAGE_SIZE:
+        st.session_state.history_exhausted = True
+
+def refresh():
+    items = st.session_state.history_items
+    if not items:
+        st.session_state.history_items = fetch_page()
+        return
+    newer = fetch_newer(items[0][0])
+    st.session_state.history_items = newer + items
+
+def render_record(record):
+    st.markdown(
+        f"#### Người dùng: {record.get('user_name', 'Không xác định')}\n\n"
+        f"**Loại chẩn đoán:** {record.get('type', 'Không xác định')}  \n"
+        f"**Kết quả:** {record.get('result', 'Không xác định')}  \n"
+        f"**Thời gian:** {record.get('timestamp', 'Không xác định')}\n\n---"
+    )
+
+def show_search_results(filters):
+    """
+    Tìm trên chỉ mục trong bộ nhớ (core.search) dựng từ bản sao dùng chung.
+    """
+    try:
+        keys = search.get_index().search(**filters)
+    except Exception as e:
+        st.error(f"Không thể tải lịch sử chẩn đoán: {e}")
+        return
+    st.caption(f"Tìm thấy {len(keys)} bản ghi")
+    if not keys:
+        return
+    pages = (len(keys) - 1) // PAGE_SIZE + 1
+    page = st.number_input("Trang:", min_value=1, max_value=pages, step=1) - 1
+    records = mirror.get_mirror()
+    for key in keys[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]:
+        record = records.get(key)
+        if record:
+            render_record(record)
 
 # ==== GIAO DIỆN STREAMLIT ====
 st.title("📜 Lịch Sử Chẩn Đoán")
 st.markdown("Xem lại lịch sử chẩn đoán và thời gian thực hiện.")
 
-# Lấy dữ liệu từ Firebase
-history = fetch_diagnosis_history()
+filters = render_search_filters(ALL_MESSAGES)
+startup.first_render("lich_su")
+if filters:
+    show_search_results(filters)
+    st.stop()
+
+init_state()
+if st.button("🔄 Làm mới"):
+    refresh()
+    st.session_state.history_page = 0
 
-if not history:
+history = st.session_state.history_items
+page = st.session_state.history_page
+page_items = history[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+
+if not page_items:
     st.info("Không có lịch sử chẩn đoán nào.")
 else:
-    for key, record in history.items():
-        st.subheader(f"Người dùng: {record.get('user_name', 'Không xác định')}")
-        st.write(f"**Loại chẩn đoán:** {record.get('type', 'Không xác định')}")
-        st.write(f"**Kết quả:** {record.get('result', 'Không xác định')}")
-        st.write(f"**Thời gian:** {record.get('timestamp', 'Không xác định')}")
-        st.write("---")
\ No newline at end of file
+    for key, record in page_items:
+        render_record(record)
+
+col1, col2, col3 = st.columns([1, 2, 1])
+with col1:
+    if st.button("← Mới hơn", disabled=page == 0):
+        st.session_state.history_page -= 1
+        st.rerun()
+with col2:
+    st.caption(f"Trang {page + 1} · đã tải {len(history)} bản ghi")
+with col3:
+    last_loaded = (page + 1) * PAGE_SIZE >= len(history)
+    if st.button("Cũ hơn →", disabled=last_loaded and st.session_state.history_exhausted):
+        if last_loaded:
+            load_older()
+        if (page + 1) * PAGE_SIZE < len(st.session_state.history_items):
+            st.session_state.history_page += 1
+        st.rerun()